@@ -0,0 +1,120 @@
+"""
+Drives download_data against a local MockYouTrack and reports requests and bytes per second and how long windows
+take, so changes of concurrency, connection pooling or paging can be measured offline. Several concurrency levels
+can be compared in one run.
+
+Run from the repository root:
+    python -m benchmarks.crawler --issues 2000 --latency 0.02 --concurrency 1 4 16
+    python -m benchmarks.crawler --file test/data/snapshot.json --error-rate 0.05 --rate-limit-rate 0.05
+"""
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.mock_youtrack import MockYouTrack
+from benchmarks.synthetic import generate
+from jetbrains_issues_dataset.youtrack_loader.download_activities import download_data
+from jetbrains_issues_dataset.youtrack_loader.paging import AdaptivePaging
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+
+class _TimedYouTrack(YouTrack):
+    """
+    Remembers when every window starts: download_data downloads issues of a window first
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.window_starts = []
+
+    def download_issues(self, *args, **kwargs):
+        self.window_starts.append(time.perf_counter())
+        return super().download_issues(*args, **kwargs)
+
+
+def crawl(server, directory, concurrency=1, pool_size=None, page_size=100, activities_mode='per_issue',
+          adaptive_windows=False, backoff_factor=0.01, adaptive_paging=False):
+    """
+    Downloads all issues of the server into `directory`
+    :param adaptive_paging: whether pages start at `page_size` and adapt to the server, see `AdaptivePaging`
+    :return: measurements of the crawl
+    """
+    created = [issue['created'] for issue in server.issues]
+    start = datetime.datetime.fromtimestamp(min(created) // 1000)
+    end = datetime.datetime.fromtimestamp(max(created) // 1000 + 1)
+    youtrack = _TimedYouTrack(server.url, None, page_size=page_size,
+                              pool_size=pool_size if pool_size is not None else max(10, concurrency),
+                              backoff_factor=backoff_factor,
+                              paging=AdaptivePaging(initial=page_size, min_size=min(50, page_size))
+                              if adaptive_paging else None)
+    issues_file = os.path.join(directory, 'crawl.issues.json')
+    activities_file = os.path.join(directory, 'crawl.activities.json')
+
+    server.reset_stats()
+    crawl_start = time.perf_counter()
+    download_data(youtrack, start, end, '#IDEA', issues_file, activities_file, concurrency=concurrency,
+                  activities_mode=activities_mode, adaptive_windows=adaptive_windows)
+    crawl_end = time.perf_counter()
+    elapsed = crawl_end - crawl_start
+
+    window_times = [window_end - window_start for window_start, window_end
+                    in zip(youtrack.window_starts, youtrack.window_starts[1:] + [crawl_end])]
+    with open(issues_file, 'r', encoding='utf-8') as reader:
+        n_issues = sum(1 for _ in reader)
+    with open(activities_file, 'r', encoding='utf-8') as reader:
+        n_activities = sum(1 for _ in reader)
+    return {'seconds': elapsed, 'requests': server.requests, 'requests_per_second': server.requests / elapsed,
+            'bytes': server.bytes_sent, 'bytes_per_second': server.bytes_sent / elapsed,
+            'statuses': dict(server.statuses), 'issues': n_issues, 'activities': n_activities,
+            'windows': len(window_times), 'mean_window_seconds': sum(window_times) / max(1, len(window_times)),
+            'max_window_seconds': max(window_times, default=0)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', help='JSONL dataset to serve; a synthetic one by default')
+    parser.add_argument('--issues', type=int, default=1000, help='how many issues the synthetic dataset has')
+    parser.add_argument('--activities-per-issue', type=int, default=20,
+                        help='mean number of activities of a synthetic issue besides its creation')
+    parser.add_argument('--latency', type=float, default=0.01, help='delay of every response in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='part of GET requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='part of GET requests answered with 429')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4],
+                        help='concurrency levels to compare')
+    parser.add_argument('--pool-size', type=int, help='keep-alive connections of the client; '
+                                                      'at least 10 and the concurrency by default')
+    parser.add_argument('--page-size', type=int, default=100, help='`$top` of requests')
+    parser.add_argument('--activities-mode', choices=['per_issue', 'bulk'], default='per_issue')
+    parser.add_argument('--adaptive-windows', action='store_true')
+    parser.add_argument('--adaptive-paging', action='store_true', help='start pages at --page-size and adapt them')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = args.file
+        if file_path is None:
+            file_path = os.path.join(directory, 'synthetic.json')
+            generate(file_path, args.issues, args.activities_per_issue)
+        server = MockYouTrack.from_file(file_path, latency=args.latency, error_rate=args.error_rate,
+                                        rate_limit_rate=args.rate_limit_rate)
+        print(f'{len(server.issues)} issues, latency {args.latency} s, errors {args.error_rate:.0%}, '
+              f'rate limited {args.rate_limit_rate:.0%}')
+        print(f'{"concurrency":>11} {"seconds":>8} {"requests":>9} {"req/s":>8} {"MB/s":>7} {"windows":>8} '
+              f'{"mean win s":>10} {"max win s":>10}  statuses')
+        with server:
+            for concurrency in args.concurrency:
+                result = crawl(server, directory, concurrency, args.pool_size, args.page_size, args.activities_mode,
+                               args.adaptive_windows, adaptive_paging=args.adaptive_paging)
+                print(f'{concurrency:>11} {result["seconds"]:8.2f} {result["requests"]:9} '
+                      f'{result["requests_per_second"]:8.1f} {result["bytes_per_second"] / 1024 / 1024:7.2f} '
+                      f'{result["windows"]:8} {result["mean_window_seconds"]:10.2f} '
+                      f'{result["max_window_seconds"]:10.2f}  {result["statuses"]}')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Compares JSON parsing backends of ActivityManager on test/data/snapshot.json scaled up to the given number of lines.
+Every copy of the sample gets its own issue ids, so the scaled dataset restores as many distinct issues.
+
+Run from the repository root:
+    python -m benchmarks.json_parsing --lines 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+from jetbrains_issues_dataset.jsonl import JSON_BACKENDS, json_parser, read_jsonl
+
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), '..', 'test', 'data', 'snapshot.json')
+
+
+def scale_sample(file_path, n_lines, sample_file=SAMPLE_FILE):
+    with open(sample_file, 'r', encoding='utf-8') as reader:
+        sample = [json.loads(line) for line in reader]
+
+    written = 0
+    copy = 0
+    with open(file_path, 'w', encoding='utf-8') as writer:
+        while written < n_lines:
+            for element in sample:
+                writer.write(json.dumps(_with_copy_ids(element, copy), ensure_ascii=False) + '\n')
+                written += 1
+                if written == n_lines:
+                    break
+            copy += 1
+
+
+def _with_copy_ids(element, copy):
+    element = json.loads(json.dumps(element))
+    suffix = f'.{copy}'
+    if element['element_type'] == 'issue':
+        element['id'] += suffix
+        return element
+    target = element['target']
+    if target.get('issue') is not None:
+        target['issue']['id'] += suffix
+    else:
+        target['id'] += suffix
+    if 'issue_id' in element:
+        element['issue_id'] += suffix
+    return element
+
+
+def readline_loop(file_path):
+    """
+    Parsing as ActivityManager did it before the backends: text lines one by one with json.loads
+    """
+    n_lines = 0
+    with open(file_path, 'r', encoding='utf-8') as reader:
+        while True:
+            line = reader.readline()
+            if line is None or len(line) == 0:
+                break
+            json.loads(line)
+            n_lines += 1
+    return n_lines
+
+
+def chunked(file_path, backend):
+    n_lines = 0
+    for _ in read_jsonl(file_path, json_parser(backend)):
+        n_lines += 1
+    return n_lines
+
+
+def full_load(file_path, backend):
+    activity_manager = IdeaActivityManager(SnapshotStrategy())
+    activity_manager.load_issues_from_activities_file(file_path, json_backend=backend)
+    return len(activity_manager.snapshot_strategy.issues)
+
+
+def _available_backends():
+    backends = []
+    for backend in JSON_BACKENDS[1:]:
+        try:
+            json_parser(backend)
+            backends.append(backend)
+        except ImportError:
+            pass
+    return backends
+
+
+def _measure(name, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<30} {elapsed:8.2f} s   ({result} items)')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=200000, help='how many lines the scaled dataset has')
+    parser.add_argument('--file', help='where to write the scaled dataset; a temporary file by default')
+    args = parser.parse_args()
+
+    file_path = args.file or os.path.join(tempfile.mkdtemp(), 'scaled_snapshot.json')
+    print(f'Writing {args.lines} lines to {file_path}')
+    scale_sample(file_path, args.lines)
+    print(f'{os.path.getsize(file_path) / 1024 / 1024:.1f} MB')
+
+    print('\nParsing only')
+    baseline = _measure('readline + json.loads', readline_loop, file_path)
+    for backend in _available_backends():
+        elapsed = _measure(f'chunks + {backend}', chunked, file_path, backend)
+        print(f'{"":<30} x{baseline / elapsed:.2f}')
+
+    print('\nActivityManager.load_issues_from_activities_file')
+    baseline = None
+    for backend in ['json'] + [backend for backend in _available_backends() if backend != 'json']:
+        elapsed = _measure(backend, full_load, file_path, backend)
+        if baseline is None:
+            baseline = elapsed
+        else:
+            print(f'{"":<30} x{baseline / elapsed:.2f}')
+
+    if not args.file:
+        os.remove(file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+A local stand-in for the YouTrack REST API, so the YouTrack client and download_data can be measured without
+touching a real server. It serves issues and activities of a JSONL dataset, e.g., test/data/snapshot.json or one
+written by benchmarks.synthetic:
+- GET api/issues?query=...&$skip=&$top=, where the query ends with `created: A .. B` or `updated: A .. B`;
+- GET api/issues/{id}/activities?$skip=&$top=&start=;
+- GET api/activities/?issueQuery=...&$skip=&$top=;
+- POST api/issuesGetter/count.
+Requested fields and categories are ignored. Every request waits `latency` seconds; GET requests fail with 500 or
+are rejected with 429 at the given rates.
+
+Run from the repository root to serve a dataset until interrupted:
+    python -m benchmarks.mock_youtrack --file test/data/snapshot.json --port 8111 --latency 0.05
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+from jetbrains_issues_dataset.jsonl import read_jsonl
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+TIMED_QUERY = re.compile(r'(created|updated): (\S+) \.\. (\S+)')
+QUERY_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# added by the downloader, not by the server
+DOWNLOADER_FIELDS = ('element_type', 'issue_id', 'download_timestamp', 'downloadTimestamp')
+
+
+class MockYouTrack:
+    def __init__(self, issues, activities, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=0,
+                 host='127.0.0.1', port=0, seed=0):
+        """
+        :param issues: issues as the server returns them, each with `created` and `updated` in milliseconds
+        :param activities: lists of activities by issue id, sorted by time
+        :param latency: how long every request waits before it is answered, in seconds
+        :param error_rate: which part of GET requests is answered with 500
+        :param rate_limit_rate: which part of GET requests is answered with 429 and `Retry-After: retry_after`
+        :param port: 0 to take any free port, see `url`
+        """
+        self.issues = sorted(issues, key=lambda issue: issue['created'])
+        self.activities = activities
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.bytes_sent = 0
+        self.statuses = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @staticmethod
+    def from_file(file_path, **kwargs):
+        """
+        Serves elements of a dataset; issues without `created` or `updated` get them from their activities
+        """
+        issues = []
+        activities = {}
+        for element in read_jsonl(file_path):
+            if element['element_type'] == 'issue':
+                issues.append(_without_downloader_fields(element))
+            else:
+                issue_id = element.get('issue_id') or YouTrack.activity_issue_id(element)
+                activities.setdefault(issue_id, []).append(_without_downloader_fields(element))
+        for issue_activities in activities.values():
+            issue_activities.sort(key=lambda activity: activity['timestamp'])
+        for issue in issues:
+            timestamps = [activity['timestamp'] for activity in activities.get(issue['id'], [])]
+            issue.setdefault('created', timestamps[0] if timestamps else 0)
+            issue.setdefault('updated', max(timestamps, default=issue['created']))
+        return MockYouTrack(issues, activities, **kwargs)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.statuses = Counter()
+
+    def find_issues(self, query):
+        match = TIMED_QUERY.search(query)
+        if match is None:
+            return self.issues
+        order_by, start, end = match.groups()
+        start, end = [datetime.strptime(value, QUERY_DATE_FORMAT).timestamp() * 1000 for value in (start, end)]
+        return [issue for issue in self.issues if start <= issue[order_by] < end]
+
+    def _answer(self, method, url, body):
+        """
+        :return: status, headers and the JSON document of the response
+        """
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if method == 'GET':
+            with self._lock:
+                chance = self._random.random()
+            if chance < self.rate_limit_rate:
+                return 429, {'Retry-After': str(self.retry_after)}, {'error': 'Too Many Requests'}
+            if chance < self.rate_limit_rate + self.error_rate:
+                return 500, {}, {'error': 'Internal Server Error'}
+
+        url = parse.urlparse(url)
+        params = {name: values[0] for name, values in parse.parse_qs(url.query).items()}
+        path = url.path.rstrip('/')
+        if method == 'POST' and path == '/api/issuesGetter/count':
+            return 200, {}, {'count': len(self.find_issues(json.loads(body).get('query', '')))}
+        if method != 'GET':
+            return 405, {}, {'error': 'Method Not Allowed'}
+
+        skip, top = int(params.get('$skip', 0)), int(params.get('$top', 42))
+        if path == '/api/issues':
+            return 200, {}, self.find_issues(params.get('query', ''))[skip:skip + top]
+        if path == '/api/activities':
+            issues = self.find_issues(params.get('issueQuery', ''))
+            activities = sorted((activity for issue in issues for activity in self.activities.get(issue['id'], [])),
+                                key=lambda activity: activity['timestamp'])
+            return 200, {}, activities[skip:skip + top]
+        match = re.fullmatch(r'/api/issues/([^/]+)/activities', path)
+        if match is not None:
+            since = int(params.get('start', 0))
+            activities = [activity for activity in self.activities.get(parse.unquote(match.group(1)), [])
+                          if activity['timestamp'] >= since]
+            return 200, {}, activities[skip:skip + top]
+        return 404, {}, {'error': 'Not Found'}
+
+    def _sent(self, status, n_bytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += n_bytes
+            self.statuses[status] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive connections, so pooling of the client matters like with a real server
+    protocol_version = 'HTTP/1.1'
+    # headers and bodies are sent separately, so small responses would wait for delayed acknowledgements
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._respond('GET', b'')
+
+    def do_POST(self):
+        self._respond('POST', self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+    def _respond(self, method, body):
+        mock = self.server.mock
+        status, headers, document = mock._answer(method, self.path, body)
+        content = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        mock._sent(status, len(content))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _without_downloader_fields(element):
+    return {key: value for key, value in element.items() if key not in DOWNLOADER_FIELDS}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', required=True, help='JSONL dataset to serve')
+    parser.add_argument('--port', type=int, default=8111)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay of every response in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='part of GET requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='part of GET requests answered with 429')
+    args = parser.parse_args()
+
+    server = MockYouTrack.from_file(args.file, latency=args.latency, error_rate=args.error_rate,
+                                    rate_limit_rate=args.rate_limit_rate, port=args.port)
+    print(f'Serving {len(server.issues)} issues at {server.url}')
+    with server:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Measures how fast ActivityManager restores snapshots of a synthetic dataset with every snapshot strategy: time,
+lines per second and peak memory. Every strategy runs in a fresh process, so their peak memory does not add up.
+Results can be saved as a baseline and compared with later runs on the same machine; the baseline of the default
+parameters is recorded in benchmarks/replay_baseline.json with the machine it was measured on.
+
+Run from the repository root:
+    python -m benchmarks.replay --baseline benchmarks/replay_baseline.json
+    python -m benchmarks.replay --issues 20000 --save-baseline replay_baseline.json
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import generate
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+STRATEGIES = (SnapshotStrategy, IssueCreatedSnapshotStrategy, FirstAssigneeSnapshotStrategy)
+
+
+def replay(file_path, strategy_class, json_backend='auto', compact=False):
+    """
+    Restores snapshots of the file with a strategy in this process
+    :return: seconds, peak resident memory of the process in MB and the number of restored issues
+    """
+    start = time.perf_counter()
+    activity_manager = IdeaActivityManager(strategy_class(), compact=compact)
+    issues = activity_manager.load_issues_from_activities_file(file_path, json_backend=json_backend)
+    elapsed = time.perf_counter() - start
+    return elapsed, _peak_rss_mb(), len(issues)
+
+
+def run(file_path, n_lines, json_backend='auto', compact=False, strategies=STRATEGIES):
+    """
+    :return: results by strategy name
+    """
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for strategy_class in strategies:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            elapsed, peak_rss, n_issues = executor.submit(replay, file_path, strategy_class, json_backend,
+                                                          compact).result()
+        results[strategy_class.__name__] = {'seconds': elapsed, 'lines_per_second': n_lines / elapsed,
+                                            'peak_rss_mb': peak_rss, 'issues': n_issues}
+    return results
+
+
+def compare(results, baseline):
+    """
+    Prints results and, for strategies in the baseline, how they changed: above 1 is faster or smaller
+    """
+    print(f'{"strategy":<32} {"seconds":>9} {"lines/s":>10} {"peak MB":>9}')
+    for name, result in results.items():
+        print(f'{name:<32} {result["seconds"]:9.2f} {result["lines_per_second"]:10.0f} {result["peak_rss_mb"]:9.1f}')
+        if baseline is not None and name in baseline['results']:
+            expected = baseline['results'][name]
+            speedup = result['lines_per_second'] / expected['lines_per_second']
+            memory_ratio = expected['peak_rss_mb'] / result['peak_rss_mb']
+            print(f'{"  vs baseline":<32} {"":>9} {f"x{speedup:.2f}":>10} {f"x{memory_ratio:.2f}":>9}')
+
+
+def _machine():
+    # the `auto` JSON backend is the fastest of the installed ones
+    return {'platform': platform.platform(), 'processor': platform.machine(), 'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'json_packages': [name for name in ('orjson', 'ujson') if importlib.util.find_spec(name) is not None]}
+
+
+def _peak_rss_mb():
+    import resource
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--issues', type=int, default=20000, help='how many issues the synthetic dataset has')
+    parser.add_argument('--activities-per-issue', type=int, default=20,
+                        help='mean number of activities of an issue besides its creation')
+    parser.add_argument('--comment-length', type=int, default=200, help='mean length of comments in characters')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json-backend', default='auto')
+    parser.add_argument('--compact', action='store_true', help='restore issues in the compact mode')
+    parser.add_argument('--file', help='where to write the dataset; a temporary file by default')
+    parser.add_argument('--baseline', help='JSON file with results of an earlier run to compare with')
+    parser.add_argument('--save-baseline', help='where to save results as a baseline for later runs')
+    args = parser.parse_args()
+
+    dataset = {'issues': args.issues, 'activities_per_issue': args.activities_per_issue,
+               'comment_length': args.comment_length, 'seed': args.seed, 'json_backend': args.json_backend,
+               'compact': args.compact}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as reader:
+            baseline = json.load(reader)
+        if baseline['dataset'] != dataset:
+            print(f'Warning: the baseline was measured with {baseline["dataset"]}')
+        if baseline.get('machine') != _machine():
+            print(f'Warning: the baseline was measured on {baseline.get("machine")}')
+
+    file_path = args.file or os.path.join(tempfile.mkdtemp(), 'synthetic.json')
+    n_lines = generate(file_path, args.issues, args.activities_per_issue, comment_length=args.comment_length,
+                       seed=args.seed)
+    print(f'{n_lines} lines, {os.path.getsize(file_path) / 1024 / 1024:.1f} MB in {file_path}')
+
+    results = run(file_path, n_lines, args.json_backend, args.compact)
+    compare(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as writer:
+            json.dump({'dataset': dataset, 'machine': _machine(), 'lines': n_lines, 'results': results}, writer,
+                      indent=2)
+    if not args.file:
+        os.remove(file_path)
+
+
+if __name__ == '__main__':
+    main()
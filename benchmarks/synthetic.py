@@ -0,0 +1,192 @@
+"""
+Generates a synthetic dataset of issues and activities in the shapes downloaded by youtrack_downloader and consumed by
+ActivityManager: final issue states first, then activities of every issue starting with its IssueCreatedActivityItem.
+The same parameters and seed always give the same file. Field values of the final states agree with the activities,
+so restoring the final snapshot gives back the final states.
+
+Run from the repository root:
+    python -m benchmarks.synthetic --issues 100000 --activities-per-issue 20 --file synthetic.json
+"""
+import argparse
+import json
+import random
+
+START_TIMESTAMP = 1577836800000  # 2020-01-01 in milliseconds
+ISSUE_INTERVAL = 10 * 60 * 1000
+MAX_ACTIVITY_INTERVAL = 6 * 60 * 60 * 1000
+
+# custom fields as IDEA issues have them: `targetMember` of their activities, types of the field and of its values,
+# the attribute ActivityManager reads and the possible values
+CUSTOM_FIELDS = {
+    'State': ('__CUSTOM_FIELD__State_25', 'StateIssueCustomField', 'StateBundleElement', 'name',
+              ['Submitted', 'Open', 'In Progress', 'Wait for Reply', 'Fixed', 'Duplicate', 'Obsolete']),
+    'Assignee': ('__CUSTOM_FIELD__Assignee_30', 'SingleUserIssueCustomField', 'User', 'login',
+                 [f'developer{i}' for i in range(200)]),
+    'Subsystem': ('__CUSTOM_FIELD__Subsystem_26', 'SingleOwnedIssueCustomField', 'OwnedBundleElement', 'name',
+                  [f'Subsystem {i}' for i in range(300)]),
+    'Priority': ('__CUSTOM_FIELD__Priority_24', 'SingleEnumIssueCustomField', 'EnumBundleElement', 'name',
+                 ['Critical', 'Major', 'Normal', 'Minor']),
+    'Type': ('__CUSTOM_FIELD__Type_23', 'SingleEnumIssueCustomField', 'EnumBundleElement', 'name',
+             ['Bug', 'Feature', 'Usability Problem', 'Performance Problem']),
+    'Affected versions': ('__CUSTOM_FIELD__Affected versions_27', 'MultiVersionIssueCustomField',
+                          'VersionBundleElement', 'name', [f'2020.{i}' for i in range(1, 4)]),
+}
+MULTI_VALUE_FIELDS = ('Affected versions',)
+
+# relative frequencies of activities after the creation of an issue: changes of custom fields, comments and edits
+DEFAULT_ACTIVITY_MIX = {'State': 3, 'Assignee': 2, 'Subsystem': 1, 'Priority': 1, 'Type': 0.5,
+                        'Affected versions': 0.5, 'comment': 3, 'summary': 0.5, 'description': 0.5}
+
+WORDS = ('editor', 'project', 'file', 'index', 'build', 'gradle', 'maven', 'debugger', 'breakpoint', 'completion',
+         'refactoring', 'exception', 'freeze', 'plugin', 'settings', 'dialog', 'toolbar', 'search', 'highlighting',
+         'inspection', 'the', 'is', 'not', 'when', 'after', 'open', 'close', 'click', 'works', 'fails', 'slow')
+
+
+def generate(file_path, n_issues=10000, activities_per_issue=20, activity_mix=None, comment_length=200, seed=0):
+    """
+    :param activities_per_issue: mean number of activities of an issue besides its creation
+    :param activity_mix: relative frequencies of activity kinds, see `DEFAULT_ACTIVITY_MIX`; kinds are names of
+    `CUSTOM_FIELDS`, `comment`, `summary` and `description`
+    :param comment_length: mean length of comments and descriptions in characters
+    :return: the number of written lines
+    """
+    if activity_mix is None:
+        activity_mix = DEFAULT_ACTIVITY_MIX
+    for kind in activity_mix:
+        assert kind in CUSTOM_FIELDS or kind in ('comment', 'summary', 'description'), f'Unknown activity `{kind}`'
+    kinds = list(activity_mix)
+    weights = [activity_mix[kind] for kind in kinds]
+
+    def issues():
+        # every issue has its own generator, so issues are generated twice, for final states and for activities,
+        # instead of keeping all of them in memory
+        for number in range(n_issues):
+            yield _SyntheticIssue(number, random.Random(f'{seed}:{number}'), kinds, weights, activities_per_issue,
+                                  comment_length)
+
+    n_lines = 0
+    with open(file_path, 'w', encoding='utf-8') as writer:
+        for issue in issues():
+            writer.write(json.dumps(issue.final_state(), ensure_ascii=False) + '\n')
+            n_lines += 1
+        for issue in issues():
+            for activity in issue.activities:
+                writer.write(json.dumps(activity, ensure_ascii=False) + '\n')
+                n_lines += 1
+    return n_lines
+
+
+class _SyntheticIssue:
+    def __init__(self, number, rng, kinds, weights, activities_per_issue, comment_length):
+        self.id = f'25-{number}'
+        self.id_readable = f'IDEA-{number + 1}'
+        self.reporter = f'user{rng.randrange(5000)}'
+        self.summary = _text(rng, 60)
+        self.description = _text(rng, comment_length)
+        self.values = {}
+        for name, (_, _, _, _, choices) in CUSTOM_FIELDS.items():
+            if name in MULTI_VALUE_FIELDS:
+                self.values[name] = rng.sample(choices, rng.randint(0, 1))
+            elif name == 'State':
+                self.values[name] = choices[0]
+            else:
+                self.values[name] = rng.choice(choices)
+
+        timestamp = self.created = START_TIMESTAMP + number * ISSUE_INTERVAL
+        self.activities = [self._activity('IssueCreatedActivityItem', timestamp, None, [], [], 'created')]
+        self.comments = 0
+        for i in range(rng.randint(0, 2 * activities_per_issue)):
+            timestamp += rng.randint(1000, MAX_ACTIVITY_INTERVAL)
+            self.activities.append(self._change(rng, rng.choices(kinds, weights)[0], timestamp, i, comment_length))
+
+    def final_state(self):
+        return {'description': self.description, 'summary': self.summary, 'commentsCount': self.comments,
+                'idReadable': self.id_readable, 'created': self.created,
+                'updated': self.activities[-1]['timestamp'], 'comments': [], 'customFields': self._custom_fields(),
+                'id': self.id, '$type': 'Issue', 'element_type': 'issue'}
+
+    def _change(self, rng, kind, timestamp, number, comment_length):
+        if kind == 'comment':
+            self.comments += 1
+            comment = {'text': _text(rng, comment_length), 'id': f'27-{self.id[3:]}.{number}',
+                       '$type': 'IssueComment'}
+            return {'removed': [], 'added': [comment], 'id': f'{comment["id"]}.0-0', 'timestamp': timestamp,
+                    'targetMember': None, 'target': dict(comment, issue={'id': self.id, '$type': 'Issue'}),
+                    '$type': 'CommentActivityItem', 'element_type': 'activity'}
+        if kind in ('summary', 'description'):
+            removed = getattr(self, kind)
+            added = _text(rng, 60 if kind == 'summary' else comment_length)
+            setattr(self, kind, added)
+            activity_type = 'SimpleValueActivityItem' if kind == 'summary' else 'TextMarkupActivityItem'
+            return self._activity(activity_type, timestamp, kind, removed, added, number)
+
+        target_member, _, value_type, attribute, choices = CUSTOM_FIELDS[kind]
+        if kind in MULTI_VALUE_FIELDS:
+            current = self.values[kind]
+            if current and rng.random() < 0.3:
+                removed, added = [rng.choice(current)], []
+                current.remove(removed[0])
+            else:
+                removed, added = [], [rng.choice([value for value in choices if value not in current] or choices)]
+                current.extend(added)
+        else:
+            removed, added = [self.values[kind]], [rng.choice(choices)]
+            self.values[kind] = added[0]
+        return self._activity('CustomFieldActivityItem', timestamp, target_member,
+                              [_value(value_type, attribute, value) for value in removed],
+                              [_value(value_type, attribute, value) for value in added], number)
+
+    def _activity(self, activity_type, timestamp, target_member, removed, added, number):
+        # like in downloaded data, the target is the issue with the values of custom fields at the moment
+        target = {'reporter': {'login': self.reporter, '$type': 'User'}, 'idReadable': self.id_readable,
+                  'customFields': self._custom_fields(), 'id': self.id, '$type': 'Issue'}
+        return {'removed': removed, 'added': added, 'timestamp': timestamp, 'targetMember': target_member,
+                'id': f'{self.id}.{number}-0', 'target': target, '$type': activity_type,
+                'element_type': 'activity'}
+
+    def _custom_fields(self):
+        custom_fields = []
+        for name, (_, field_type, value_type, attribute, _) in CUSTOM_FIELDS.items():
+            value = self.values[name]
+            if isinstance(value, list):
+                value = [_value(value_type, attribute, item) for item in value]
+            else:
+                value = _value(value_type, attribute, value)
+            custom_fields.append({'value': value, 'name': name, '$type': field_type})
+        return custom_fields
+
+
+def _value(value_type, attribute, value):
+    if attribute == 'login':
+        return {'login': value, 'name': value.capitalize(), '$type': value_type}
+    return {attribute: value, '$type': value_type}
+
+
+def _text(rng, mean_length):
+    words = []
+    length = 0
+    target_length = rng.randint(mean_length // 2, mean_length * 3 // 2)
+    while length < target_length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', required=True, help='where to write the dataset')
+    parser.add_argument('--issues', type=int, default=10000, help='how many issues the dataset has')
+    parser.add_argument('--activities-per-issue', type=int, default=20,
+                        help='mean number of activities of an issue besides its creation')
+    parser.add_argument('--comment-length', type=int, default=200, help='mean length of comments in characters')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    n_lines = generate(args.file, args.issues, args.activities_per_issue, comment_length=args.comment_length,
+                       seed=args.seed)
+    print(f'Wrote {n_lines} lines to {args.file}')
+
+
+if __name__ == '__main__':
+    main()
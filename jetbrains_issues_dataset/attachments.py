@@ -1,10 +1,11 @@
 import os
 import tempfile
 
-import requests
 import urllib3
 import zipfile
 
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
 IDE_PREFIX = 'IDE: '
 OS_PREFIX = 'OS: '
 JRE_PREFIX = 'JRE: '
@@ -25,12 +26,11 @@ ADD_COMMENT_REQUEST = YOUTRACK_SERVER_URL + "/api/issues/{}/comments"
 IDEA_LOG_EXTENSION = ['log', 'zip', 'tar.gz']
 
 
-def _download_attachments(issue_readable_id, token, ):
+def _download_attachments(issue_readable_id, youtrack: YouTrack):
     result = []
 
-    headers = _get_headers(token)
     request_url = ISSUE_ATTACHMENTS_QUERY.format(issue_readable_id)
-    response = requests.get(request_url, headers=headers, verify=False)
+    response = youtrack.get(request_url)
     attachments_response = response.json()
     if len(attachments_response) == 0 or 'attachments' not in attachments_response[0]:
         print('error')
@@ -54,31 +54,20 @@ def _download_attachments(issue_readable_id, token, ):
 
         attachment_path = '{}/attachment_{}_{}.{}'.format(temp_dir, issue_readable_id, i, extension)
 
-        _download_file(full_url, attachment_path)
+        _download_file(full_url, attachment_path, youtrack)
         result.append(attachment_path)
 
     return result
 
 
-def _download_file(url, file_name):
-    with requests.get(url, stream=True, verify=False) as r:
+def _download_file(url, file_name, youtrack: YouTrack):
+    with youtrack.get(url, stream=True, headers={"Accept": "*/*"}) as r:
         r.raise_for_status()
         with open(file_name, 'wb') as f:
             for chunk in r.iter_content(chunk_size=8192):
                 f.write(chunk)
 
 
-def _get_headers(token):
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    if token is not None:
-        headers["Authorization"] = "Bearer {}".format(token)
-
-    return headers
-
-
 def _inspect_idea_log(file_path):
     filename, file_extension = os.path.splitext(file_path)
     if file_extension == '.zip':
@@ -144,13 +133,12 @@ def _build_idea_log_info_markdown_comment(idea_log_info):
     return result
 
 
-def _add_comment(issue_readable_id, comment_text, token):
+def _add_comment(issue_readable_id, comment_text, youtrack: YouTrack):
     json_data = {
         "text": comment_text
     }
-    headers = _get_headers(token)
     request_url = ADD_COMMENT_REQUEST.format(issue_readable_id)
-    response = requests.post(request_url, headers=headers, json=json_data, verify=False)
+    response = youtrack.post(request_url, json=json_data)
 
     return response.status_code
 
@@ -162,13 +150,14 @@ def _get_plugins_from_text(plugins_text):
 
 
 bot_token = open('token.txt').read()
+youtrack_client = YouTrack(YOUTRACK_SERVER_URL + '/', bot_token)
 
 
-downloaded_attachments = _download_attachments('WI-54307', bot_token)
+downloaded_attachments = _download_attachments('WI-54307', youtrack_client)
 for attachment in downloaded_attachments:
     inspection = _inspect_idea_log(attachment)
     if inspection is not None:
         comment = _build_idea_log_info_markdown_comment(inspection)
-        _add_comment('25-2878556', comment, bot_token)
+        _add_comment('25-2878556', comment, youtrack_client)
         print(inspection)
 
@@ -0,0 +1,192 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from jetbrains_issues_dataset.jsonl import GZIP_EXTENSIONS, READ_CHUNK_SIZE, ZIP_EXTENSIONS, ZSTD_EXTENSIONS, \
+    json_parser, open_jsonl
+
+# fast paths for lines written by the downloader; a quote can't be followed by a colon inside a JSON string,
+# so these match top level keys only
+_ELEMENT_TYPE = re.compile(rb'"element_type":\s*"(\w+)"')
+_ISSUE_ID = re.compile(rb'"issue_id":\s*"([^"\\]*)"')
+_ISSUE_CREATED = re.compile(rb'"\$type":\s*"IssueCreatedActivityItem"')
+
+
+class IssueOffsets:
+    """
+    Where lines of one issue are in the file: its final state, its first IssueCreatedActivityItem and all its
+    activities in the order of the file
+    """
+
+    __slots__ = ('issue', 'created', 'activities')
+
+    def __init__(self):
+        self.issue = None
+        self.created = None
+        self.activities = array('q')
+
+
+class ActivityIndex:
+    """
+    Byte offsets of lines of every issue in a JSON lines file of issues and activities. Compressed files and zip
+    archives are decompressed into a temporary file next to them, so lines can be read by offsets; the temporary
+    file is removed by `close`.
+    """
+
+    def __init__(self, file_path, issues, temp_file=None):
+        self.file_path = file_path
+        self.issues = issues
+        self.temp_file = temp_file
+
+    @staticmethod
+    def build(file_path, json_backend='auto', chunk_size=READ_CHUNK_SIZE, processes=1):
+        """
+        :param json_backend: parser of lines which are not recognized by regular expressions, see `json_parser`
+        :param processes: if more than one, parts of the file are indexed in that many processes
+        """
+        temp_file = None
+        if not _is_plain(file_path):
+            handle, temp_file = tempfile.mkstemp(prefix=os.path.basename(file_path) + '.',
+                                                 dir=os.path.dirname(os.path.abspath(file_path)))
+            with open_jsonl(file_path, 'rb') as reader, os.fdopen(handle, 'wb') as writer:
+                shutil.copyfileobj(reader, writer, chunk_size)
+
+        indexed_file = temp_file or file_path
+        if processes > 1:
+            ranges = _split(indexed_file, processes)
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                parts = executor.map(_index_range, repeat(indexed_file), ranges, repeat(json_backend),
+                                     repeat(chunk_size))
+                issues = {}
+                for part in parts:
+                    _merge(issues, part)
+        else:
+            issues = _index_range(indexed_file, (0, None), json_backend, chunk_size)
+        return ActivityIndex(indexed_file, issues, temp_file)
+
+    def replay_order(self):
+        """
+        Ids of issues which can be restored, in the order their IssueCreatedActivityItem appear in the file
+        """
+        issue_ids = []
+        for issue_id, offsets in self.issues.items():
+            if offsets.created is None:
+                continue
+            if offsets.issue is None:
+                logging.warning(f'Issue {issue_id} has activities, but no final state; it is skipped')
+                continue
+            issue_ids.append(issue_id)
+        issue_ids.sort(key=lambda issue_id: self.issues[issue_id].created)
+        return issue_ids
+
+    def close(self):
+        if self.temp_file is not None and os.path.exists(self.temp_file):
+            os.remove(self.temp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_lines(reader, offsets):
+    """
+    Yields lines of an open binary file at the given offsets
+    """
+    for offset in offsets:
+        reader.seek(offset)
+        yield reader.readline()
+
+
+def _index_range(file_path, byte_range, json_backend, chunk_size):
+    start, end = byte_range
+    parser = json_parser(json_backend)
+    issues = {}
+    offset = start
+    with open(file_path, 'rb') as reader:
+        reader.seek(start)
+        while end is None or offset < end:
+            lines = reader.readlines(chunk_size)
+            if not lines:
+                break
+            for line in lines:
+                if end is not None and offset >= end:
+                    break
+                if not line.isspace():
+                    _index_line(issues, line, offset, parser)
+                offset += len(line)
+    return issues
+
+
+def _split(file_path, n_parts):
+    """
+    Splits the file into about equal ranges of whole lines
+    """
+    size = os.path.getsize(file_path)
+    starts = [0]
+    with open(file_path, 'rb') as reader:
+        for i in range(1, n_parts):
+            reader.seek(max(size * i // n_parts, starts[-1]))
+            reader.readline()
+            starts.append(min(reader.tell(), size))
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _merge(issues, part):
+    """
+    Adds the index of a later part of the file
+    """
+    for issue_id, part_offsets in part.items():
+        offsets = issues.get(issue_id)
+        if offsets is None:
+            issues[issue_id] = part_offsets
+            continue
+        if part_offsets.issue is not None:
+            offsets.issue = part_offsets.issue
+        if offsets.created is None:
+            offsets.created = part_offsets.created
+        offsets.activities.extend(part_offsets.activities)
+
+
+def _index_line(issues, line, offset, parser):
+    element_type = _ELEMENT_TYPE.search(line)
+    issue_id = _ISSUE_ID.search(line)
+    if element_type is not None and element_type.group(1) == b'activity' and issue_id is not None:
+        issue_id = issue_id.group(1).decode('utf-8')
+        is_created = _ISSUE_CREATED.search(line) is not None
+    else:
+        element = parser(line)
+        if element['element_type'] == 'issue':
+            issues.setdefault(element['id'], IssueOffsets()).issue = offset
+            return
+        issue_id = _activity_issue_id(element)
+        if issue_id is None:
+            return
+        is_created = element['$type'] == 'IssueCreatedActivityItem'
+
+    offsets = issues.get(issue_id)
+    if offsets is None:
+        offsets = issues[issue_id] = IssueOffsets()
+    if is_created and offsets.created is None:
+        offsets.created = offset
+    offsets.activities.append(offset)
+
+
+def _activity_issue_id(activity):
+    target = activity.get('target')
+    if not target:
+        return None
+    if target.get('issue'):
+        return target['issue']['id']
+    return target.get('id')
+
+
+def _is_plain(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension not in GZIP_EXTENSIONS + ZSTD_EXTENSIONS + ZIP_EXTENSIONS
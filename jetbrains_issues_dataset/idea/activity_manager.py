@@ -1,9 +1,33 @@
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import json
+from functools import partial
+from itertools import repeat
+
+from jetbrains_issues_dataset.idea.activity_index import ActivityIndex, read_lines
+from jetbrains_issues_dataset.idea.compact_issue import CompactIssue, KeyTable
+from jetbrains_issues_dataset.idea.multi_snapshot_strategy import MultiSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import process_removed_field
+from jetbrains_issues_dataset.jsonl import json_parser, read_jsonl
+
+# raw fields of final issue states which are not kept in the compact mode: values of custom fields are stored
+# under their lowercase names anyway
+COMPACT_DROPPED_FIELDS = ('customFields', '$type')
+
+# issues are split into more shards than processes, so a process with heavy issues doesn't hold the others back
+SHARDS_PER_PROCESS = 4
 
 
 class ActivityManager:
-    def __init__(self, snapshot_strategy, custom_field_mapping=None):
+    def __init__(self, snapshot_strategy, custom_field_mapping=None, compact=False):
+        """
+        :param snapshot_strategy: a snapshot strategy, or a list of them to restore several snapshots in one pass;
+        then `snapshot_strategy` is a `MultiSnapshotStrategy` and its `issues` is a list of results of the strategies
+        :param compact: keep issues as `CompactIssue` instead of dicts, and drop raw custom fields of final issue
+        states; takes several times less memory for large datasets
+        """
+        if isinstance(snapshot_strategy, (list, tuple)):
+            snapshot_strategy = MultiSnapshotStrategy(snapshot_strategy)
         self.snapshot_strategy = snapshot_strategy
 
         self.issues = {}
@@ -16,6 +40,17 @@ class ActivityManager:
             custom_field_mapping = {}
         self.custom_field_mapping = custom_field_mapping
         self.final_issues = {}
+        self.compact = compact
+        self._issue_keys = KeyTable()
+
+        self._compile_custom_field_mapping()
+        self._activity_handlers = {
+            'IssueCreatedActivityItem': self._apply_issue_created,
+            'SimpleValueActivityItem': self._apply_field_activity,
+            'TextMarkupActivityItem': self._apply_field_activity,
+            'CustomFieldActivityItem': self._apply_custom_field_activity,
+            'CommentActivityItem': self._apply_comment_activity,
+        }
 
     def process_issue_final_state(self, issue):
         for custom_field in issue['customFields']:
@@ -30,27 +65,127 @@ class ActivityManager:
             if value is not None:
                 issue[custom_field['name'].lower()] = value
 
+        if self.compact:
+            issue = CompactIssue(self._issue_keys,
+                                 ((key, value) for key, value in issue.items() if key not in COMPACT_DROPPED_FIELDS))
         self.final_issues[issue['id']] = issue
 
-    def load_issues_from_activities_file(self, file_path):
-        with open('%s' % file_path, 'r', encoding='utf-8') as reader:
-            while True:
-                line = reader.readline()
-                if line is None or len(line) == 0:
-                    break
-                element = json.loads(line)
-                element_type = element['element_type']
-                if element_type == 'issue':
-                    self.process_issue_final_state(element)
-                elif element_type == 'activity':
-                    self._apply_activity(element)
+    def load_issues_from_activities_file(self, file_path, json_backend='auto', processes=1, profiler=None):
+        """
+        :param file_path: JSON lines file of issues and activities, can be compressed with gzip or zstandard or
+        be a zip archive with this file, see `open_jsonl`
+        :param json_backend: which JSON parser to use, see `json_parser`
+        :param processes: if more than one, issues are split into shards by id and restored in that many processes
+        by copies of this manager and its snapshot strategy; the result is the same as with one process
+        :param profiler: a `ReplayProfiler` to measure where the time of loading goes, only with one process
+        """
+        if profiler is not None:
+            assert processes == 1, 'Loading in several processes cannot be profiled'
+            parser, parse_seconds = profiler.timed_parser(json_parser(json_backend))
+            profiler.profile_load(self, iter(read_jsonl(file_path, parser)), parse_seconds)
+            return self.issues
+
+        if processes > 1:
+            self._load_in_processes(file_path, json_backend, processes)
+            return self.issues
+
+        for element in read_jsonl(file_path, json_parser(json_backend)):
+            element_type = element['element_type']
+            if element_type == 'issue':
+                self.process_issue_final_state(element)
+            elif element_type == 'activity':
+                self._apply_activity(element)
 
+        self.process_all_previous_attribute_values()
+        return self.issues
+
+    def process_all_previous_attribute_values(self):
+        """
+        Completes snapshots with values from final states and states at the moment of creation; the last step of
+        loading, after all activities are replayed
+        """
         for issue in self.final_issues.values():
             self.snapshot_strategy.process_previous_attribute_values(issue)
         for issue in self.issues.values():
             self.snapshot_strategy.process_previous_attribute_values(issue)
 
-        return self.issues
+    def iter_issues_from_activities_file(self, file_path, json_backend='auto'):
+        """
+        Restores issues one by one and yields their snapshots, in the same order as `load_issues_from_activities_file`
+        puts them into `snapshot_strategy.issues`. The file is read twice: first, offsets of lines of every issue are
+        collected, then activities are replayed issue by issue. Only the issue being restored is kept in memory, so an
+        activity may also come before the final state of its issue.
+        :param file_path: see `load_issues_from_activities_file`; compressed files are decompressed into a temporary
+        file next to them
+        :param json_backend: which JSON parser to use, see `json_parser`
+        """
+        parser = json_parser(json_backend)
+        with ActivityIndex.build(file_path, json_backend) as index, open(index.file_path, 'rb') as reader:
+            for issue_id in index.replay_order():
+                _, _, snapshot, _ = self._restore_issue(reader, parser, issue_id, index.issues.pop(issue_id))
+                if snapshot is not None:
+                    yield snapshot
+
+    def _restore_issue(self, reader, parser, issue_id, offsets):
+        """
+        Replays activities of a single issue and removes everything restored for it from the manager and the strategy
+        :return: final state, state at the moment of creation, snapshot and history of the issue in the strategy,
+        see `SnapshotStrategy.pop_issue_history`; each of them may be None
+        """
+        if offsets.issue is not None:
+            for line in read_lines(reader, [offsets.issue]):
+                self.process_issue_final_state(parser(line))
+            if offsets.created is not None:
+                for line in read_lines(reader, offsets.activities):
+                    self._apply_activity(parser(line))
+
+        final_issue = self.final_issues.pop(issue_id, None)
+        issue = self.issues.pop(issue_id, None)
+        for state in (final_issue, issue):
+            if state is not None:
+                self.snapshot_strategy.process_previous_attribute_values(state)
+        return final_issue, issue, self.snapshot_strategy.pop_issue(issue_id), \
+            self.snapshot_strategy.pop_issue_history(issue_id)
+
+    def _load_in_processes(self, file_path, json_backend, processes):
+        with ActivityIndex.build(file_path, json_backend, processes=processes) as index:
+            shards = [[] for _ in range(processes * SHARDS_PER_PROCESS)]
+            for issue_id, offsets in index.issues.items():
+                shards[zlib.crc32(issue_id.encode('utf-8')) % len(shards)].append((issue_id, offsets))
+
+            restored = {}
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                for shard_result in executor.map(_restore_shard, repeat(self), repeat(index.file_path),
+                                                 repeat(json_backend), shards):
+                    for issue_id, states in shard_result:
+                        restored[issue_id] = states
+
+            # the same order as in a single process: final states by the position of the issue in the file,
+            # the rest by the position of its IssueCreatedActivityItem
+            final_issue_ids = [issue_id for issue_id, states in restored.items() if states[0] is not None]
+            final_issue_ids.sort(key=lambda issue_id: index.issues[issue_id].issue)
+            for issue_id in final_issue_ids:
+                self.final_issues[issue_id] = self._unpickled(restored[issue_id][0])
+            for issue_id in index.replay_order():
+                _, issue, snapshot, history = restored[issue_id]
+                if issue is not None:
+                    self.issues[issue_id] = self._unpickled(issue)
+                if history is not None:
+                    self.snapshot_strategy.add_issue_history(issue_id, history)
+                if snapshot is None:
+                    continue
+                if isinstance(self.snapshot_strategy, MultiSnapshotStrategy):
+                    snapshot = [self._unpickled(strategy_snapshot) if strategy_snapshot is not None else None
+                                for strategy_snapshot in snapshot]
+                else:
+                    snapshot = self._unpickled(snapshot)
+                self.snapshot_strategy.add_issue(issue_id, snapshot)
+
+    def _unpickled(self, issue):
+        # compact issues are pickled as dicts
+        if self.compact and not isinstance(issue, CompactIssue):
+            return CompactIssue(self._issue_keys, issue)
+        return issue
 
     @staticmethod
     def _retrieve_field_value(obj, name):
@@ -59,92 +194,126 @@ class ActivityManager:
         else:
             return None
 
+    def _compile_custom_field_mapping(self):
+        """
+        Turns `custom_field_mapping` into lookup tables: by lowercase field name for field values of created issues
+        and by `targetMember` for values of custom field activities, each with a prebuilt value extractor
+        """
+        self._issue_custom_field_extractors = {}
+        self._activity_custom_field_extractors = {}
+        for target_member, params in self.custom_field_mapping.items():
+            if params['multivalue']:
+                issue_extractor, activity_extractor = _multiple_values, _multiple_activity_values
+            else:
+                issue_extractor, activity_extractor = _single_value, _single_activity_value
+            self._issue_custom_field_extractors[params['name']] = partial(issue_extractor, field=params['field'])
+            self._activity_custom_field_extractors[target_member] = \
+                (params['name'], partial(activity_extractor, field=params['field']))
+
     def _apply_activity(self, activity):
-        activity_type = activity['$type']
-        if activity_type == 'IssueCreatedActivityItem':
-            issue_id = activity['target']['id']
-
-            if issue_id not in self.issues:
-                target_issue = activity['target']
-                issue = {'id': issue_id, 'id_readable': target_issue['idReadable'], 'reporter': target_issue['reporter']['login'],
-                         'comments': {}, 'created at': self.get_datetime(activity)}
-
-                for custom_field in target_issue['customFields']:
-                    for allowed_custom_field_name, allowed_custom_field_params in self.custom_field_mapping.items():
-                        if allowed_custom_field_params['name'] == custom_field['name'].lower():
-                            if allowed_custom_field_params['multivalue']:
-                                custom_field_value = []
-                                for cfv in custom_field['value']:
-                                    list_value = cfv[allowed_custom_field_params['field']]
-                                    custom_field_value.append(list_value)
-                            else:
-                                custom_field_value = custom_field['value'][allowed_custom_field_params['field']] \
-                                    if custom_field['value'] is not None else None
-                            issue[custom_field['name'].lower()] = custom_field_value
-
-                self.issues[issue_id] = issue
+        handler = self._activity_handlers.get(activity['$type'])
+        if handler is not None:
+            handler(activity)
 
-                if issue is not None:
-                    self.snapshot_strategy.process_issue_created(
-                        {'id': issue_id, 'id_readable': target_issue['idReadable'], 'comments': {}},
-                        self.final_issues[issue_id])
-            else:
-                print("Duplicated IssueCreatedActivityItem for issue: {}".format(issue_id))
+    def _apply_issue_created(self, activity):
+        issue_id = activity['target']['id']
+
+        if issue_id not in self.issues:
+            target_issue = activity['target']
+            issue = {'id': issue_id, 'id_readable': target_issue['idReadable'], 'reporter': target_issue['reporter']['login'],
+                     'comments': {}, 'created at': self.get_datetime(activity)}
+
+            for custom_field in target_issue['customFields']:
+                custom_field_name = custom_field['name'].lower()
+                extractor = self._issue_custom_field_extractors.get(custom_field_name)
+                if extractor is not None:
+                    issue[custom_field_name] = extractor(custom_field['value'])
+
+            self.issues[issue_id] = self._new_issue(issue)
+
+            self.snapshot_strategy.process_issue_created(
+                self._new_issue({'id': issue_id, 'id_readable': target_issue['idReadable'], 'comments': {}}),
+                self.final_issues[issue_id])
         else:
-            if activity_type == 'SimpleValueActivityItem' or activity_type == 'TextMarkupActivityItem' \
-                    or activity_type == 'CustomFieldActivityItem':
-                issue_id = activity['target']['id']
-                if issue_id not in self.issues:
-                    # issue was moved to current project
-                    return
-                target_member = activity['targetMember']
-
-                removed = activity['removed'] if 'removed' in activity else None
-                added = activity['added'] if 'added' in activity else None
-                timestamp = self.get_datetime(activity)
-
-                if activity_type == 'CustomFieldActivityItem':
-                    if target_member not in self.custom_field_mapping:
-                        return
-                    original_target_member = target_member
-                    target_member = self.custom_field_mapping[target_member]['name']
-
-                    if self.custom_field_mapping[original_target_member]['multivalue']:
-                        added_list = []
-                        for added_item in added:
-                            added_list.append(self._retrieve_field_value(added_item, self.custom_field_mapping[original_target_member]['field']))
-                        added = added_list
-
-                        removed_list = []
-                        for removed_item in removed:
-                            removed_list.append(self._retrieve_field_value(removed_item, self.custom_field_mapping[original_target_member]['field']))
-                        removed = removed_list
-                    else:
-                        removed = self._retrieve_field_value(removed, self.custom_field_mapping[original_target_member]['field'])
-                        added = self._retrieve_field_value(added, self.custom_field_mapping[original_target_member]['field'])
-                else:
-                    if removed is not None and len(removed) == 0:
-                        removed = None
-                    if added is not None and len(added) == 0:
-                        added = None
-
-                final_issue_state = self.final_issues[issue_id]
-                if removed is not None:
-                    self.snapshot_strategy.process_removed_field(issue_id, target_member, removed, final_issue_state)
-                if added is not None:
-                    self.snapshot_strategy.process_added_field(issue_id, target_member, added, final_issue_state, timestamp)
-
-            elif activity_type == 'CommentActivityItem':
-                if len(activity['removed']) > 0:
-                    raise NotImplementedError
-                comment = activity['target']
-                issue_id = comment['issue']['id']
-                if issue_id not in self.issues:
-                    # issue was moved to current project
-                    return
-
-                self.snapshot_strategy.process_added_comment(
-                    {'issue_id': issue_id, 'id': comment['id'], 'text': comment['text']})
+            print("Duplicated IssueCreatedActivityItem for issue: {}".format(issue_id))
+
+    def _apply_field_activity(self, activity):
+        issue_id = activity['target']['id']
+        if issue_id not in self.issues:
+            # issue was moved to current project
+            return
+
+        removed = activity['removed'] if 'removed' in activity else None
+        added = activity['added'] if 'added' in activity else None
+        if removed is not None and len(removed) == 0:
+            removed = None
+        if added is not None and len(added) == 0:
+            added = None
+        self._apply_field_change(issue_id, activity['targetMember'], removed, added, self.get_datetime(activity))
+
+    def _apply_custom_field_activity(self, activity):
+        issue_id = activity['target']['id']
+        if issue_id not in self.issues:
+            # issue was moved to current project
+            return
+        custom_field = self._activity_custom_field_extractors.get(activity['targetMember'])
+        if custom_field is None:
+            return
+
+        field_name, extractor = custom_field
+        removed = extractor(activity['removed'] if 'removed' in activity else None)
+        added = extractor(activity['added'] if 'added' in activity else None)
+        self._apply_field_change(issue_id, field_name, removed, added, self.get_datetime(activity))
+
+    def _apply_field_change(self, issue_id, field_name, removed, added, timestamp):
+        final_issue_state = self.final_issues[issue_id]
+        if removed is not None:
+            process_removed_field(self.snapshot_strategy, issue_id, field_name, removed, final_issue_state, timestamp)
+        if added is not None:
+            self.snapshot_strategy.process_added_field(issue_id, field_name, added, final_issue_state, timestamp)
+
+    def _apply_comment_activity(self, activity):
+        if len(activity['removed']) > 0:
+            raise NotImplementedError
+        comment = activity['target']
+        issue_id = comment['issue']['id']
+        if issue_id not in self.issues:
+            # issue was moved to current project
+            return
+
+        self.snapshot_strategy.process_added_comment(
+            {'issue_id': issue_id, 'id': comment['id'], 'text': comment['text'],
+             'timestamp': self.get_datetime(activity)})
+
+    def _new_issue(self, issue):
+        if self.compact:
+            return CompactIssue(self._issue_keys, issue)
+        return issue
 
     def get_datetime(self, activity):
         return datetime.fromtimestamp(int(activity['timestamp'] / 1000))
+
+
+# value extractors of custom fields; module level functions, so that compiled mappings can be pickled
+
+def _single_value(value, field):
+    return value[field] if value is not None else None
+
+
+def _multiple_values(value, field):
+    return [list_value[field] for list_value in value]
+
+
+def _single_activity_value(items, field):
+    return ActivityManager._retrieve_field_value(items, field)
+
+
+def _multiple_activity_values(items, field):
+    return [ActivityManager._retrieve_field_value(item, field) for item in items]
+
+
+def _restore_shard(activity_manager, file_path, json_backend, shard):
+    parser = json_parser(json_backend)
+    with open(file_path, 'rb') as reader:
+        return [(issue_id, activity_manager._restore_issue(reader, parser, issue_id, offsets))
+                for issue_id, offsets in shard]
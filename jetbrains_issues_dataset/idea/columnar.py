@@ -0,0 +1,190 @@
+import calendar
+from array import array
+from datetime import datetime
+
+# columns of exported issues and how they are stored
+STRING_COLUMNS = ('id', 'id_readable')
+CATEGORICAL_COLUMNS = ('reporter', 'state', 'assignee', 'subsystem', 'fixed_by')
+DATETIME_COLUMNS = ('created at', 'fixed_at')
+DEFAULT_COLUMNS = ('id', 'id_readable', 'reporter', 'state', 'assignee', 'subsystem', 'created at', 'fixed_by',
+                   'fixed_at')
+
+# missing categories are coded with -1, missing moments with the smallest 64-bit integer, which is NaT in NumPy
+MISSING_CODE = -1
+MISSING_DATETIME = -2 ** 63
+
+OUTPUT_FORMATS = ('columns', 'numpy', 'arrow', 'pandas')
+
+
+class Table:
+    """
+    Columns of the same length. Strings are lists, moments are seconds since the epoch of their wall clock time in
+    64-bit integer arrays, categorical values are 32-bit integer codes of `categories` of the column.
+    """
+
+    def __init__(self, columns, categories=None, datetime_columns=()):
+        self.columns = columns
+        self.categories = {} if categories is None else categories
+        self.datetime_columns = tuple(datetime_columns)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+
+def to_columns(issues, columns=DEFAULT_COLUMNS):
+    """
+    Builds tables of snapshots in a single pass: one with a row per issue and the requested columns, and one with a
+    row per comment with `issue_id`, `comment_id` and `text`
+    :param issues: snapshots by issue id, e.g., `SnapshotStrategy.issues`
+    :param columns: which fields to export; fields not known as categorical or moments are exported as strings
+    """
+    writers = {}
+    for column in columns:
+        if column in CATEGORICAL_COLUMNS:
+            writers[column] = _CategoricalWriter()
+        elif column in DATETIME_COLUMNS:
+            writers[column] = _DatetimeWriter()
+        else:
+            writers[column] = _StringWriter()
+    comment_issues = _CategoricalWriter()
+    comment_ids = []
+    comment_texts = []
+
+    for issue_id, issue in issues.items():
+        for column, writer in writers.items():
+            writer.append(issue.get(column))
+        for comment_id, text in issue.get('comments', {}).items():
+            comment_issues.append(issue_id)
+            comment_ids.append(comment_id)
+            comment_texts.append(text)
+
+    issue_table = Table({column: writer.values for column, writer in writers.items()},
+                        {column: writer.categories for column, writer in writers.items()
+                         if isinstance(writer, _CategoricalWriter)},
+                        [column for column in columns if column in DATETIME_COLUMNS])
+    comment_table = Table({'issue_id': comment_issues.values, 'comment_id': comment_ids, 'text': comment_texts},
+                          {'issue_id': comment_issues.categories})
+    return issue_table, comment_table
+
+
+def to_numpy(issues, columns=DEFAULT_COLUMNS):
+    """
+    Same as `to_columns`, with NumPy arrays: codes and moments share memory with the built columns, moments are
+    `datetime64[s]`, strings are object arrays
+    """
+    numpy = _import('numpy')
+    return tuple(_numpy_table(numpy, table) for table in to_columns(issues, columns))
+
+
+def to_arrow(issues, columns=DEFAULT_COLUMNS):
+    """
+    Same as `to_columns`, with Arrow tables: categorical columns are dictionary encoded, moments are timestamps
+    """
+    pyarrow = _import('pyarrow')
+    numpy = _import('numpy')
+    tables = []
+    for table in to_columns(issues, columns):
+        arrays = {}
+        for name, values in _numpy_table(numpy, table).columns.items():
+            if name in table.categories:
+                codes = pyarrow.array(values, mask=values == MISSING_CODE)
+                arrays[name] = pyarrow.DictionaryArray.from_arrays(
+                    codes, pyarrow.array(table.categories[name], pyarrow.string()))
+            elif name in table.datetime_columns:
+                arrays[name] = pyarrow.array(values, pyarrow.timestamp('s'), mask=numpy.isnat(values))
+            else:
+                arrays[name] = pyarrow.array(values, pyarrow.string())
+        tables.append(pyarrow.table(arrays))
+    return tuple(tables)
+
+
+def to_pandas(issues, columns=DEFAULT_COLUMNS):
+    """
+    Same as `to_columns`, with pandas data frames: categorical columns have the `category` type
+    """
+    pandas = _import('pandas')
+    numpy = _import('numpy')
+    frames = []
+    for table in to_columns(issues, columns):
+        frame_columns = {}
+        for name, values in _numpy_table(numpy, table).columns.items():
+            if name in table.categories:
+                frame_columns[name] = pandas.Categorical.from_codes(values, table.categories[name])
+            else:
+                frame_columns[name] = values
+        frames.append(pandas.DataFrame(frame_columns))
+    return tuple(frames)
+
+
+def write_parquet(issues, issues_file, comments_file, columns=DEFAULT_COLUMNS):
+    """
+    Writes tables of `to_arrow` into Parquet files
+    """
+    parquet = _import('pyarrow.parquet')
+    issue_table, comment_table = to_arrow(issues, columns)
+    parquet.write_table(issue_table, issues_file)
+    parquet.write_table(comment_table, comments_file)
+
+
+def export(issues, output_format, columns=DEFAULT_COLUMNS):
+    """
+    :param output_format: one of `OUTPUT_FORMATS`, the name of the function to use without `to_`
+    """
+    assert output_format in OUTPUT_FORMATS, f'output format must be one of {", ".join(OUTPUT_FORMATS)}'
+    return globals()['to_' + output_format](issues, columns)
+
+
+class _StringWriter:
+    def __init__(self):
+        self.values = []
+
+    def append(self, value):
+        self.values.append(value if value is None or isinstance(value, str) else str(value))
+
+
+class _CategoricalWriter:
+    def __init__(self):
+        self.values = array('i')
+        self.categories = []
+        self._codes = {}
+
+    def append(self, value):
+        if value is None:
+            self.values.append(MISSING_CODE)
+            return
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.categories)
+            self.categories.append(value)
+        self.values.append(code)
+
+
+class _DatetimeWriter:
+    def __init__(self):
+        self.values = array('q')
+
+    def append(self, value):
+        if isinstance(value, datetime):
+            # naive moments are local, their wall clock time is kept as is
+            self.values.append(calendar.timegm(value.timetuple()))
+        else:
+            self.values.append(MISSING_DATETIME)
+
+
+def _numpy_table(numpy, table):
+    columns = {}
+    for name, values in table.columns.items():
+        if name in table.categories:
+            columns[name] = numpy.frombuffer(values, dtype=numpy.int32)
+        elif name in table.datetime_columns:
+            columns[name] = numpy.frombuffer(values, dtype=numpy.int64).view('datetime64[s]')
+        else:
+            columns[name] = numpy.array(values, dtype=object)
+    return Table(columns, table.categories, table.datetime_columns)
+
+
+def _import(module_name):
+    try:
+        return __import__(module_name, fromlist=['_'])
+    except ImportError:
+        raise ImportError(f'Package `{module_name.split(".")[0]}` is required for this export')
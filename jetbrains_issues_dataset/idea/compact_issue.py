@@ -0,0 +1,103 @@
+import sys
+from collections.abc import MutableMapping
+
+# longer strings (summaries, descriptions, comments) are rarely repeated and are kept as they are
+MAX_INTERNED_LENGTH = 100
+
+_MISSING = object()
+
+
+class KeyTable:
+    """
+    Field names shared by all compact issues of one activity manager: every name gets a slot, which is its position
+    in the values of every issue
+    """
+
+    __slots__ = ('slots', 'keys')
+
+    def __init__(self):
+        self.slots = {}
+        self.keys = []
+
+    def slot(self, key):
+        slot = self.slots.get(key)
+        if slot is None:
+            key = intern_value(key)
+            slot = len(self.keys)
+            self.slots[key] = slot
+            self.keys.append(key)
+        return slot
+
+
+class CompactIssue(MutableMapping):
+    """
+    Memory efficient replacement of an issue dict: field names are stored once in the shared `KeyTable`, every issue
+    keeps only a list of values, and short string values are interned, so states, subsystems and logins repeated in
+    thousands of issues are stored once. Nested values (e.g., comments) are kept by reference.
+    Pickled as a plain dict.
+    """
+
+    __slots__ = ('_table', '_values')
+
+    def __init__(self, table, items=()):
+        self._table = table
+        self._values = []
+        for key, value in dict(items).items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        slot = self._table.slots.get(key)
+        if slot is None or slot >= len(self._values):
+            raise KeyError(key)
+        value = self._values[slot]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        slot = self._table.slot(key)
+        if slot >= len(self._values):
+            self._values.extend([_MISSING] * (slot + 1 - len(self._values)))
+        self._values[slot] = intern_value(value)
+
+    def __delitem__(self, key):
+        self[key]
+        self._values[self._table.slots[key]] = _MISSING
+
+    def __contains__(self, key):
+        slot = self._table.slots.get(key)
+        return slot is not None and slot < len(self._values) and self._values[slot] is not _MISSING
+
+    def __iter__(self):
+        keys = self._table.keys
+        for slot, value in enumerate(self._values):
+            if value is not _MISSING:
+                yield keys[slot]
+
+    def __len__(self):
+        return sum(1 for value in self._values if value is not _MISSING)
+
+    def copy(self):
+        issue = CompactIssue(self._table)
+        issue._values = self._values.copy()
+        return issue
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def __repr__(self):
+        return f'CompactIssue({dict(self)!r})'
+
+
+def intern_value(value):
+    """
+    Interns a short string, or short strings of a list in place
+    """
+    if type(value) is str:
+        if len(value) <= MAX_INTERNED_LENGTH:
+            return sys.intern(value)
+    elif type(value) is list:
+        for i, item in enumerate(value):
+            if type(item) is str and len(item) <= MAX_INTERNED_LENGTH:
+                value[i] = sys.intern(item)
+    return value
@@ -0,0 +1,339 @@
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+from jetbrains_issues_dataset.idea.compact_issue import MAX_INTERNED_LENGTH, CompactIssue
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy, process_removed_field
+from jetbrains_issues_dataset.jsonl import json_parser
+
+# changes whenever the file layout or the meaning of events change, so older cache files are not used
+FORMAT_VERSION = 2
+MAGIC = b'JIDEVTS\0'
+
+# kinds of events
+FINAL_STATE = 0
+ISSUE_CREATED = 1
+ADDED_FIELD = 2
+REMOVED_FIELD = 3
+ADDED_COMMENT = 4
+CREATED_STATE = 5
+
+# types of event values
+NO_VALUE = 0
+STRING_VALUE = 1
+BLOB_VALUE = 2
+
+NO_STRING = 0xFFFFFFFF
+
+# magic, format version, numbers of strings, blobs and events, then offsets of sections
+_HEADER = struct.Struct('<8sIQQQ' + 'Q' * 10)
+# sections and their item types: offsets of strings and blobs, columns of events, then data of strings and blobs
+_SECTIONS = (('string_offsets', 'Q'), ('blob_offsets', 'Q'), ('kinds', 'B'), ('issues', 'I'), ('fields', 'I'),
+             ('value_types', 'B'), ('values', 'q'), ('timestamps', 'q'), ('string_data', 'B'), ('blob_data', 'B'))
+_ALIGNMENT = 8
+
+HASHES_FILE = 'hashes.json'
+CACHE_EXTENSION = '.events'
+
+
+class _Columns:
+    def __init__(self):
+        self.kinds = array('B')
+        self.issues = array('I')
+        self.fields = array('I')
+        self.value_types = array('B')
+        self.values = array('q')
+        self.timestamps = array('q')
+
+
+class EventRecorder(SnapshotStrategy):
+    """
+    Snapshot strategy proxy which passes events of the activity manager to the wrapped strategy and records them
+    in columns: kind, issue, field, value and timestamp of every event. Strings are stored once in a string table,
+    other values are stored as JSON blobs.
+    """
+
+    accepts_removed_field_timestamp = True
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.strings = {}
+        self.blobs = []
+        self.events = _Columns()
+
+    @property
+    def issues(self):
+        return self.strategy.issues
+
+    def process_previous_attribute_values(self, issue):
+        # done again after the replay, nothing to record
+        self.strategy.process_previous_attribute_values(issue)
+
+    def process_issue_created(self, issue, final_issue_state):
+        self._record(self.events, ISSUE_CREATED, issue['id'], value=dict(issue))
+        self.strategy.process_issue_created(issue, final_issue_state)
+
+    def process_added_field(self, id, field, value, final_issue_state, timestamp):
+        self._record(self.events, ADDED_FIELD, id, field, value, timestamp)
+        self.strategy.process_added_field(id, field, value, final_issue_state, timestamp)
+
+    def process_removed_field(self, id, field, removed_value, final_issue_state, timestamp=None):
+        self._record(self.events, REMOVED_FIELD, id, field, removed_value, timestamp)
+        process_removed_field(self.strategy, id, field, removed_value, final_issue_state, timestamp)
+
+    def process_added_comment(self, comment):
+        self._record(self.events, ADDED_COMMENT, comment['issue_id'], comment['id'], comment['text'],
+                     comment['timestamp'])
+        self.strategy.process_added_comment(comment)
+
+    def pop_issue(self, issue_id):
+        return self.strategy.pop_issue(issue_id)
+
+    def add_issue(self, issue_id, snapshot):
+        self.strategy.add_issue(issue_id, snapshot)
+
+    def pop_issue_history(self, issue_id):
+        return self.strategy.pop_issue_history(issue_id)
+
+    def add_issue_history(self, issue_id, history):
+        self.strategy.add_issue_history(issue_id, history)
+
+    def write(self, cache_file, activity_manager):
+        """
+        Writes the recorded events with final states and states at the moment of creation of the manager's issues:
+        final states go first, states at the moment of creation go last, as they are needed in the replay
+        """
+        final_states = _Columns()
+        for issue_id, issue in activity_manager.final_issues.items():
+            self._record(final_states, FINAL_STATE, issue_id, value=dict(issue))
+        created_states = _Columns()
+        for issue_id, issue in activity_manager.issues.items():
+            issue = dict(issue)
+            created_at = issue['created at']
+            issue['created at'] = None
+            self._record(created_states, CREATED_STATE, issue_id, value=issue, timestamp=created_at)
+
+        string_data, string_offsets = _pack((string.encode('utf-8', 'surrogatepass') for string in self.strings))
+        blob_data, blob_offsets = _pack(self.blobs)
+        sections = {'string_offsets': string_offsets.tobytes(), 'blob_offsets': blob_offsets.tobytes(),
+                    'string_data': string_data, 'blob_data': blob_data}
+        for name in ('kinds', 'issues', 'fields', 'value_types', 'values', 'timestamps'):
+            sections[name] = b''.join(getattr(columns, name).tobytes()
+                                      for columns in (final_states, self.events, created_states))
+        n_events = len(final_states.kinds) + len(self.events.kinds) + len(created_states.kinds)
+
+        temp_file = cache_file + '.tmp'
+        with open(temp_file, 'wb') as writer:
+            offsets = []
+            position = _HEADER.size
+            writer.write(b'\0' * _HEADER.size)
+            for name, _ in _SECTIONS:
+                padding = -position % _ALIGNMENT
+                writer.write(b'\0' * padding)
+                position += padding
+                offsets.append(position)
+                writer.write(sections[name])
+                position += len(sections[name])
+            writer.seek(0)
+            writer.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(self.strings), len(self.blobs), n_events,
+                                      *offsets))
+        os.replace(temp_file, cache_file)
+
+    def _record(self, columns, kind, issue_id, field=None, value=None, timestamp=None):
+        columns.kinds.append(kind)
+        columns.issues.append(self._string(issue_id))
+        columns.fields.append(NO_STRING if field is None else self._string(field))
+        if value is None:
+            columns.value_types.append(NO_VALUE)
+            columns.values.append(0)
+        elif type(value) is str:
+            columns.value_types.append(STRING_VALUE)
+            columns.values.append(self._string(value))
+        else:
+            columns.value_types.append(BLOB_VALUE)
+            columns.values.append(len(self.blobs))
+            self.blobs.append(json.dumps(value, ensure_ascii=False).encode('utf-8', 'surrogatepass'))
+        columns.timestamps.append(0 if timestamp is None else int(timestamp.timestamp()))
+
+    def _string(self, string):
+        index = self.strings.get(string)
+        if index is None:
+            index = self.strings[string] = len(self.strings)
+        return index
+
+
+class EventCache:
+    """
+    Memory-mapped cache file written by `EventRecorder`; columns are read in place, strings are decoded once
+    """
+
+    def __init__(self, cache_file, json_backend='auto'):
+        with open(cache_file, 'rb') as reader:
+            self._map = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._map)
+        magic, version, n_strings, n_blobs, self.n_events = header[:5]
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f'{cache_file} is not an event cache of version {FORMAT_VERSION}')
+
+        lengths = {'string_offsets': n_strings + 1, 'blob_offsets': n_blobs + 1}
+        # views have to be released before the map is closed
+        self._views = [memoryview(self._map)]
+        columns = {}
+        for (name, item_type), offset in zip(_SECTIONS, header[5:]):
+            if name in ('string_data', 'blob_data'):
+                columns[name] = self._view(offset, None)
+                continue
+            length = lengths.get(name, self.n_events)
+            columns[name] = self._view(offset, offset + length * struct.calcsize(item_type)).cast(item_type)
+            self._views.append(columns[name])
+        self._columns = columns
+        self._strings = [None] * n_strings
+        self._parser = json_parser(json_backend)
+
+    def replay(self, activity_manager):
+        """
+        Restores final states and states at the moment of creation of issues in the activity manager and passes
+        recorded events to its snapshot strategy, in the same order as they were recorded
+        """
+        columns = self._columns
+        kinds, issues, fields = columns['kinds'], columns['issues'], columns['fields']
+        value_types, values, timestamps = columns['value_types'], columns['values'], columns['timestamps']
+        strategy = activity_manager.snapshot_strategy
+        final_issues = activity_manager.final_issues
+        string = self._string
+        for i in range(self.n_events):
+            kind = kinds[i]
+            issue_id = string(issues[i])
+            value = self._value(value_types[i], values[i])
+            if kind == ADDED_FIELD:
+                strategy.process_added_field(issue_id, string(fields[i]), value, final_issues[issue_id],
+                                             datetime.fromtimestamp(timestamps[i]))
+            elif kind == REMOVED_FIELD:
+                process_removed_field(strategy, issue_id, string(fields[i]), value, final_issues[issue_id],
+                                      datetime.fromtimestamp(timestamps[i]))
+            elif kind == ADDED_COMMENT:
+                strategy.process_added_comment({'issue_id': issue_id, 'id': string(fields[i]), 'text': value,
+                                                'timestamp': datetime.fromtimestamp(timestamps[i])})
+            elif kind == ISSUE_CREATED:
+                strategy.process_issue_created(activity_manager._new_issue(value), final_issues[issue_id])
+            elif kind == FINAL_STATE:
+                final_issues[issue_id] = CompactIssue(activity_manager._issue_keys, value) \
+                    if activity_manager.compact else value
+            elif kind == CREATED_STATE:
+                value['created at'] = datetime.fromtimestamp(timestamps[i])
+                activity_manager.issues[issue_id] = activity_manager._new_issue(value)
+
+    def close(self):
+        self._columns = None
+        for view in reversed(self._views):
+            view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _view(self, start, end):
+        view = self._views[0][start:end]
+        self._views.append(view)
+        return view
+
+    def _string(self, index):
+        string = self._strings[index]
+        if string is None:
+            offsets = self._columns['string_offsets']
+            string = bytes(self._columns['string_data'][offsets[index]:offsets[index + 1]]).decode('utf-8',
+                                                                                              'surrogatepass')
+            if len(string) <= MAX_INTERNED_LENGTH:
+                string = sys.intern(string)
+            self._strings[index] = string
+        return string
+
+    def _value(self, value_type, value):
+        if value_type == STRING_VALUE:
+            return self._string(value)
+        if value_type == BLOB_VALUE:
+            offsets = self._columns['blob_offsets']
+            return self._parser(bytes(self._columns['blob_data'][offsets[value]:offsets[value + 1]]))
+        return None
+
+
+def load_with_cache(file_path, activity_manager, cache_dir, json_backend='auto'):
+    """
+    Loads issues from the event cache of the file in `cache_dir`, or loads them from the file and writes the cache.
+    The cache is found by a hash of the file, custom field mapping and compact mode of the manager, so it is not used
+    after any of them changes. Names of caches start with the hash of the file and the format version, so caches of
+    older versions of the file or of the format are removed, while caches for other mappings or modes are kept.
+    :return: True if issues were loaded from the cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    sha256 = file_hash(file_path, cache_dir)
+    key = {'mapping': activity_manager.custom_field_mapping, 'compact': activity_manager.compact}
+    key = hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    cache_prefix = os.path.join(cache_dir, os.path.basename(file_path))
+    version_prefix = f'{cache_prefix}.{sha256[:16]}-{FORMAT_VERSION}.'
+    cache_file = f'{version_prefix}{key}{CACHE_EXTENSION}'
+
+    if os.path.exists(cache_file):
+        with EventCache(cache_file, json_backend) as cache:
+            cache.replay(activity_manager)
+        activity_manager.process_all_previous_attribute_values()
+        return True
+
+    recorder = EventRecorder(activity_manager.snapshot_strategy)
+    activity_manager.snapshot_strategy = recorder
+    try:
+        activity_manager.load_issues_from_activities_file(file_path, json_backend)
+    finally:
+        activity_manager.snapshot_strategy = recorder.strategy
+    for stale_file in glob.glob(glob.escape(cache_prefix) + '.*' + CACHE_EXTENSION):
+        if not stale_file.startswith(version_prefix):
+            os.remove(stale_file)
+    recorder.write(cache_file, activity_manager)
+    return False
+
+
+def file_hash(file_path, cache_dir):
+    """
+    SHA-256 of the file; remembered in `cache_dir` with the size and the modification time of the file,
+    so it is computed again only after the file changes
+    """
+    stat = os.stat(file_path)
+    hashes_file = os.path.join(cache_dir, HASHES_FILE)
+    hashes = {}
+    if os.path.exists(hashes_file):
+        with open(hashes_file, 'r', encoding='utf-8') as reader:
+            hashes = json.load(reader)
+    known = hashes.get(os.path.abspath(file_path))
+    if known is not None and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as reader:
+        for chunk in iter(lambda: reader.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    hashes[os.path.abspath(file_path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                          'sha256': sha256.hexdigest()}
+    temp_file = hashes_file + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as writer:
+        json.dump(hashes, writer)
+    os.replace(temp_file, hashes_file)
+    return sha256.hexdigest()
+
+
+def _pack(items):
+    data = bytearray()
+    offsets = array('Q', [0])
+    for item in items:
+        data += item
+        offsets.append(len(data))
+    return bytes(data), offsets
@@ -5,43 +5,71 @@ import requests
 from tqdm import tqdm
 import zipfile
 
+from jetbrains_issues_dataset.idea.event_cache import load_with_cache
 from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.result_cache import ResultCache
 from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
 
+CACHE_DIRECTORY = path.join('data', '.cache')
+RESULT_CACHE_DIRECTORY = path.join(CACHE_DIRECTORY, 'snapshots')
 
-def idea_2019_03_20_to_idea_2020_03_20(snapshot_strategy=None):
+
+def idea_2019_03_20_to_idea_2020_03_20(snapshot_strategy=None, compact=False, processes=1, use_cache=False,
+                                      cache_results=False, output_format=None):
     if snapshot_strategy is None:
         snapshot_strategy = SnapshotStrategy()
-    activity_manager = IdeaActivityManager(snapshot_strategy)
-    return load_activities_from_file('idea_activities_2019_03_20_to_2020_03_20.json', activity_manager)
+    activity_manager = IdeaActivityManager(snapshot_strategy, compact=compact)
+    return load_activities_from_file('idea_activities_2019_03_20_to_2020_03_20.json', activity_manager, processes,
+                                     use_cache, cache_results, output_format)
 
 
-def idea_2018_10_15_to_idea_2020_10_15(snapshot_strategy=None):
+def idea_2018_10_15_to_idea_2020_10_15(snapshot_strategy=None, compact=False, processes=1, use_cache=False,
+                                      cache_results=False, output_format=None):
     if snapshot_strategy is None:
         snapshot_strategy = SnapshotStrategy()
-    activity_manager = IdeaActivityManager(snapshot_strategy)
-    return load_activities_from_file('idea_activities_2018_10_15_to_2020_10_15.json', activity_manager)
+    activity_manager = IdeaActivityManager(snapshot_strategy, compact=compact)
+    return load_activities_from_file('idea_activities_2018_10_15_to_2020_10_15.json', activity_manager, processes,
+                                     use_cache, cache_results, output_format)
 
 
-def load_activities_from_file(file_name: str, activity_manager):
+def load_activities_from_file(file_name: str, activity_manager, processes=1, use_cache=False, cache_results=False,
+                              output_format=None):
+    """
+    :param processes: how many processes restore issues, see `ActivityManager.load_issues_from_activities_file`
+    :param use_cache: replay events recorded in `data/.cache` by the first load instead of parsing the file;
+    the cache is recorded in a single process
+    :param cache_results: keep restored snapshots in `data/.cache/snapshots` and return them without restoring
+    next time, while the file, the strategy and the custom field mapping stay the same
+    :param output_format: return tables of issues and comments instead of snapshot dicts: 'columns', 'numpy',
+    'arrow' or 'pandas', see `SnapshotStrategy.export`
+    """
     activities_file_path = "data/" + file_name
     if not path.exists('data'):
         os.mkdir('data')
     if not path.exists(activities_file_path):
+        # the archive is read as is, without extracting it
         zip_file_path = activities_file_path + ".zip"
-        _download_file(
-            'https://github.com/avokin2/datasets/raw/master/youtrack/' + file_name + '.zip',
-            zip_file_path)
+        if not path.exists(zip_file_path):
+            _download_file(
+                'https://github.com/avokin2/datasets/raw/master/youtrack/' + file_name + '.zip',
+                zip_file_path)
         if not path.exists(zip_file_path):
             raise Exception("Can't download issue activities")
+        if not zipfile.is_zipfile(zip_file_path):
+            raise Exception("Downloaded activities file is not a zip archive")
+        activities_file_path = zip_file_path
 
-        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-            zip_ref.extractall("data")
-
-    if not path.exists(activities_file_path):
-        raise Exception("Failed to unzip activities file")
+    result_cache = ResultCache(RESULT_CACHE_DIRECTORY) if cache_results else None
+    if result_cache is None or not result_cache.load(activities_file_path, activity_manager):
+        if use_cache:
+            load_with_cache(activities_file_path, activity_manager, CACHE_DIRECTORY)
+        else:
+            activity_manager.load_issues_from_activities_file(activities_file_path, processes=processes)
+        if result_cache is not None:
+            result_cache.save(activities_file_path, activity_manager)
 
-    activity_manager.load_issues_from_activities_file(activities_file_path)
+    if output_format is not None:
+        return activity_manager.snapshot_strategy.export(output_format)
     return activity_manager.snapshot_strategy.issues
 
 
@@ -0,0 +1,91 @@
+from jetbrains_issues_dataset.idea import columnar
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy, process_removed_field
+
+
+class MultiSnapshotStrategy(SnapshotStrategy):
+    """
+    Passes every event to several strategies, so different snapshots of the same dataset are restored in one pass.
+    `issues` is the list of `issues` of the strategies, in the same order. Every strategy gets its own copies of
+    lists and dicts, since strategies change them in place.
+    """
+
+    accepts_removed_field_timestamp = True
+
+    def __init__(self, strategies):
+        self.strategies = list(strategies)
+
+    @property
+    def issues(self):
+        return [strategy.issues for strategy in self.strategies]
+
+    def process_previous_attribute_values(self, issue):
+        for strategy in self.strategies:
+            strategy.process_previous_attribute_values(_detached_issue(issue))
+
+    def process_issue_created(self, issue, final_issue_state):
+        for strategy in self.strategies:
+            strategy.process_issue_created(_detached_issue(issue), final_issue_state)
+
+    def process_added_field(self, id, field, value, final_issue_state, timestamp):
+        for strategy in self.strategies:
+            strategy.process_added_field(id, field, _detached(value), final_issue_state, timestamp)
+
+    def process_removed_field(self, id, field, removed_value, final_issue_state, timestamp=None):
+        for strategy in self.strategies:
+            process_removed_field(strategy, id, field, _detached(removed_value), final_issue_state, timestamp)
+
+    def process_added_comment(self, comment):
+        for strategy in self.strategies:
+            strategy.process_added_comment(comment)
+
+    def cache_key(self):
+        return ','.join(strategy.cache_key() for strategy in self.strategies)
+
+    def cached_state(self):
+        return [strategy.cached_state() for strategy in self.strategies]
+
+    def restore_cached_state(self, state):
+        for strategy, strategy_state in zip(self.strategies, state):
+            strategy.restore_cached_state(strategy_state)
+
+    def pop_issue(self, issue_id):
+        """
+        :return: snapshots of the issue by every strategy, or None if no strategy knows the issue
+        """
+        snapshots = [strategy.pop_issue(issue_id) for strategy in self.strategies]
+        if all(snapshot is None for snapshot in snapshots):
+            return None
+        return snapshots
+
+    def add_issue(self, issue_id, snapshot):
+        for strategy, strategy_snapshot in zip(self.strategies, snapshot):
+            if strategy_snapshot is not None:
+                strategy.add_issue(issue_id, strategy_snapshot)
+
+    def pop_issue_history(self, issue_id):
+        histories = [strategy.pop_issue_history(issue_id) for strategy in self.strategies]
+        if all(history is None for history in histories):
+            return None
+        return histories
+
+    def add_issue_history(self, issue_id, history):
+        for strategy, strategy_history in zip(self.strategies, history):
+            if strategy_history is not None:
+                strategy.add_issue_history(issue_id, strategy_history)
+
+    def export(self, output_format, columns=columnar.DEFAULT_COLUMNS):
+        return [strategy.export(output_format, columns) for strategy in self.strategies]
+
+
+def _detached(value):
+    if isinstance(value, (list, dict)):
+        return value.copy()
+    return value
+
+
+def _detached_issue(issue):
+    issue = issue.copy()
+    for key, value in issue.items():
+        if isinstance(value, (list, dict)):
+            issue[key] = value.copy()
+    return issue
@@ -0,0 +1,199 @@
+from bisect import bisect_right
+from datetime import datetime
+
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+
+class FieldTimeline:
+    """
+    Changes of one field of an issue sorted by time: every change either adds or removes a value. Values of
+    a multi-value field are lists; its values after every change are collected once, at the first lookup after
+    the changes, so a lookup takes a binary search either way.
+    """
+
+    __slots__ = ('multivalue', 'timestamps', 'added', 'values', '_states')
+
+    def __init__(self, multivalue=False):
+        self.multivalue = multivalue
+        self.timestamps = []
+        self.added = []
+        self.values = []
+        self._states = None
+
+    def insert(self, timestamp, added, value):
+        # changes at the same moment keep their order, so a removal followed by an addition stays so
+        position = bisect_right(self.timestamps, timestamp)
+        self.timestamps.insert(position, timestamp)
+        self.added.insert(position, added)
+        self.values.insert(position, value)
+        self._states = None
+
+    def value_as_of(self, timestamp):
+        position = bisect_right(self.timestamps, timestamp)
+        if self.multivalue:
+            if self._states is None:
+                self._states = self._collect_states()
+            return list(self._states[position])
+        if position > 0:
+            return self.values[position - 1] if self.added[position - 1] else None
+        # the value before the first change is the removed one
+        return None if self.added[0] else self.values[0]
+
+    def _collect_states(self):
+        """
+        :return: values of the field before the first change and after every change
+        """
+        # like in `SnapshotStrategy`, values of a multi-value field are collected from its changes
+        value = []
+        states = [()]
+        for added, change in zip(self.added, self.values):
+            if added:
+                value.extend(change)
+            else:
+                for item in change:
+                    if item in value:
+                        value.remove(item)
+            states.append(tuple(value))
+        return states
+
+
+# fields of final states which change without activities of their own, so they are only known at the latest moment
+FINAL_STATE_ONLY_FIELDS = ('commentsCount', 'customFields', 'resolved', 'updated', 'downloadTimestamp')
+
+# what is kept of an issue besides its snapshot, see `pop_issue_history`
+HISTORY_FIELDS = ('timelines', 'comment_timelines', 'created_at', 'final_states', 'created_states')
+
+
+class PointInTimeSnapshotStrategy(SnapshotStrategy):
+    """
+    Restores the actual issue states like `SnapshotStrategy` and also keeps all changes of every issue in sorted
+    per-field timelines, so `as_of` returns issue states at any moment without replaying activities again.
+    Timelines are moved between processes with `pop_issue_history`, so loading in several processes works;
+    `iter_issues_from_activities_file` drops them with the issues it yields.
+    """
+
+    accepts_removed_field_timestamp = True
+    # timelines know whether their field is multi-value
+    cache_version = 2
+
+    def __init__(self):
+        super().__init__()
+        self.timelines = {}
+        self.comment_timelines = {}
+        self.created_at = {}
+        self.final_states = {}
+        self.created_states = {}
+        self.histories_dropped = False
+
+    def process_previous_attribute_values(self, issue):
+        super().process_previous_attribute_values(issue)
+        # after all activities, it is called with final states and then with states at the moment of creation
+        if 'created at' in issue and issue['id'] in self.issues:
+            self.created_at[issue['id']] = issue['created at']
+            self.created_states[issue['id']] = issue
+
+    def process_issue_created(self, issue, final_issue_state):
+        super().process_issue_created(issue, final_issue_state)
+        self.final_states[issue['id']] = final_issue_state
+
+    def process_added_field(self, id, field, value, final_issue_state, timestamp):
+        super().process_added_field(id, field, value, final_issue_state, timestamp)
+        self._timeline(id, field, value).insert(timestamp, True, value)
+
+    def process_removed_field(self, id, field, removed_value, final_issue_state, timestamp=None):
+        super().process_removed_field(id, field, removed_value, final_issue_state, timestamp=timestamp)
+        if timestamp is not None:
+            self._timeline(id, field, removed_value).insert(timestamp, False, removed_value)
+
+    def process_added_comment(self, comment):
+        super().process_added_comment(comment)
+        if comment['issue_id'] not in self.issues:
+            return
+        timestamps, comments = self.comment_timelines.setdefault(comment['issue_id'], ([], []))
+        position = bisect_right(timestamps, comment['timestamp'])
+        timestamps.insert(position, comment['timestamp'])
+        comments.insert(position, (comment['id'], comment['text']))
+
+    def cached_state(self):
+        return {'timelines': self.timelines, 'comment_timelines': self.comment_timelines,
+                'created_at': self.created_at, 'final_states': self.final_states,
+                'created_states': self.created_states}
+
+    def restore_cached_state(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def pop_issue_history(self, issue_id):
+        history = tuple(getattr(self, name).pop(issue_id, None) for name in HISTORY_FIELDS)
+        if all(issue_data is None for issue_data in history):
+            return None
+        self.histories_dropped = True
+        return history
+
+    def add_issue_history(self, issue_id, history):
+        for name, issue_data in zip(HISTORY_FIELDS, history):
+            if issue_data is not None:
+                getattr(self, name)[issue_id] = issue_data
+
+    def as_of(self, timestamp):
+        """
+        :return: states of issues created not later than `timestamp` at that moment, by issue id
+        """
+        if self.histories_dropped:
+            raise Exception('Timelines of issues were handed over with `pop_issue_history`, e.g., by '
+                            '`iter_issues_from_activities_file`; load issues with `load_issues_from_activities_file` '
+                            'to get their states at any moment')
+        return {issue_id: self.issue_as_of(issue_id, timestamp) for issue_id, created_at in self.created_at.items()
+                if created_at <= timestamp}
+
+    def issue_as_of(self, issue_id, timestamp):
+        """
+        State of the issue at the moment: values of changed fields are taken from their timelines, values of the
+        other fields from the final state and the state at the moment of creation, like in `SnapshotStrategy`.
+        Before the last change of the issue, `FINAL_STATE_ONLY_FIELDS` are left out, except for `commentsCount`,
+        which is counted, and `resolved`, if the issue was resolved by then.
+        """
+        snapshot = {'id': issue_id, 'id_readable': self.issues[issue_id]['id_readable'], 'comments': {}}
+        last_change = self.created_at.get(issue_id)
+        for field, timeline in self.timelines.get(issue_id, {}).items():
+            snapshot[field] = timeline.value_as_of(timestamp)
+            last_change = _latest(last_change, timeline.timestamps[-1])
+
+        if issue_id in self.comment_timelines:
+            timestamps, comments = self.comment_timelines[issue_id]
+            snapshot['comments'] = dict(comments[:bisect_right(timestamps, timestamp)])
+            last_change = _latest(last_change, timestamps[-1])
+
+        final_state = self.final_states.get(issue_id, {})
+        if final_state.get('updated') is not None:
+            last_change = _latest(last_change, _from_milliseconds(final_state['updated']))
+        if last_change is not None and timestamp < last_change:
+            final_state = {key: value for key, value in final_state.items() if key not in FINAL_STATE_ONLY_FIELDS}
+            snapshot['commentsCount'] = len(snapshot['comments'])
+            resolved = self.final_states.get(issue_id, {}).get('resolved')
+            if resolved is not None and _from_milliseconds(resolved) <= timestamp:
+                snapshot['resolved'] = resolved
+
+        for state in (final_state, self.created_states.get(issue_id, {})):
+            for key, value in state.items():
+                if key not in snapshot:
+                    snapshot[key] = value
+        return snapshot
+
+    def _timeline(self, issue_id, field, value):
+        issue_timelines = self.timelines.get(issue_id)
+        if issue_timelines is None:
+            issue_timelines = self.timelines[issue_id] = {}
+        timeline = issue_timelines.get(field)
+        if timeline is None:
+            timeline = issue_timelines[field] = FieldTimeline(isinstance(value, list))
+        return timeline
+
+
+def _latest(moment, other):
+    return other if moment is None or other > moment else moment
+
+
+def _from_milliseconds(timestamp):
+    # like `ActivityManager.get_datetime`
+    return datetime.fromtimestamp(int(timestamp / 1000))
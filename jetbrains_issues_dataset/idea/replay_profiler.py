@@ -0,0 +1,161 @@
+import time
+from collections import Counter
+
+from jetbrains_issues_dataset.idea.activity_index import _activity_issue_id
+
+PHASES = ('read', 'parse', 'final states', 'dispatch', 'strategy', 'final merge')
+
+# calls of ActivityManager to its snapshot strategy
+STRATEGY_CALLBACKS = ('process_issue_created', 'process_added_field', 'process_removed_field',
+                      'process_added_comment', 'process_previous_attribute_values')
+
+
+class ReplayProfiler:
+    """
+    Where `ActivityManager.load_issues_from_activities_file` spends its time, when passed as its `profiler`:
+    - seconds per phase: reading the file, parsing JSON, processing final states, dispatching activities in
+    ActivityManager, callbacks of the snapshot strategy while activities are dispatched, and the final merge with
+    `process_all_previous_attribute_values`;
+    - seconds per callback of the strategy, in all phases;
+    - the number of activities and seconds of dispatching them with strategy callbacks per activity `$type`;
+    - seconds and the number of activities per issue, for `slowest_issues`.
+    Loading without a profiler is not affected.
+    """
+
+    def __init__(self):
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.callback_seconds = Counter()
+        self.callback_counts = Counter()
+        self.type_counts = Counter()
+        self.type_seconds = Counter()
+        self.issue_seconds = Counter()
+        self.issue_activities = Counter()
+        self.total_seconds = 0.0
+        self._strategy_seconds = 0.0
+
+    def profile_load(self, activity_manager, elements, parse_seconds):
+        """
+        Replays elements like `load_issues_from_activities_file` does and measures it
+        :param elements: iterator of parsed elements
+        :param parse_seconds: returns the time spent in parsing so far
+        """
+        clock = time.perf_counter
+        load_start = clock()
+        read_and_parse_seconds = 0.0
+        strategy = activity_manager.snapshot_strategy
+        activity_manager.snapshot_strategy = _TimedStrategy(strategy, self)
+        try:
+            while True:
+                start = clock()
+                element = next(elements, None)
+                read_and_parse_seconds += clock() - start
+                if element is None:
+                    break
+
+                element_type = element['element_type']
+                if element_type == 'issue':
+                    start = clock()
+                    activity_manager.process_issue_final_state(element)
+                    self.phase_seconds['final states'] += clock() - start
+                elif element_type == 'activity':
+                    strategy_before = self._strategy_seconds
+                    start = clock()
+                    activity_manager._apply_activity(element)
+                    seconds = clock() - start
+                    strategy_seconds = self._strategy_seconds - strategy_before
+                    self.phase_seconds['dispatch'] += seconds - strategy_seconds
+                    self.phase_seconds['strategy'] += strategy_seconds
+                    activity_type = element.get('$type')
+                    self.type_counts[activity_type] += 1
+                    self.type_seconds[activity_type] += seconds
+                    issue_id = _activity_issue_id(element)
+                    self.issue_seconds[issue_id] += seconds
+                    self.issue_activities[issue_id] += 1
+
+            start = clock()
+            activity_manager.process_all_previous_attribute_values()
+            self.phase_seconds['final merge'] += clock() - start
+        finally:
+            activity_manager.snapshot_strategy = strategy
+
+        self.phase_seconds['parse'] += parse_seconds()
+        self.phase_seconds['read'] += read_and_parse_seconds - parse_seconds()
+        self.total_seconds += clock() - load_start
+
+    def timed_parser(self, parser):
+        """
+        :return: the parser which also counts its time, and a function returning the time counted so far
+        """
+        clock = time.perf_counter
+        seconds = [0.0]
+
+        def parse(line):
+            start = clock()
+            try:
+                return parser(line)
+            finally:
+                seconds[0] += clock() - start
+        return parse, lambda: seconds[0]
+
+    def slowest_issues(self, n=10):
+        """
+        :return: (issue id, seconds, number of activities) of issues which took the longest to replay
+        """
+        return [(issue_id, seconds, self.issue_activities[issue_id])
+                for issue_id, seconds in self.issue_seconds.most_common(n)]
+
+    def to_dict(self, n_slowest=10):
+        return {'total_seconds': self.total_seconds, 'phases': dict(self.phase_seconds),
+                'callbacks': {name: {'calls': self.callback_counts[name], 'seconds': self.callback_seconds[name]}
+                              for name in self.callback_counts},
+                'activity_types': {activity_type: {'count': count, 'seconds': self.type_seconds[activity_type]}
+                                   for activity_type, count in self.type_counts.items()},
+                'slowest_issues': [{'id': issue_id, 'seconds': seconds, 'activities': activities}
+                                   for issue_id, seconds, activities in self.slowest_issues(n_slowest)]}
+
+    def report(self, n_slowest=10):
+        total = self.total_seconds or 1
+        lines = [f'Replay took {self.total_seconds:.2f} s']
+        lines += [f'  {phase:<34} {seconds:9.3f} s {100 * seconds / total:6.1f}%'
+                  for phase, seconds in self.phase_seconds.items()]
+        lines.append('Strategy callbacks')
+        lines += [f'  {name:<34} {self.callback_seconds[name]:9.3f} s {count:9} calls'
+                  for name, count in self.callback_counts.most_common()]
+        lines.append('Activities by $type, with strategy callbacks')
+        lines += [f'  {str(activity_type):<34} {self.type_seconds[activity_type]:9.3f} s {count:9} activities'
+                  for activity_type, count in sorted(self.type_counts.items(),
+                                                     key=lambda item: -self.type_seconds[item[0]])]
+        lines.append('Slowest issues')
+        lines += [f'  {str(issue_id):<34} {seconds:9.3f} s {activities:9} activities'
+                  for issue_id, seconds, activities in self.slowest_issues(n_slowest)]
+        return '\n'.join(lines)
+
+
+class _TimedStrategy:
+    """
+    Stands in for the snapshot strategy of a profiled ActivityManager and times the calls it makes
+    """
+
+    def __init__(self, strategy, profiler):
+        self._strategy = strategy
+        self._profiler = profiler
+        for name in STRATEGY_CALLBACKS:
+            setattr(self, name, self._timed(name, getattr(strategy, name)))
+
+    def __getattr__(self, name):
+        return getattr(self._strategy, name)
+
+    def _timed(self, name, callback):
+        profiler = self._profiler
+        clock = time.perf_counter
+
+        def call(*args, **kwargs):
+            start = clock()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                seconds = clock() - start
+                profiler._strategy_seconds += seconds
+                profiler.callback_seconds[name] += seconds
+                profiler.callback_counts[name] += 1
+        return call
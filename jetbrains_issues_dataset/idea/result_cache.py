@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from jetbrains_issues_dataset.idea.event_cache import file_hash
+from jetbrains_issues_dataset.idea.multi_snapshot_strategy import MultiSnapshotStrategy
+
+RESULT_EXTENSION = '.snapshots'
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+
+
+class ResultCache:
+    """
+    Restored snapshots of datasets, pickled. A result is found by a hash of the dataset file, the strategy (see
+    `SnapshotStrategy.cache_key`), the custom field mapping and the compact mode of the activity manager. When the
+    results take more than `max_size` bytes, the least recently used ones are removed.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def load(self, file_path, activity_manager):
+        """
+        Puts cached snapshots into the strategy of the activity manager
+        :return: False if there are no cached snapshots
+        """
+        result_file = self._result_file(file_path, activity_manager)
+        if not os.path.exists(result_file):
+            return False
+        with open(result_file, 'rb') as reader:
+            result = pickle.load(reader)
+        # the modification time marks the last use
+        os.utime(result_file)
+        _restore(activity_manager, activity_manager.snapshot_strategy, result['issues'])
+        activity_manager.snapshot_strategy.restore_cached_state(result['state'])
+        return True
+
+    def save(self, file_path, activity_manager):
+        result_file = self._result_file(file_path, activity_manager)
+        temp_file = result_file + '.tmp'
+        with open(temp_file, 'wb') as writer:
+            pickle.dump({'issues': activity_manager.snapshot_strategy.issues,
+                         'state': activity_manager.snapshot_strategy.cached_state()},
+                        writer, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, result_file)
+        self.evict()
+
+    def evict(self):
+        results = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(RESULT_EXTENSION):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                results.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum(size for _, size, _ in results)
+        for _, size, name in sorted(results):
+            if total_size <= self.max_size:
+                break
+            logging.info(f'Removing cached snapshots {name}')
+            os.remove(os.path.join(self.cache_dir, name))
+            total_size -= size
+
+    def _result_file(self, file_path, activity_manager):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = {'file': file_hash(file_path, self.cache_dir), 'strategy': activity_manager.snapshot_strategy.cache_key(),
+               'mapping': activity_manager.custom_field_mapping, 'compact': activity_manager.compact}
+        key = hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{os.path.basename(file_path)}.{key}{RESULT_EXTENSION}')
+
+
+def _restore(activity_manager, strategy, issues):
+    if isinstance(strategy, MultiSnapshotStrategy):
+        for child_strategy, child_issues in zip(strategy.strategies, issues):
+            _restore(activity_manager, child_strategy, child_issues)
+        return
+    for issue_id, snapshot in issues.items():
+        strategy.add_issue(issue_id, activity_manager._unpickled(snapshot))
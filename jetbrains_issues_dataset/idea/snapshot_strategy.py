@@ -1,4 +1,13 @@
+from jetbrains_issues_dataset.idea import columnar
+
+
 class SnapshotStrategy:
+    # part of the key of cached results, see `ResultCache`; increase it in a subclass when its snapshots change
+    cache_version = 1
+    # whether `process_removed_field` takes the `timestamp` of the change; strategies written before it was added
+    # don't, so it is only passed to strategies which set this, see `process_removed_field`
+    accepts_removed_field_timestamp = False
+
     def __init__(self):
         self.issues = {}
 
@@ -40,7 +49,7 @@ class SnapshotStrategy:
             else:
                 snapshot_issue[field] = value
 
-    def process_removed_field(self, id, field, removed_value, final_issue_state):
+    def process_removed_field(self, id, field, removed_value, final_issue_state, timestamp=None):
         self.process({'id': id, field: removed_value}, final_issue_state)
         self.process_previous_attribute_values({'id': id, field: removed_value})
 
@@ -65,6 +74,54 @@ class SnapshotStrategy:
     def process(self, issue, final_issue_state):
         pass
 
+    def cache_key(self):
+        """
+        Identifies snapshots restored by this strategy among cached results; a strategy with parameters affecting its
+        snapshots should add them
+        """
+        return f'{type(self).__module__}.{type(self).__qualname__}:{self.cache_version}'
+
+    def cached_state(self):
+        """
+        State of a strategy kept with cached results besides `issues`, see `ResultCache`
+        """
+        return None
+
+    def restore_cached_state(self, state):
+        pass
+
+    def pop_issue(self, issue_id):
+        """
+        Removes a restored issue and returns its snapshot, or None if the issue is unknown
+        """
+        return self.issues.pop(issue_id, None)
+
+    def add_issue(self, issue_id, snapshot):
+        """
+        Puts a snapshot restored elsewhere, e.g., in another process; the opposite of `pop_issue`
+        """
+        self.issues[issue_id] = snapshot
+
+    def pop_issue_history(self, issue_id):
+        """
+        Removes and returns what the strategy keeps of the issue besides its snapshot, or None if nothing;
+        moved together with the snapshot, see `add_issue_history`
+        """
+        return None
+
+    def add_issue_history(self, issue_id, history):
+        """
+        Puts what `pop_issue_history` returned elsewhere
+        """
+        pass
+
+    def export(self, output_format, columns=columnar.DEFAULT_COLUMNS):
+        """
+        Restored snapshots as tables of issues and comments, see `columnar.export`
+        :param output_format: 'columns', 'numpy', 'arrow' or 'pandas'
+        """
+        return columnar.export(self.issues, output_format, columns)
+
     def _get_snapshot_issue_to_process(self, issue_id):
         if issue_id not in self.issues:
             return None
@@ -72,3 +129,13 @@ class SnapshotStrategy:
         if self.is_snapshot_taken(snapshot_issue):
             return None
         return snapshot_issue
+
+
+def process_removed_field(strategy, id, field, removed_value, final_issue_state, timestamp):
+    """
+    Passes a removed value to the strategy, with the timestamp of the change if the strategy accepts it
+    """
+    if strategy.accepts_removed_field_timestamp:
+        strategy.process_removed_field(id, field, removed_value, final_issue_state, timestamp=timestamp)
+    else:
+        strategy.process_removed_field(id, field, removed_value, final_issue_state)
@@ -0,0 +1,144 @@
+import gzip
+import io
+import json
+import os
+import zipfile
+
+GZIP_EXTENSIONS = ('.gz',)
+ZSTD_EXTENSIONS = ('.zst', '.zstd')
+ZIP_EXTENSIONS = ('.zip',)
+
+JSON_BACKENDS = ('auto', 'orjson', 'ujson', 'json')
+
+# how many bytes of lines are read at once
+READ_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def open_jsonl(file_path, mode='r'):
+    """
+    Opens a JSON lines file of issues and activities, compressed or not, depending on the extension:
+     * `.gz` - gzip
+     * `.zst`, `.zstd` - zstandard, requires the `zstandard` package
+     * `.zip` - the dataset inside a zip archive, read without extracting it; only reading is supported
+    Appending to a compressed file adds a new gzip member or zstandard frame, so the file stays valid after every
+    closed write and can be truncated back to the size it had after any of them.
+    :param mode: `r`, `w` or `a` for text in utf-8, or the same with `b` for bytes
+    """
+    binary = 'b' in mode
+    raw_mode = mode.replace('b', '').replace('t', '').replace('+', '')
+    assert raw_mode in ('r', 'w', 'a'), f'mode `{mode}` is not supported'
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in GZIP_EXTENSIONS:
+        stream = gzip.open(file_path, raw_mode + 'b')
+    elif extension in ZSTD_EXTENSIONS:
+        stream = _open_zstd(file_path, raw_mode)
+    elif extension in ZIP_EXTENSIONS:
+        assert raw_mode == 'r', 'zip archives can only be read'
+        stream = _open_zip_member(file_path)
+    elif binary:
+        return open(file_path, raw_mode + 'b')
+    else:
+        return open(file_path, raw_mode, encoding='utf-8')
+
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def json_parser(backend='auto'):
+    """
+    Returns a function parsing a JSON document from bytes or str.
+    :param backend: `orjson` or `ujson` for the fast parsers from the packages with the same names, `json` for the
+    standard library, `auto` for the fastest of the installed ones. Documents a fast parser rejects (e.g., with
+    integers beyond 64 bits) are parsed with the standard library.
+    """
+    assert backend in JSON_BACKENDS, f'JSON backend must be one of {", ".join(JSON_BACKENDS)}, not `{backend}`'
+    for name in ('orjson', 'ujson'):
+        if backend not in ('auto', name):
+            continue
+        try:
+            module = __import__(name)
+        except ImportError:
+            if backend == name:
+                raise
+            continue
+        return _with_fallback(module.loads)
+    return json.loads
+
+
+def read_jsonl(file_path, parser=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields parsed elements of a JSON lines file (see `open_jsonl` for supported formats). Lines are read as bytes in
+    chunks of about `chunk_size` bytes and are not decoded before parsing, unless the parser is `json.loads`, which
+    is faster with decoded lines read one by one.
+    :param parser: function parsing a line, `json_parser()` by default
+    """
+    if parser is None:
+        parser = json_parser()
+    if parser is json.loads:
+        with open_jsonl(file_path, 'r') as reader:
+            for line in reader:
+                if not line.isspace():
+                    yield parser(line)
+        return
+    with open_jsonl(file_path, 'rb') as reader:
+        while True:
+            lines = reader.readlines(chunk_size)
+            if not lines:
+                break
+            for line in lines:
+                if not line.isspace():
+                    yield parser(line)
+
+
+def temp_path(file_path, tag):
+    """
+    Returns a path next to `file_path` with the same compression, e.g. `a.json.gz` -> `a.json.tag.gz`
+    """
+    root, extension = os.path.splitext(file_path)
+    if extension.lower() in GZIP_EXTENSIONS + ZSTD_EXTENSIONS:
+        return f'{root}.{tag}{extension}'
+    return f'{file_path}.{tag}'
+
+
+def _open_zstd(file_path, mode):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f'Package `zstandard` is required to read and write {file_path}')
+
+    if mode == 'r':
+        # appended writes produce several frames, all of them have to be read
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), read_across_frames=True,
+                                                            closefd=True)
+        # the decompressor can not read lines by itself
+        return io.BufferedReader(reader)
+    return zstandard.open(file_path, mode + 'b')
+
+
+def _with_fallback(loads):
+    def parse(document):
+        try:
+            return loads(document)
+        except ValueError:
+            return json.loads(document)
+    return parse
+
+
+def _open_zip_member(file_path):
+    """
+    Opens the member named like the archive without `.zip`, or the only member of the archive
+    """
+    with zipfile.ZipFile(file_path, 'r') as archive:
+        names = [name for name in archive.namelist() if not name.endswith('/')]
+        expected_name = os.path.basename(os.path.splitext(file_path)[0])
+        matching_names = [name for name in names if os.path.basename(name) == expected_name]
+        if matching_names:
+            name = matching_names[0]
+        elif len(names) == 1:
+            name = names[0]
+        else:
+            raise ValueError(f'{file_path} has several files, none of them is named {expected_name}')
+        # the member keeps the archive file open after the archive object is closed
+        return archive.open(name, 'r')
@@ -0,0 +1,107 @@
+import datetime
+import json
+import os
+
+CHECKPOINT_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class CheckpointState:
+    def __init__(self):
+        self.params = None
+        self.completed_windows = []
+        self.pending_window = None
+        self.completed_issues = set()
+        self.file_sizes = {}
+
+    @property
+    def resume_from(self):
+        if not self.completed_windows:
+            return None
+        return self.completed_windows[-1][1]
+
+
+class DownloadCheckpoint:
+    """
+    Append-only manifest of a crawl stored next to the downloaded files. Every line is a JSON record written after
+    a piece of work is completely on disk:
+     * `start` - parameters of the crawl
+     * `window` - issues of a time window are written, with the ids of these issues
+     * `issue` - activities of a single issue are written
+     * `window_done` - activities of all issues of the window are written
+    Every record also stores sizes of the output files, so a resumed crawl can cut off anything written after the
+    last record and append to the files safely.
+    """
+
+    def __init__(self, checkpoint_file, output_files):
+        self.checkpoint_file = checkpoint_file
+        self.output_files = sorted(set(file for file in output_files if file is not None))
+
+    def exists(self):
+        return os.path.exists(self.checkpoint_file) and os.path.getsize(self.checkpoint_file) > 0
+
+    def start(self, **params):
+        with open(self.checkpoint_file, 'w', encoding='utf-8'):
+            pass
+        self._append({'event': 'start', 'params': params})
+
+    def window_started(self, start, end, issue_ids):
+        self._append({'event': 'window', 'start': start.strftime(CHECKPOINT_DATE_FORMAT),
+                      'end': end.strftime(CHECKPOINT_DATE_FORMAT), 'issue_ids': issue_ids})
+
+    def issue_done(self, issue_id):
+        self._append({'event': 'issue', 'issue_id': issue_id})
+
+    def window_done(self, start, end):
+        self._append({'event': 'window_done', 'start': start.strftime(CHECKPOINT_DATE_FORMAT),
+                      'end': end.strftime(CHECKPOINT_DATE_FORMAT)})
+
+    def load(self) -> CheckpointState:
+        state = CheckpointState()
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as reader:
+            for line in reader:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last record may be cut off if the process was killed while writing it
+                    break
+                event = record['event']
+                if event == 'start':
+                    state.params = record['params']
+                elif event == 'window':
+                    state.pending_window = (_parse_date(record['start']), _parse_date(record['end']),
+                                            record['issue_ids'])
+                    state.completed_issues = set()
+                elif event == 'issue':
+                    state.completed_issues.add(record['issue_id'])
+                elif event == 'window_done':
+                    state.completed_windows.append((_parse_date(record['start']), _parse_date(record['end'])))
+                    state.pending_window = None
+                    state.completed_issues = set()
+                state.file_sizes = record['file_sizes']
+        return state
+
+    def restore(self) -> CheckpointState:
+        """
+        Reads the manifest and truncates output files to their sizes at the moment of the last record
+        """
+        state = self.load()
+        for file, size in state.file_sizes.items():
+            actual_size = os.path.getsize(file) if os.path.exists(file) else 0
+            if actual_size < size:
+                raise Exception(f'{file} has {actual_size} bytes, but {size} bytes are recorded in '
+                                f'{self.checkpoint_file}; the crawl can not be resumed')
+            with open(file, 'ab') as writer:
+                writer.truncate(size)
+        return state
+
+    def _append(self, record):
+        record['file_sizes'] = {file: os.path.getsize(file) if os.path.exists(file) else 0
+                                for file in self.output_files}
+        with open(self.checkpoint_file, 'a', encoding='utf-8') as writer:
+            writer.write(json.dumps(record) + '\n')
+            writer.flush()
+            os.fsync(writer.fileno())
+
+
+def _parse_date(value):
+    return datetime.datetime.strptime(value, CHECKPOINT_DATE_FORMAT)
@@ -4,18 +4,26 @@ from urllib import parse
 import re
 
 import urllib3
-from dateutil.relativedelta import relativedelta
 import logging
+from tqdm import tqdm
 
-from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+from jetbrains_issues_dataset.jsonl import open_jsonl
+from jetbrains_issues_dataset.youtrack_loader.checkpoint import DownloadCheckpoint
+from jetbrains_issues_dataset.youtrack_loader.metrics import CrawlMetrics
+from jetbrains_issues_dataset.youtrack_loader.paging import AdaptivePaging
+from jetbrains_issues_dataset.youtrack_loader.windows import AdaptiveWindows, fixed_windows
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack, FIELD_PROFILES
 
-logging.basicConfig(format='%(asctime)s %(message)s', filename='download.log', level=getattr(logging, 'DEBUG'))
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 def download_data(youtrack: YouTrack, snapshot_start_time: datetime.datetime, snapshot_end_time: datetime.datetime,
                   query: str, issues_snapshot_file: str = None, activities_snapshot_file: str = None, load_issues=True,
-                  load_activities=True, direction='asc', order_by='created', query_type='common'):
+                  load_activities=True, direction='asc', order_by='created', query_type='common', concurrency=1,
+                  checkpoint_file: str = None, resume=False, adaptive_windows=False, target_issues_per_window=1000,
+                  min_window=datetime.timedelta(hours=1), max_window=datetime.timedelta(days=90),
+                  activities_mode='per_issue', fields_profile: str = None, parquet_dir: str = None,
+                  progress=False, prometheus_file: str = None):
     """
     Most parameters have reasonable defaults set below in the CLI argument parser. Minimum working command from CLI if
     working from source:
@@ -24,21 +32,33 @@ def download_data(youtrack: YouTrack, snapshot_start_time: datetime.datetime, sn
     :param youtrack: instance of the YouTrack client
     :param snapshot_start_time: earliest possible issue creation timestamp
     :param snapshot_end_time: latest possible issue creation timestamp
-    :param issues_snapshot_file: where to write issues; can be the same as `activities_snapshot_file`
+    :param issues_snapshot_file: where to write issues; can be the same as `activities_snapshot_file`;
+    compressed if the name ends with `.gz` or `.zst`
     :param activities_snapshot_file: where to write activity items; can be the same as `issues_snapshot_file`
     :param query: query to filter issues; e.g., use `#IDEA` to obtain all IDEA issues
     :param load_issues: whether to load current issue states
     :param load_activities: whether to load activities
     :param direction: download order: asc (from oldest to newest, default) or desc (from newest to oldest)
     :param order_by: download order criteria: order by when issue was created or by when it was last updated
+    :param concurrency: how many issues' activities are downloaded in parallel
+    :param checkpoint_file: where to record completed windows and issues; required to resume the crawl later
+    :param resume: continue the crawl recorded in `checkpoint_file` instead of starting from scratch
+    :param adaptive_windows: whether to choose window lengths by the number of issues in them instead of
+    downloading week by week
+    :param target_issues_per_window: how many issues an adaptive window should have
+    :param min_window: the shortest adaptive window, used even if it has more than `target_issues_per_window` issues
+    :param max_window: the longest adaptive window
+    :param activities_mode: `per_issue` to request activities issue by issue (default), `bulk` to request activities
+    of all issues of a window at once; in `bulk` mode the number of requests depends on the number of activities
+    rather than issues, but an interrupted window is downloaded again from its start
+    :param fields_profile: which fields and activity categories to request, see `FIELD_PROFILES` in youtrack.py;
+    the default profile of `youtrack` if not given
+    :param parquet_dir: if given, issues and activities are also written into a Parquet dataset in this directory,
+    see `ParquetSink`; requires the pyarrow package
+    :param progress: whether to show the progress of the crawl with its ETA in the console
+    :param prometheus_file: where to write metrics of `youtrack.metrics` in the Prometheus text format after every
+    window
     """
-    if load_issues:
-        with open(issues_snapshot_file, 'w', encoding='utf-8') as writer:
-            pass
-    if load_activities:
-        with open(activities_snapshot_file, 'w', encoding='utf-8') as writer:
-            pass
-
     assert snapshot_start_time < snapshot_end_time, f'No issues created after {snapshot_start_time} and before {snapshot_end_time}'
     if direction == 'asc':
         direction_flag = 1
@@ -47,40 +67,156 @@ def download_data(youtrack: YouTrack, snapshot_start_time: datetime.datetime, sn
         snapshot_start_time, snapshot_end_time = snapshot_end_time, snapshot_start_time
     else:
         raise ValueError(f'direction must be either `asc` or `desc`; `{direction}` not recognized')
+    crawl_start_time, crawl_end_time = snapshot_start_time, snapshot_end_time
 
     assert order_by in ['created', 'updated'], f'We can order by `created` or `updated` timestamp, `{order_by}` not allowed'
+    assert activities_mode in ['per_issue', 'bulk'], f'Activities can be loaded `per_issue` or in `bulk`, `{activities_mode}` not allowed'
+
+    checkpoint = None
+    if checkpoint_file is not None:
+        checkpoint = DownloadCheckpoint(checkpoint_file, [issues_snapshot_file if load_issues else None,
+                                                          activities_snapshot_file if load_activities else None])
+    crawl_params = {'query': query, 'order_by': order_by, 'direction': direction, 'query_type': query_type,
+                    'load_issues': load_issues, 'load_activities': load_activities,
+                    'activities_mode': activities_mode, 'fields_profile': fields_profile}
+
+    pending_window = None
+    completed_issues = set()
+    if resume and checkpoint is not None and checkpoint.exists():
+        state = checkpoint.restore()
+        if state.params != crawl_params:
+            raise ValueError(f'{checkpoint_file} records a crawl with parameters {state.params}, '
+                             f'it can not be resumed with {crawl_params}')
+        if state.resume_from is not None:
+            snapshot_start_time = state.resume_from
+        pending_window = state.pending_window
+        completed_issues = state.completed_issues
+        logging.info(f'Resuming from {snapshot_start_time}, {len(state.completed_windows)} windows completed')
+    else:
+        if load_issues:
+            with open_jsonl(issues_snapshot_file, 'w') as writer:
+                pass
+        if load_activities:
+            with open_jsonl(activities_snapshot_file, 'w') as writer:
+                pass
+        if checkpoint is not None:
+            checkpoint.start(**crawl_params)
+
+    if adaptive_windows:
+        def count_issues(window_start, window_end):
+            return youtrack.count_issues(_timed_query(query, query_type, order_by, window_start, window_end))
+        windows = AdaptiveWindows(count_issues, target_issues=target_issues_per_window, min_window=min_window,
+                                  max_window=max_window)
+    else:
+        windows = fixed_windows
+
+    def windows_to_process():
+        start_time = snapshot_start_time
+        if pending_window is not None:
+            # the window was interrupted after its issues had been written
+            yield pending_window
+            start_time = pending_window[1]
+        for window in windows(start_time, snapshot_end_time, direction_flag):
+            yield window + (None,)
+
+    sink = None
+    if parquet_dir is not None:
+        from jetbrains_issues_dataset.youtrack_loader.parquet_sink import ParquetSink
+        sink = ParquetSink(parquet_dir)
+
+    metrics = youtrack.metrics
+    if metrics is None and (progress or prometheus_file is not None):
+        # requests of this crawl are measured even if the client has no metrics of its own
+        metrics = youtrack.metrics = CrawlMetrics()
+        own_metrics = True
+    else:
+        own_metrics = False
+    progress_bar = tqdm(total=100, unit='%', bar_format='{l_bar}{bar}| {elapsed}<{remaining}{postfix}') \
+        if progress else None
 
     total_issues = 0
     total_activities = 0
     processing_start_time = datetime.datetime.now()
-    current_end_date = snapshot_start_time
-    while (direction_flag > 0 and snapshot_start_time < snapshot_end_time) or (direction_flag < 0 and snapshot_start_time > snapshot_end_time):
-        current_end_date += relativedelta(weeks=1 * direction_flag)
-        if (direction_flag > 0 and current_end_date > snapshot_end_time) or (direction_flag < 0 and current_end_date < snapshot_end_time):
-            current_end_date = snapshot_end_time
-
-        start = snapshot_start_time.strftime('%Y-%m-%dT%H:%M:%S')
-        end = current_end_date.strftime('%Y-%m-%dT%H:%M:%S')
+    try:
+        for window_start, window_end, issues in windows_to_process():
+            if metrics is not None:
+                metrics.window_started()
+            window_issues = 0
+            n_activities = 0
+            timed_query = _timed_query(query, query_type, order_by, window_start, window_end)
+            logging.info(f"Processing from: {window_start} to: {window_end}, query: {timed_query}")
 
-        timed_query = f"{query} {'' if query_type == 'common' else 'and'} {order_by}: {start} .. {end}"
-        logging.info(f"Processing from: {start} to: {end}, query: {timed_query}")
+            if issues is not None:
+                logging.info(f'{len(issues)} issues were loaded before restart')
+            elif load_issues:
+                issues = youtrack.download_issues(parse.quote_plus(timed_query), issues_snapshot_file,
+                                                  return_ids=True, profile=fields_profile, sink=sink)
+                logging.info(f'Loaded {len(issues)} issues')
+                total_issues += len(issues)
+                window_issues = len(issues)
+                if checkpoint is not None:
+                    checkpoint.window_started(window_start, window_end, issues)
+            else:
+                issues = []
 
-        if load_issues:
-            issues = youtrack.download_issues(parse.quote_plus(timed_query), issues_snapshot_file, return_ids=True)
-            logging.info(f'Loaded {len(issues)} issues')
-            total_issues += len(issues)
-        else:
-            n_issues = 1
-
-        if load_activities and len(issues) > 0:
-            # n_activities = youtrack.download_activities(parse.quote_plus(timed_query), activities_snapshot_file)
-            n_activities = youtrack.download_activities_per_issue(issues, activities_snapshot_file)
-            logging.info(f'Loaded {n_activities} activities')
-            total_activities += n_activities
-        snapshot_start_time = current_end_date
+            if load_activities and len(issues) > 0 and activities_mode == 'bulk':
+                n_activities = youtrack.download_activities(parse.quote_plus(timed_query), activities_snapshot_file,
+                                                            issue_ids=issues, profile=fields_profile, sink=sink)
+                logging.info(f'Loaded {n_activities} activities')
+                total_activities += n_activities
+            elif load_activities and len(issues) > 0:
+                remaining_issues = [issue_id for issue_id in issues if issue_id not in completed_issues]
+                n_activities = youtrack.download_activities_per_issue(
+                    remaining_issues, activities_snapshot_file, concurrency=concurrency,
+                    on_issue_done=checkpoint.issue_done if checkpoint is not None else None, profile=fields_profile,
+                    sink=sink)
+                logging.info(f'Loaded {n_activities} activities')
+                total_activities += n_activities
+            completed_issues = set()
+            if sink is not None:
+                # issues created later, and so their activities, all come after the window
+                finished = direction_flag == 1 and order_by == 'created'
+                sink.window_done(int(window_end.timestamp() * 1000) if finished else None)
+            if checkpoint is not None:
+                checkpoint.window_done(window_start, window_end)
+            if metrics is not None:
+                done = (window_end - crawl_start_time) / (crawl_end_time - crawl_start_time)
+                window = metrics.window_done(window_start, window_end, window_issues, n_activities, done)
+                logging.info(f'Window took {window["seconds"]:.1f} s, {window["requests"]} requests, '
+                             f'{window["bytes"]} bytes; ETA {_format_eta(window["eta_seconds"])}')
+                if progress_bar is not None:
+                    progress_bar.update(round(100 * done) - progress_bar.n)
+                    progress_bar.set_postfix(issues=metrics.issues, activities=metrics.activities,
+                                             requests=sum(metrics.requests.values()), refresh=True)
+                if prometheus_file is not None:
+                    metrics.write_prometheus(prometheus_file)
+    finally:
+        # rows written so far stay readable even if the crawl fails
+        if sink is not None:
+            sink.close()
+        if progress_bar is not None:
+            progress_bar.close()
+        if own_metrics:
+            youtrack.metrics = None
 
     logging.info(f'Loaded {total_issues} issues and {total_activities} activity items '
           f'in {str(datetime.datetime.now() - processing_start_time)}')
+    if metrics is not None:
+        summary = metrics.summary()
+        logging.info(f'{summary["requests"]} requests, {summary["bytes"]} bytes, {summary["retries"]} retries, '
+                     f'{summary["server_errors"]} server errors')
+
+
+def _format_eta(seconds):
+    if seconds is None:
+        return 'unknown'
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+def _timed_query(query, query_type, order_by, start, end):
+    start = start.strftime('%Y-%m-%dT%H:%M:%S')
+    end = end.strftime('%Y-%m-%dT%H:%M:%S')
+    return f"{query} {'' if query_type == 'common' else 'and'} {order_by}: {start} .. {end}"
 
 
 def cur_time():
@@ -116,8 +252,10 @@ def main():
 
     parser.add_argument('--start',
                         help="earliest issue timestamp in format 1970-01-01T10:00:00 "
-                             "(YouTrack search query date format; note the T between date and time)",
-                        required=True,
+                             "(YouTrack search query date format; note the T between date and time); "
+                             "with --sync, issues updated after it are synchronized if there is no synchronization "
+                             "state yet",
+                        required=False,
                         type=youtrack_date
                         )
     parser.add_argument('--end',
@@ -157,6 +295,59 @@ def main():
                              'if `formal`, additional query parameters are joined by `and` operator '
                              '(example: `your_query and created: 2021-01-01 .. 2021-01-02`)',
                         choices=['common', 'formal'], default='common')
+    parser.add_argument('--concurrency',
+                        help='how many issues\' activities are downloaded in parallel; default is 1',
+                        type=int, default=1)
+    parser.add_argument('--activities-mode',
+                        help='how to request activities: `per_issue` (default) for one issue per request, '
+                             '`bulk` for all issues of a window per request',
+                        choices=['per_issue', 'bulk'], default='per_issue')
+    parser.add_argument('--compression',
+                        help='compress downloaded files with gzip (`gz`) or zstandard (`zst`, requires the zstandard '
+                             'package); not compressed by default',
+                        choices=['gz', 'zst'])
+    parser.add_argument('--fields-profile',
+                        help='which fields and activity categories to request: `full` (default), `minimal` '
+                             '(only what is needed to restore issue snapshots) or `comments`',
+                        choices=sorted(FIELD_PROFILES), default='full')
+    parser.add_argument('--parquet-dir',
+                        help='if specified, issues and activities are also written into a Parquet dataset in this '
+                             'directory, partitioned by project and month (requires the pyarrow package)')
+    parser.add_argument('--log-file', help='where to write the log; default is download.log', default='download.log')
+    parser.add_argument('--progress', help='if specified, show the progress of the crawl with its ETA',
+                        action='store_true')
+    parser.add_argument('--metrics-jsonl',
+                        help='if specified, every request, retry and window is recorded in this file as a JSON line')
+    parser.add_argument('--metrics-prometheus',
+                        help='if specified, request latency histograms, bytes, retries and the progress of the crawl '
+                             'are written into this file in the Prometheus text format after every window')
+    parser.add_argument('--adaptive-paging',
+                        help='if specified, `$top` of every endpoint grows and shrinks between --min-page-size and '
+                             '--max-page-size by latency and size of responses, and shrinks after timeouts; '
+                             'pages have 1000 items otherwise',
+                        action='store_true')
+    parser.add_argument('--min-page-size', help='the smallest adaptive page; default is 50', type=int, default=50)
+    parser.add_argument('--max-page-size', help='the largest adaptive page; default is 5000', type=int, default=5000)
+    parser.add_argument('--adaptive-windows',
+                        help='if specified, the crawl advances in windows of about --target-issues issues '
+                             'instead of one week',
+                        action='store_true')
+    parser.add_argument('--target-issues', help='how many issues an adaptive window should have; default is 1000',
+                        type=int, default=1000)
+    parser.add_argument('--min-window-hours', help='the shortest adaptive window in hours; default is 1',
+                        type=float, default=1)
+    parser.add_argument('--max-window-days', help='the longest adaptive window in days; default is 90',
+                        type=float, default=90)
+    parser.add_argument('--resume',
+                        help='if specified, continue the crawl recorded in filename.checkpoint.json: completed '
+                             'windows and issues are skipped and new data is appended to the existing files',
+                        action='store_true')
+    parser.add_argument('--sync',
+                        help='if specified, bring the existing dataset up to date instead of downloading it: '
+                             'issues updated since the last synchronization and their new activities are merged '
+                             'into filename.issues.json and filename.activities.json; '
+                             'the state is kept in filename.sync.json',
+                        action='store_true')
     parser.add_argument('--query',
                         help='query to filter issues; default is #IDEA',
                         nargs='*',
@@ -164,13 +355,30 @@ def main():
                         )
 
     args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s %(message)s', filename=args.log_file, level=logging.DEBUG)
     print(args)
+    if args.start is None and not args.sync:
+        parser.error('--start is required')
+    if args.filename is None and args.sync:
+        parser.error('--filename of the existing dataset is required with --sync')
+    if datetime.timedelta(hours=args.min_window_hours) > datetime.timedelta(days=args.max_window_days):
+        parser.error('--min-window-hours must not be longer than --max-window-days')
+    if not 0 < args.min_page_size <= args.max_page_size:
+        parser.error('--min-page-size must be positive and not larger than --max-page-size')
 
     if os.path.exists(args.access_token):
         access_token = open(args.access_token, 'r').read().strip()
     else:
         access_token = args.access_token
-    youtrack = YouTrack(args.server_address, access_token)
+    metrics = None
+    if args.progress or args.metrics_jsonl or args.metrics_prometheus:
+        metrics = CrawlMetrics(args.metrics_jsonl)
+    paging = None
+    if args.adaptive_paging:
+        paging = AdaptivePaging(initial=min(max(1000, args.min_page_size), args.max_page_size),
+                                min_size=args.min_page_size, max_size=args.max_page_size)
+    youtrack = YouTrack(args.server_address, access_token, pool_size=max(10, args.concurrency),
+                        fields_profile=args.fields_profile, metrics=metrics, paging=paging)
 
     query = ' '.join(args.query)
 
@@ -181,13 +389,33 @@ def main():
     root, ext = os.path.splitext(filename)
     if not ext:
         ext = '.json'
+    if args.compression:
+        ext += f'.{args.compression}'
     issues_snapshot_file = f'{root}.issues{ext}'
     activities_snapshot_file = f'{root}.activities{ext}'
+    checkpoint_file = f'{root}.checkpoint.json'
+
+    if args.sync:
+        from jetbrains_issues_dataset.youtrack_loader.sync import sync_data
+        sync_data(youtrack=youtrack, query=query, issues_snapshot_file=issues_snapshot_file,
+                  activities_snapshot_file=activities_snapshot_file, state_file=f'{root}.sync.json',
+                  since=args.start, query_type=args.query_type, concurrency=args.concurrency)
+    else:
+        download_data(youtrack=youtrack, snapshot_start_time=args.start, snapshot_end_time=args.end, query=query,
+                      issues_snapshot_file=issues_snapshot_file, activities_snapshot_file=activities_snapshot_file,
+                      load_issues=not args.no_issues, load_activities=not args.no_activities,
+                      direction=args.direction, order_by=args.order_by, query_type=args.query_type,
+                      concurrency=args.concurrency, checkpoint_file=checkpoint_file, resume=args.resume,
+                      adaptive_windows=args.adaptive_windows, target_issues_per_window=args.target_issues,
+                      min_window=datetime.timedelta(hours=args.min_window_hours),
+                      max_window=datetime.timedelta(days=args.max_window_days),
+                      activities_mode=args.activities_mode, parquet_dir=args.parquet_dir, progress=args.progress,
+                      prometheus_file=args.metrics_prometheus)
 
-    download_data(youtrack=youtrack, snapshot_start_time=args.start, snapshot_end_time=args.end, query=query,
-                  issues_snapshot_file=issues_snapshot_file, activities_snapshot_file=activities_snapshot_file,
-                  load_issues=not args.no_issues, load_activities=not args.no_activities, direction=args.direction,
-                  order_by=args.order_by, query_type=args.query_type)
+    if metrics is not None:
+        if args.metrics_prometheus:
+            metrics.write_prometheus(args.metrics_prometheus)
+        metrics.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,226 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+# upper bounds of latency buckets in seconds, like the default buckets of Prometheus clients with longer tails
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# ids in request paths, so requests of different issues are counted for the same endpoint
+_PATH_ID = re.compile(r'/[0-9]+-[0-9]+(?=/|$)')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+    def to_dict(self):
+        return {'buckets': dict(zip(map(str, self.buckets), self.cumulative_counts())), 'sum': self.sum,
+                'count': self.count}
+
+
+class CrawlMetrics:
+    """
+    Collects what a crawl spends its time on: latency, statuses and sizes of responses per endpoint, retries,
+    activity pages per issue, and throughput of every window with the ETA of the crawl. Used by `YouTrack` for
+    requests and by `download_data` for windows; safe to use from several threads.
+    :param jsonl_file: if given, every request, retry and window is also appended to this file as a JSON line
+    """
+
+    def __init__(self, jsonl_file=None):
+        self.latency = {}
+        self.requests = Counter()
+        self.bytes_received = Counter()
+        self.retries = Counter()
+        self.pages_per_issue = Histogram(PAGE_BUCKETS)
+        self.windows = []
+        self.issues = 0
+        self.activities = 0
+        self.progress = 0.0
+        self.eta = None
+        self.start_time = time.time()
+        self._window_start = None
+        self._lock = threading.Lock()
+        self._writer = open(jsonl_file, 'a', encoding='utf-8') if jsonl_file is not None else None
+
+    @staticmethod
+    def endpoint(url):
+        """
+        :return: the path of the url in the API without the query and issue ids, e.g., `issues/{id}/activities`
+        """
+        path = url.split('?', 1)[0]
+        for api in ('/api/', '/rest/'):
+            if api in path:
+                path = path.split(api, 1)[1]
+                break
+        return _PATH_ID.sub('/{id}', '/' + path.rstrip('/'))[1:]
+
+    def observe_request(self, url, status, seconds, n_bytes):
+        """
+        :param status: HTTP status, or the name of the exception if there is no response
+        """
+        endpoint = self.endpoint(url)
+        with self._lock:
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            self.requests[endpoint, str(status)] += 1
+            self.bytes_received[endpoint] += n_bytes
+            self._write({'event': 'request', 'endpoint': endpoint, 'status': status, 'seconds': seconds,
+                         'bytes': n_bytes})
+
+    def observe_retry(self, url, reason):
+        endpoint = self.endpoint(url)
+        with self._lock:
+            self.retries[endpoint, str(reason)] += 1
+            self._write({'event': 'retry', 'endpoint': endpoint, 'reason': reason})
+
+    def observe_issue_pages(self, n_pages):
+        with self._lock:
+            self.pages_per_issue.observe(n_pages)
+
+    def window_started(self):
+        with self._lock:
+            self._window_start = (time.time(), sum(self.requests.values()), sum(self.bytes_received.values()))
+
+    def window_done(self, start, end, n_issues, n_activities, progress):
+        """
+        :param progress: which part of the crawled period is done after the window, from 0 to 1
+        """
+        now = time.time()
+        with self._lock:
+            window_start, requests_before, bytes_before = self._window_start or (self.start_time, 0, 0)
+            seconds = now - window_start
+            self.issues += n_issues
+            self.activities += n_activities
+            self.progress = progress
+            elapsed = now - self.start_time
+            self.eta = elapsed / progress * (1 - progress) if progress > 0 else None
+            window = {'event': 'window', 'start': str(start), 'end': str(end), 'seconds': seconds,
+                      'issues': n_issues, 'activities': n_activities,
+                      'requests': sum(self.requests.values()) - requests_before,
+                      'bytes': sum(self.bytes_received.values()) - bytes_before,
+                      'issues_per_second': n_issues / seconds if seconds > 0 else None,
+                      'activities_per_second': n_activities / seconds if seconds > 0 else None,
+                      'progress': progress, 'eta_seconds': self.eta}
+            self.windows.append(window)
+            self._write(window)
+        return window
+
+    def server_errors(self):
+        with self._lock:
+            return self._server_errors()
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.time() - self.start_time
+            n_requests = sum(self.requests.values())
+            return {'seconds': elapsed, 'requests': n_requests,
+                    'requests_per_second': n_requests / elapsed if elapsed > 0 else None,
+                    'bytes': sum(self.bytes_received.values()), 'retries': sum(self.retries.values()),
+                    'server_errors': self._server_errors(),
+                    'issues': self.issues, 'activities': self.activities, 'windows': len(self.windows),
+                    'latency': {endpoint: histogram.to_dict() for endpoint, histogram in self.latency.items()},
+                    'pages_per_issue': self.pages_per_issue.to_dict()}
+
+    def write_prometheus(self, file_path):
+        """
+        Writes the metrics in the Prometheus text format, e.g., for the textfile collector of node exporter;
+        the file is replaced at once, so it is never read half-written
+        """
+        lines = []
+        with self._lock:
+            lines += _histogram_lines('youtrack_request_duration_seconds', 'Latency of requests to YouTrack',
+                                      {(('endpoint', endpoint),): histogram
+                                       for endpoint, histogram in sorted(self.latency.items())})
+            lines += _counter_lines('youtrack_requests_total', 'Responses by status, or errors without a response',
+                                    {(('endpoint', endpoint), ('status', status)): count
+                                     for (endpoint, status), count in sorted(self.requests.items())})
+            lines += _counter_lines('youtrack_response_bytes_total', 'Bytes of response bodies',
+                                    {(('endpoint', endpoint),): count
+                                     for endpoint, count in sorted(self.bytes_received.items())})
+            lines += _counter_lines('youtrack_retries_total', 'Repeated requests by reason',
+                                    {(('endpoint', endpoint), ('reason', reason)): count
+                                     for (endpoint, reason), count in sorted(self.retries.items())})
+            lines += _histogram_lines('youtrack_activity_pages_per_issue', 'Pages of activities of an issue',
+                                      {(): self.pages_per_issue})
+            lines += _gauge_lines('youtrack_crawl_issues', 'Issues downloaded in completed windows', self.issues)
+            lines += _gauge_lines('youtrack_crawl_activities', 'Activities downloaded in completed windows',
+                                  self.activities)
+            lines += _gauge_lines('youtrack_crawl_windows', 'Completed windows', len(self.windows))
+            lines += _gauge_lines('youtrack_crawl_progress_ratio', 'Part of the crawled period done', self.progress)
+            if self.eta is not None:
+                lines += _gauge_lines('youtrack_crawl_eta_seconds', 'Expected time until the crawl is done',
+                                      self.eta)
+
+        temp_file = file_path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as writer:
+            writer.write('\n'.join(lines) + '\n')
+        os.replace(temp_file, file_path)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _server_errors(self):
+        return sum(count for (_, status), count in self.requests.items() if status.startswith('5'))
+
+    def _write(self, record):
+        if self._writer is not None:
+            record['time'] = time.time()
+            self._writer.write(json.dumps(record) + '\n')
+            self._writer.flush()
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name, help_text, histograms):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, histogram in histograms.items():
+        for bucket, count in zip(histogram.buckets, histogram.cumulative_counts()):
+            lines.append(f'{name}_bucket{_labels(labels + (("le", bucket),))} {count}')
+        lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+    return lines
+
+
+def _counter_lines(name, help_text, counters):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for labels, count in counters.items():
+        lines.append(f'{name}{_labels(labels)} {count}')
+    return lines
+
+
+def _gauge_lines(name, help_text, value):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
@@ -0,0 +1,65 @@
+import logging
+import threading
+
+
+class AdaptivePaging:
+    """
+    Chooses `$top` of paged requests for every endpoint separately, e.g., `issues` or `issues/{id}/activities`, see
+    `CrawlMetrics.endpoint`. A page grows after a full page which took well below `target_seconds` and `max_bytes`,
+    shrinks to fit them after a page which took more, and is cut back after a timeout. Sizes only change in response to
+    pages requested with the current size, so concurrent requests of an endpoint do not compound the change.
+    Safe to use from several threads.
+    :param initial: `$top` of the first request of every endpoint
+    :param min_size: the smallest page, requested even if it is slower than `target_seconds`
+    :param max_size: the largest page
+    :param target_seconds: how long a page may take
+    :param max_bytes: how large the body of a page may be
+    :param step: how many times a page grows, and shrinks at least after a timeout
+    """
+
+    def __init__(self, initial=1000, min_size=50, max_size=5000, target_seconds=10.0, max_bytes=16 * 1024 * 1024,
+                 step=2.0):
+        assert 0 < min_size <= initial <= max_size, 'Expected min_size <= initial <= max_size'
+        assert step > 1, 'Expected step > 1'
+        self.initial = initial
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.step = step
+        self.sizes = {}
+        self._lock = threading.Lock()
+
+    def page_size(self, endpoint):
+        with self._lock:
+            return self.sizes.get(endpoint, self.initial)
+
+    def observe(self, endpoint, top, n_items, seconds, n_bytes):
+        """
+        :param top: `$top` the page was requested with
+        :param n_items: how many items the page has
+        :param seconds: latency of the response
+        :param n_bytes: size of the body of the response
+        """
+        ratio = max(seconds / self.target_seconds, n_bytes / self.max_bytes)
+        with self._lock:
+            size = self.sizes.get(endpoint, self.initial)
+            if ratio > 1 and n_items > 0:
+                # the cost of a page grows with its items, so fewer items fit into the targets
+                self._resize(endpoint, min(size, int(n_items / ratio)))
+            elif n_items >= top and ratio * self.step < 1:
+                self._resize(endpoint, max(size, int(top * self.step)))
+
+    def timed_out(self, endpoint, top):
+        """
+        :param top: `$top` of the request which timed out
+        """
+        with self._lock:
+            self._resize(endpoint, min(self.sizes.get(endpoint, self.initial), int(top / self.step)))
+
+    def _resize(self, endpoint, size):
+        size = min(self.max_size, max(self.min_size, size))
+        previous = self.sizes.get(endpoint, self.initial)
+        if size != previous:
+            logging.info(f'Page size of {endpoint}: {previous} -> {size}')
+        self.sizes[endpoint] = size
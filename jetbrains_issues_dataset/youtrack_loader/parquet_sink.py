@@ -0,0 +1,219 @@
+import datetime
+import os
+import uuid
+from collections import OrderedDict
+
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+# partition of rows without a project or a timestamp, as named by Hive and understood by Arrow datasets
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+class ParquetSink:
+    """
+    Writes downloaded issues and activities into a Parquet dataset besides the JSONL files, so they can be queried
+    without parsing JSON. The dataset has three tables, partitioned by project and month in Hive style, e.g.,
+    `issues/project=IDEA/month=2021-01/part-<id>.parquet`:
+    - `issues`: one row per issue with its plain fields, by the month of creation;
+    - `issue_fields`: one row per value of a custom field of an issue, partitioned like its issue;
+    - `activities`: one row per activity with added and removed values as lists of strings, by the month of the
+    activity.
+    Rows are kept in memory per partition until there are `row_group_size` of them and then written as a row group.
+    A partition file stays open until its month is finished, see `window_done`, or until more than `max_open_files`
+    files are open; rows of the partition written later go to another file. Every sink writes new files; an
+    interrupted and resumed crawl may write rows of the interrupted window twice.
+    """
+
+    def __init__(self, directory, row_group_size=10000, max_open_files=64):
+        assert max_open_files > 0, 'Expected max_open_files > 0'
+        self.directory = directory
+        self.row_group_size = row_group_size
+        self.max_open_files = max_open_files
+        self._pyarrow = _import_pyarrow()
+        self._file_id = uuid.uuid4().hex
+        self._n_files = 0
+        self._buffers = {}
+        # the least recently written first
+        self._writers = OrderedDict()
+        # activities do not always have the project of their issue, it is taken from the issue written in the window
+        self._issue_projects = {}
+
+    def write_issues(self, issues):
+        for issue in issues:
+            project = (issue.get('project') or {}).get('shortName')
+            self._issue_projects[issue['id']] = project
+            month = _month(issue.get('created'))
+            self._append('issues', project, month, flatten_issue(issue))
+            for row in flatten_issue_fields(issue):
+                self._append('issue_fields', project, month, row)
+
+    def write_activities(self, activities):
+        for activity in activities:
+            row = flatten_activity(activity)
+            project = self._issue_projects.get(row['issue_id'])
+            if project is None:
+                project = ((activity.get('target') or {}).get('project') or {}).get('shortName')
+            self._append('activities', project, _month(row['timestamp']), row)
+
+    def window_done(self, finished_before=None):
+        """
+        Forgets issues of the window once its activities are written
+        :param finished_before: timestamp in milliseconds before which no more rows will come, e.g., the end of the
+        window when issues are downloaded by creation from the oldest; files of earlier months are closed, files of
+        rows without a timestamp stay open since any window may add to them
+        """
+        self._issue_projects = {}
+        if finished_before is None:
+            return
+        month = _month(finished_before)
+        for partition in list(self._buffers) + list(self._writers):
+            partition_month = partition[2]
+            if partition_month != DEFAULT_PARTITION and partition_month < month:
+                self._close_partition(partition)
+
+    def flush(self):
+        for partition in list(self._buffers):
+            self._write_row_group(partition)
+
+    def close(self):
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _append(self, table, project, month, row):
+        partition = (table, project or DEFAULT_PARTITION, month)
+        rows = self._buffers.setdefault(partition, [])
+        rows.append(row)
+        if len(rows) >= self.row_group_size:
+            self._write_row_group(partition)
+
+    def _write_row_group(self, partition):
+        rows = self._buffers.pop(partition, None)
+        if not rows:
+            return
+        table, project, month = partition
+        schema = self._schema(table)
+        columns = {name: [row[name] for row in rows] for name in schema.names}
+        row_group = self._pyarrow.Table.from_pydict(columns, schema=schema)
+
+        writer = self._writers.get(partition)
+        if writer is None:
+            while len(self._writers) >= self.max_open_files:
+                self._writers.popitem(last=False)[1].close()
+            directory = os.path.join(self.directory, table, f'project={project}', f'month={month}')
+            os.makedirs(directory, exist_ok=True)
+            file_path = os.path.join(directory, f'part-{self._file_id}-{self._n_files}.parquet')
+            self._n_files += 1
+            writer = self._writers[partition] = self._pyarrow.parquet.ParquetWriter(file_path, schema)
+        else:
+            self._writers.move_to_end(partition)
+        writer.write_table(row_group, row_group_size=len(rows))
+
+    def _close_partition(self, partition):
+        self._write_row_group(partition)
+        writer = self._writers.pop(partition, None)
+        if writer is not None:
+            writer.close()
+
+    def _schema(self, table):
+        pa = self._pyarrow
+        timestamp = pa.timestamp('ms')
+        if table == 'issues':
+            return pa.schema([('id', pa.string()), ('id_readable', pa.string()), ('project', pa.string()),
+                              ('summary', pa.string()), ('description', pa.string()), ('created', timestamp),
+                              ('resolved', timestamp), ('reporter', pa.string()), ('comments_count', pa.int32()),
+                              ('download_timestamp', timestamp)])
+        if table == 'issue_fields':
+            return pa.schema([('issue_id', pa.string()), ('field', pa.string()), ('value', pa.string())])
+        return pa.schema([('id', pa.string()), ('issue_id', pa.string()), ('type', pa.string()),
+                          ('target_member', pa.string()), ('field', pa.string()), ('timestamp', timestamp),
+                          ('author', pa.string()), ('added', pa.list_(pa.string())),
+                          ('removed', pa.list_(pa.string())), ('download_timestamp', timestamp)])
+
+
+def flatten_issue(issue):
+    """
+    :return: a row of the `issues` table; timestamps stay in milliseconds
+    """
+    return {'id': issue['id'],
+            'id_readable': issue.get('idReadable'),
+            'project': (issue.get('project') or {}).get('shortName'),
+            'summary': issue.get('summary'),
+            'description': issue.get('description'),
+            'created': issue.get('created'),
+            'resolved': issue.get('resolved'),
+            'reporter': _value_name(issue.get('reporter')),
+            'comments_count': issue.get('commentsCount'),
+            'download_timestamp': issue.get('downloadTimestamp')}
+
+
+def flatten_issue_fields(issue):
+    """
+    :return: rows of the `issue_fields` table, one per value of every custom field; an empty field has no rows
+    """
+    rows = []
+    for custom_field in issue.get('customFields') or []:
+        for value in _value_names(custom_field.get('value')):
+            rows.append({'issue_id': issue['id'], 'field': custom_field.get('name'), 'value': value})
+    return rows
+
+
+def flatten_activity(activity):
+    """
+    :return: a row of the `activities` table
+    """
+    issue_id = activity.get('issue_id')
+    if issue_id is None:
+        issue_id = YouTrack.activity_issue_id(activity)
+    return {'id': activity['id'],
+            'issue_id': issue_id,
+            'type': activity.get('$type'),
+            'target_member': activity.get('targetMember'),
+            'field': (activity.get('field') or {}).get('name'),
+            'timestamp': activity.get('timestamp'),
+            'author': _value_name(activity.get('author')),
+            'added': _value_names(activity.get('added')),
+            'removed': _value_names(activity.get('removed')),
+            'download_timestamp': activity.get('download_timestamp')}
+
+
+def _value_names(value):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [name for name in map(_value_name, value) if name is not None]
+
+
+def _value_name(value):
+    # users are identified by logins, other entities by names; comments only have texts
+    if isinstance(value, dict):
+        for key in ('login', 'name', 'text', 'id'):
+            if value.get(key) is not None:
+                return str(value[key])
+        return None
+    if value is None:
+        return None
+    return str(value)
+
+
+def _month(timestamp):
+    if timestamp is None:
+        return DEFAULT_PARTITION
+    return datetime.datetime.fromtimestamp(timestamp / 1000, datetime.timezone.utc).strftime('%Y-%m')
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Package `pyarrow` is required to write Parquet files')
+    return pyarrow
@@ -0,0 +1,166 @@
+import datetime
+import json
+import logging
+import os
+
+from jetbrains_issues_dataset.jsonl import open_jsonl, read_jsonl, temp_path
+from jetbrains_issues_dataset.youtrack_loader.download_activities import download_data
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+SYNC_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class SyncState:
+    """
+    What is already in the dataset: the moment of the last synchronization and, for every known issue,
+    the timestamp of its newest stored activity (0 if the issue has no activities). `merging` is set while new
+    elements are merged into the dataset files, so after a crash the next merge drops what is already there.
+    """
+
+    def __init__(self, query, high_water_mark, issues=None, merging=False):
+        self.query = query
+        self.high_water_mark = high_water_mark
+        self.issues = {} if issues is None else issues
+        self.merging = merging
+
+    @staticmethod
+    def load(state_file):
+        with open(state_file, 'r', encoding='utf-8') as reader:
+            state = json.load(reader)
+        return SyncState(state['query'], datetime.datetime.strptime(state['high_water_mark'], SYNC_DATE_FORMAT),
+                         state['issues'], state.get('merging', False))
+
+    @staticmethod
+    def from_dataset(query, issues_snapshot_file, activities_snapshot_file, since=None):
+        """
+        Builds the state of a dataset downloaded without synchronization. Unless `since` is given, the high-water
+        mark is the earliest download timestamp in the dataset, so nothing changed during the crawl is missed.
+        """
+        issues = {}
+        earliest_download = None
+        for element in _read_elements(issues_snapshot_file, activities_snapshot_file):
+            download_timestamp = element.get('downloadTimestamp', element.get('download_timestamp'))
+            if download_timestamp is not None and (earliest_download is None or download_timestamp < earliest_download):
+                earliest_download = download_timestamp
+            if element['element_type'] == 'issue':
+                issues.setdefault(element['id'], 0)
+            else:
+                issue_id = element['issue_id']
+                issues[issue_id] = max(issues.get(issue_id, 0), element['timestamp'])
+
+        if since is None:
+            if earliest_download is None:
+                raise ValueError('The dataset has no download timestamps, the start of synchronization must be given')
+            since = datetime.datetime.fromtimestamp(earliest_download / 1000)
+        return SyncState(query, since, issues)
+
+    def save(self, state_file):
+        temp_file = state_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as writer:
+            json.dump({'query': self.query, 'high_water_mark': self.high_water_mark.strftime(SYNC_DATE_FORMAT),
+                       'issues': self.issues, 'merging': self.merging}, writer)
+        os.replace(temp_file, state_file)
+
+
+def sync_data(youtrack: YouTrack, query: str, issues_snapshot_file: str, activities_snapshot_file: str,
+              state_file: str, since: datetime.datetime = None, query_type='common', concurrency=1,
+              overlap=datetime.timedelta(hours=1)):
+    """
+    Brings an existing dataset up to date: downloads issues updated since the last synchronization and only those
+    of their activities which are newer than the newest stored one, then merges them into the dataset files.
+    Updated issue records replace the stored ones in place, so every issue is still followed by its activities when
+    issues and activities share one file.
+    :param state_file: where the synchronization state is kept between runs
+    :param since: where to start if there is no state yet; by default, derived from download timestamps of the dataset
+    :param overlap: how far before the high-water mark to look, to tolerate clock skew; duplicates are dropped anyway
+    """
+    if os.path.exists(state_file):
+        state = SyncState.load(state_file)
+        if state.query != query:
+            raise ValueError(f'{state_file} was created for query `{state.query}`, not `{query}`')
+    else:
+        state = SyncState.from_dataset(query, issues_snapshot_file, activities_snapshot_file, since)
+
+    sync_start_time = datetime.datetime.now()
+    updated_issues_file = temp_path(issues_snapshot_file, 'sync-issues')
+    new_activities_file = temp_path(activities_snapshot_file, 'sync-activities')
+    logging.info(f'Synchronizing issues updated since {state.high_water_mark}')
+    download_data(youtrack, state.high_water_mark - overlap, sync_start_time, query,
+                  issues_snapshot_file=updated_issues_file, load_activities=False, order_by='updated',
+                  query_type=query_type)
+
+    updated_issues = {}
+    for issue in _read_elements(updated_issues_file):
+        updated_issues[issue['id']] = issue
+
+    with open_jsonl(new_activities_file, 'w'):
+        pass
+    n_activities = youtrack.download_activities_per_issue(list(updated_issues), new_activities_file,
+                                                          concurrency=concurrency, since=state.issues)
+    logging.info(f'{len(updated_issues)} issues updated, {n_activities} new activities')
+
+    # a merge interrupted by a crash has left some of the same elements in the files already
+    deduplicate = state.merging
+    state.merging = True
+    state.save(state_file)
+    _merge(issues_snapshot_file, activities_snapshot_file, updated_issues, new_activities_file, state, deduplicate)
+
+    for activity in _read_elements(new_activities_file):
+        issue_id = activity['issue_id']
+        state.issues[issue_id] = max(state.issues.get(issue_id, 0), activity['timestamp'])
+    for issue_id in updated_issues:
+        state.issues.setdefault(issue_id, 0)
+    state.high_water_mark = sync_start_time
+    state.merging = False
+    state.save(state_file)
+
+    os.remove(updated_issues_file)
+    os.remove(new_activities_file)
+    return len(updated_issues), n_activities
+
+
+def _merge(issues_snapshot_file, activities_snapshot_file, updated_issues, new_activities_file, state,
+           deduplicate=False):
+    """
+    :param deduplicate: whether issues and activities may already be in the files; then only issue records which
+    are not there are appended, and only activities with ids which are not there
+    """
+    stored_issues = None
+    if deduplicate or any(issue_id in state.issues for issue_id in updated_issues):
+        # stored issue records are replaced with the new ones where they are
+        stored_issues = set()
+        merged_file = temp_path(issues_snapshot_file, 'merged')
+        with open_jsonl(issues_snapshot_file, 'r') as reader, open_jsonl(merged_file, 'w') as writer:
+            for line in reader:
+                element = json.loads(line)
+                if element['element_type'] == 'issue' and element['id'] in updated_issues:
+                    stored_issues.add(element['id'])
+                    line = _to_line(updated_issues[element['id']])
+                writer.write(line)
+        os.replace(merged_file, issues_snapshot_file)
+
+    with open_jsonl(issues_snapshot_file, 'a') as writer:
+        for issue_id, issue in updated_issues.items():
+            if issue_id not in (state.issues if stored_issues is None else stored_issues):
+                writer.write(_to_line(issue))
+
+    stored_activities = set()
+    if deduplicate:
+        for element in read_jsonl(activities_snapshot_file):
+            if element['element_type'] == 'activity' and element['issue_id'] in updated_issues:
+                stored_activities.add(element['id'])
+    with open_jsonl(activities_snapshot_file, 'a') as writer, open_jsonl(new_activities_file, 'r') as reader:
+        for line in reader:
+            if not stored_activities or json.loads(line)['id'] not in stored_activities:
+                writer.write(line)
+
+
+def _read_elements(*files):
+    for file in sorted(set(file for file in files if file is not None)):
+        if not os.path.exists(file):
+            continue
+        yield from read_jsonl(file)
+
+
+def _to_line(element):
+    return json.dumps(element, ensure_ascii=False).encode('utf-8', 'replace').decode('utf-8') + '\n'
@@ -0,0 +1,71 @@
+import datetime
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+
+def fixed_windows(start, end, direction_flag, step=relativedelta(weeks=1)):
+    """
+    Splits the range from `start` to `end` into windows of the same length, the last one may be shorter
+    """
+    while (direction_flag > 0 and start < end) or (direction_flag < 0 and start > end):
+        window_end = _clamp(start + step * direction_flag, end, direction_flag)
+        yield start, window_end
+        start = window_end
+
+
+class AdaptiveWindows:
+    """
+    Splits the range into windows with about `target_issues` issues each. Before a window is downloaded, its issues
+    are counted: a window with too many issues is shrunk and counted again, and after a sparse window the next one
+    is made longer, so both the number of requests and the `$skip` depth stay about the same for quiet and busy
+    periods. A window the server could not count, with a negative count, may be busy: it is halved down to
+    `min_window` and counted again, and the next window does not grow after it.
+    """
+
+    # how much longer the next window may become after a sparse one
+    MAX_GROWTH = 4
+
+    def __init__(self, count_issues, target_issues=1000, min_window=datetime.timedelta(hours=1),
+                 max_window=datetime.timedelta(days=90), initial_window=datetime.timedelta(weeks=1)):
+        """
+        :param count_issues: returns the number of issues in the window; called with the window start and end
+        :param initial_window: length of the first window, brought within the bounds
+        """
+        assert min_window <= max_window, 'min_window must not be longer than max_window'
+        self.count_issues = count_issues
+        self.target_issues = target_issues
+        self.min_window = min_window
+        self.max_window = max_window
+        self.initial_window = self._bounded(initial_window)
+
+    def __call__(self, start, end, direction_flag):
+        size = self.initial_window
+        while (direction_flag > 0 and start < end) or (direction_flag < 0 and start > end):
+            while True:
+                window_end = _clamp(start + size * direction_flag, end, direction_flag)
+                n_issues = self.count_issues(start, window_end)
+                if 0 <= n_issues <= self.target_issues or size <= self.min_window:
+                    break
+                if n_issues < 0:
+                    size = self._bounded(size / 2)
+                else:
+                    size = self._bounded(size * self.target_issues / n_issues)
+            logging.info(f'Window from {start} to {window_end} has '
+                         f'{n_issues if n_issues >= 0 else "an unknown number of"} issues')
+            yield start, window_end
+
+            if 0 <= n_issues < self.target_issues:
+                growth = self.target_issues / n_issues if n_issues > 0 else self.MAX_GROWTH
+                size = self._bounded(size * min(growth, self.MAX_GROWTH))
+            start = window_end
+
+    def _bounded(self, size):
+        size = datetime.timedelta(seconds=int(size.total_seconds()))
+        return min(self.max_window, max(self.min_window, size))
+
+
+def _clamp(window_end, end, direction_flag):
+    if (direction_flag > 0 and window_end > end) or (direction_flag < 0 and window_end < end):
+        return end
+    return window_end
@@ -1,10 +1,22 @@
 import datetime
+import email.utils
 import json
 import logging
+import os
+import random
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, List
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from jetbrains_issues_dataset.jsonl import GZIP_EXTENSIONS, open_jsonl, ZSTD_EXTENSIONS
+
+
+# how many characters of lines go into one gzip member or zstandard frame of a compressed activities file
+COMPRESSED_MEMBER_BYTES = 16 * 1024 * 1024
 
 
 class IssueWithProblemDownloader(Exception):
@@ -16,49 +28,13 @@ class IssueWithProblemDownloader(Exception):
         return self.message + f"for issue: {self.issue}"
 
 
-ISSUES_QUERY = "issues?query={query}&fields=" \
-               "id,idReadable,summary,description," \
+ISSUE_FIELDS = "id,idReadable,summary,description," \
                "project(shortName),created,resolved,reporter(login,fullName,ringId),commentsCount," \
                "customFields(id,name,value(id,name,login,ringId))," \
                "comments(id,created,text,author(login,name,ringId))," \
-               "links(direction,linkType(name,sourceToTarget,targetToSource,directed,aggregation),issues(id,idReadable))," \
-               "tags(id,name)" \
-               "&$skip={skip}&$top={top}"
-
-ACTIVITIES_QUERY = "activities/?issueQuery={}&categories=CommentsCategory,AttachmentsCategory,AttachmentRenameCategory," \
-                   "CustomFieldCategory,DescriptionCategory,IssueCreatedCategory,IssueResolvedCategory,LinksCategory," \
-                   "ProjectCategory,IssueVisibilityCategory,SprintCategory,SummaryCategory,TagsCategory" \
-                   "&fields=id,idReadable,timestamp,targetMember,target(id," \
-                   "reporter(login,name,ringId),created,idReadable,text,issue(id),customFields(id,name,value(id,name,login,ringId)))," \
-                   "memberName,added(id,login,name,text),removed(id,login,name,text)&$skip={}&$top={}"
-
-ACTIVITIES_PER_ISSUE_QUERY = "issues/{issue_id}/activities?categories=CommentsCategory,CommentTextCategory," \
-                 "AttachmentsCategory,AttachmentRenameCategory,CustomFieldCategory,DescriptionCategory," \
-                 "IssueCreatedCategory,IssueResolvedCategory,LinksCategory,ProjectCategory,IssueVisibilityCategory," \
-                 "SprintCategory,SummaryCategory,TagsCategory,CommentReactionCategory," \
-                 "VotersCategory,VcsChangeCategory" \
-                 "&fields=id,idReadable,timestamp,targetMember(id)," \
-                 "target(id,issue(id),name,project(id,shortName),branch,date," \
-                    "reporter(id,login,name,fullName,ringId,guest,email)," \
-                 "idReadable,text,issue(id)," \
-                 "votes," \
-                 "visibility(id,permittedGroups(id,name,ringId),permittedUsers(id,fullName,ringId,email))," \
-                 "created,resolved,customFields(id,name,value(id,name,login,ringId)))," \
-                 "memberName," \
-                 "category(id)," \
-                 "field(id,name)," \
-                 "added(id,name,login,ringId,email,value(id,name,login,ringId),reaction," \
-                    "text,bundle(id,name),project(id,shortName),numberInProject," \
-                    "state,files,fetched,version,urls,processors(id,project(id,shortName),server(id))," \
-                    "author(id,login,name,fullName,ringId,guest,email))," \
-                 "removed(id,name,login,ringId,email,value(id,name,login,ringId),reaction," \
-                    "text,bundle(id,name),project(id,shortName),numberInProject," \
-                    "state,files,fetched,version,urls,processors(id,project(id,shortName),server(id))," \
-                    "author(id,login,name,fullName,ringId,guest,email))," \
-                 "author(id,login,name,fullName,ringId,guest,email)" \
-                 "&$skip={skip}&$top={top}"
-
-
+               "links(direction,linkType(name,sourceToTarget,targetToSource,directed,aggregation)," \
+               "issues(id,idReadable))," \
+               "tags(id,name)"
 
 ALL_CATEGORIES = "CommentsCategory,CommentTextCategory," \
                  "AttachmentsCategory,AttachmentRenameCategory,CustomFieldCategory,DescriptionCategory," \
@@ -66,31 +42,81 @@ ALL_CATEGORIES = "CommentsCategory,CommentTextCategory," \
                  "SprintCategory,SummaryCategory,TagsCategory,CommentReactionCategory," \
                  "VotersCategory,VcsChangeCategory"
 
-ACTIVITIES_PER_ISSUE_QUERY = "issues/{issue_id}/activities?categories={categories}" \
-                 "&fields=id,idReadable,timestamp,targetMember(id)," \
-                 "target(id,issue(id),name,project(id,shortName),branch,date," \
+ACTIVITY_FIELDS = "id,idReadable,timestamp,targetMember(id)," \
+                  "target(id,issue(id),name,project(id,shortName),branch,date," \
                     "reporter(id,login,name,fullName,ringId,guest,email)," \
-                 "idReadable,text,issue(id)," \
-                 "votes," \
-                 "visibility(id,permittedGroups(id,name,ringId),permittedUsers(id,fullName,ringId,email))," \
-                 "created,resolved,customFields(id,name,value(id,name,login,ringId)))," \
-                 "memberName," \
-                 "category(id)," \
-                 "field(id,name)," \
-                 "added(id,name,login,ringId,email,value(id,name,login,ringId),reaction," \
+                  "idReadable,text,issue(id)," \
+                  "votes," \
+                  "visibility(id,permittedGroups(id,name,ringId),permittedUsers(id,fullName,ringId,email))," \
+                  "created,resolved,customFields(id,name,value(id,name,login,ringId)))," \
+                  "memberName," \
+                  "category(id)," \
+                  "field(id,name)," \
+                  "added(id,name,login,ringId,email,value(id,name,login,ringId),reaction," \
                     "text,bundle(id,name),project(id,shortName),numberInProject," \
                     "state,files,fetched,version,urls,processors(id,project(id,shortName),server(id))," \
                     "author(id,login,name,fullName,ringId,guest,email))," \
-                 "removed(id,name,login,ringId,email,value(id,name,login,ringId),reaction," \
+                  "removed(id,name,login,ringId,email,value(id,name,login,ringId),reaction," \
                     "text,bundle(id,name),project(id,shortName),numberInProject," \
                     "state,files,fetched,version,urls,processors(id,project(id,shortName),server(id))," \
                     "author(id,login,name,fullName,ringId,guest,email))," \
-                 "author(id,login,name,fullName,ringId,guest,email)" \
-                 "&$skip={skip}&$top={top}"
+                  "author(id,login,name,fullName,ringId,guest,email)"
+
+# Named sets of requested fields and activity categories. `minimal` is what ActivityManager needs to restore
+# snapshots, `comments` is enough to collect discussions of issues.
+FIELD_PROFILES = {
+    'full': {'issue_fields': ISSUE_FIELDS,
+             'activity_fields': ACTIVITY_FIELDS,
+             'categories': ALL_CATEGORIES},
+    'minimal': {'issue_fields': "id,idReadable,summary,description,project(shortName),created,resolved,"
+                                "reporter(login),customFields(name,value(name,login))",
+                'activity_fields': "id,timestamp,targetMember,"
+                                   "target(id,idReadable,text,issue(id),reporter(login),"
+                                   "customFields(name,value(name,login))),"
+                                   "added(name,login),removed(name,login)",
+                'categories': "CommentsCategory,CustomFieldCategory,DescriptionCategory,IssueCreatedCategory,"
+                              "IssueResolvedCategory,SummaryCategory"},
+    'comments': {'issue_fields': "id,idReadable,summary,project(shortName),created,"
+                                 "comments(id,created,text,author(login,name))",
+                 'activity_fields': "id,timestamp,targetMember,"
+                                    "target(id,created,text,issue(id),author(login,name)),"
+                                    "added(id,text),removed(id,text),author(login,name)",
+                 'categories': "CommentsCategory,CommentTextCategory"},
+}
+
+ISSUES_QUERY = "issues?query={query}&fields={fields}&$skip={skip}&$top={top}"
+
+ACTIVITIES_PER_ISSUE_QUERY = "issues/{issue_id}/activities?categories={categories}" \
+                             "&fields={fields}&$skip={skip}&$top={top}"
+
+ACTIVITIES_QUERY = "activities/?issueQuery={query}&categories={categories}&fields={fields}&$skip={skip}&$top={top}"
+
+ISSUE_COUNT_QUERY = "issuesGetter/count?fields=count"
+
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# the body of a response is not parsed, see `YouTrack._send`
+_NOT_PARSED = object()
 
 
 class YouTrack:
-    def __init__(self, url, token, page_size=1000):
+    def __init__(self, url, token, page_size=1000, pool_size=10, max_retries=5, backoff_factor=1.0, max_backoff=120,
+                 timeout=300, fields_profile='full', metrics=None, paging=None):
+        """
+        :param fields_profile: name of the default set of requested fields and categories from `FIELD_PROFILES`
+        :param pool_size: how many keep-alive connections to the server are kept open; should not be less than the
+        number of threads using the client
+        :param max_retries: how many times a request is repeated after a connection error, a timeout,
+        a 429 or a 5xx response
+        :param backoff_factor: the delay before the n-th retry is about `backoff_factor * 2 ** n` seconds with jitter,
+        unless the server asks for a specific delay with `Retry-After`
+        :param max_backoff: upper bound for a single delay between retries, in seconds
+        :param timeout: connect and read timeout of a single request, in seconds
+        :param metrics: if given, gets latency, status and size of every request and every retry, see `CrawlMetrics`
+        :param paging: if given, chooses `$top` of every page by latency and size of earlier pages of the endpoint
+        instead of `page_size`, see `AdaptivePaging`; a page which times out is requested again with a smaller size
+        """
         self.url = url
         self.new_api_url = url + "api/"
         self.old_api_url = url + "rest/"
@@ -101,97 +127,374 @@ class YouTrack:
             self.headers["Authorization"] = "Bearer {}".format(token)
 
         self.page_size = page_size
+        self.fields_profile = fields_profile
+        self._fields_profile(fields_profile)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.metrics = metrics
+        self.paging = paging
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
         self.activity_list_url = self.new_api_url + ACTIVITIES_QUERY
         self.issue_list_url = self.new_api_url + ISSUES_QUERY
         self.activities_per_issue_url = self.new_api_url + ACTIVITIES_PER_ISSUE_QUERY
+        self.issue_count_url = self.new_api_url + ISSUE_COUNT_QUERY
 
-    def download_activities_per_issue(self, issue_ids, file_path, categories=None, no_write_to_file=False):
+    def download_activities_per_issue(self, issue_ids, file_path, categories=None, no_write_to_file=False,
+                                      concurrency=1, on_issue_done=None, since=None, profile=None, sink=None):
+        """
+        Downloads activities of every issue from `issue_ids`.
+        :param concurrency: how many issues are downloaded in parallel; activities are still written issue by issue
+        in the order of `issue_ids`
+        :param on_issue_done: called with the issue id after all activities of the issue are written
+        :param since: maps issue ids to timestamps in milliseconds; only activities after these timestamps are loaded
+        :param profile: name of the set of requested fields and categories, the client's default if not given
+        :param sink: also gets downloaded activities with `write_activities`, e.g., `ParquetSink`
+        """
         total_activities = 0
         downloaded_activies = []
-        for i, issue_id in enumerate(issue_ids):
-            skip = 0
-            while True:
-                needed_categories = ALL_CATEGORIES if categories is None else categories
-                request_url = self.activities_per_issue_url.format(issue_id=issue_id, categories=needed_categories,
-                                                                   skip=skip, top=self.page_size)
-                activity_list = None
-                attempt = 1
-                while attempt < 5:
-                    try:
-                        response = requests.get(request_url, headers=self.headers, verify=False)
-                        activity_list = response.json()
-                        break
-                    except Exception as e:
-                        logging.exception(e)
-                        time.sleep(3)
-                    attempt += 1
+        fields_profile = self._fields_profile(profile)
+        if categories is None:
+            categories = fields_profile['categories']
+        with _ActivityWriter(None if no_write_to_file else file_path, on_issue_done) as writer:
+            for issue_id, activity_list in self._iter_activities_per_issue(issue_ids, categories,
+                                                                           fields_profile['activity_fields'],
+                                                                           concurrency, since):
+                if no_write_to_file:
+                    downloaded_activies.extend(activity_list)
+                else:
+                    writer.write(activity_list)
+                if sink is not None:
+                    sink.write_activities(activity_list)
+                total_activities += len(activity_list)
+                writer.issue_done(issue_id)
 
-                if activity_list is None:
-                    raise Exception("Failed to retrieve activities")
+        return downloaded_activies if no_write_to_file else total_activities
 
-                try:
-                    self.check_response(activity_list)
-                except Exception:
-                    raise IssueWithProblemDownloader('downloading failed ', issue_id)
+    def _iter_activities_per_issue(self, issue_ids, categories, fields, concurrency, since=None):
+        if since is None:
+            since = {}
+        if concurrency <= 1:
+            for issue_id in issue_ids:
+                yield issue_id, self._download_issue_activities(issue_id, categories, fields, since.get(issue_id))
+            return
 
-                now = round(datetime.datetime.now().timestamp() * 1000)
+        # keep a bounded number of issues in flight, so memory does not grow with the window size
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = deque()
+            for issue_id in issue_ids:
+                pending.append((issue_id, executor.submit(self._download_issue_activities, issue_id, categories,
+                                                          fields, since.get(issue_id))))
+                if len(pending) >= 2 * concurrency:
+                    issue_id, future = pending.popleft()
+                    yield issue_id, future.result()
+            while pending:
+                issue_id, future = pending.popleft()
+                yield issue_id, future.result()
+
+    def _download_issue_activities(self, issue_id, categories, fields, since=None):
+        issue_activities = []
+        skip = 0
+        pages = 0
+
+        def page_url(top):
+            request_url = self.activities_per_issue_url.format(issue_id=issue_id, categories=categories,
+                                                               fields=fields, skip=skip, top=top)
+            if since:
+                request_url += f'&start={since + 1}'
+            return request_url
+
+        while True:
+            activity_list, top = self._get_page('issues/{id}/activities', page_url)
+            try:
+                self.check_response(activity_list)
+            except Exception:
+                raise IssueWithProblemDownloader('downloading failed ', issue_id)
 
+            now = round(datetime.datetime.now().timestamp() * 1000)
+
+            for activity in activity_list:
+                activity['element_type'] = 'activity'
+                activity['issue_id'] = issue_id
+                activity['download_timestamp'] = now
+
+            if since:
+                issue_activities.extend(activity for activity in activity_list if activity['timestamp'] > since)
+            else:
+                issue_activities.extend(activity_list)
+            skip += len(activity_list)
+            pages += 1
+
+            if len(activity_list) < top:
+                break
+
+        if self.metrics is not None:
+            self.metrics.observe_issue_pages(pages)
+        return issue_activities
+
+    def download_activities(self, query, file_path, categories=None, issue_ids=None, no_write_to_file=False,
+                            profile=None, sink=None):
+        """
+        Downloads activities of all issues matching the query with a few large requests instead of one request per
+        issue. Every activity gets `issue_id` of its issue, so the output is the same as of
+        `download_activities_per_issue`, except that activities of different issues are interleaved by time.
+        :param query: url-encoded search query
+        :param issue_ids: if given, activities of other issues are dropped; e.g., of issues which started to match
+        the query after their list was downloaded
+        :param profile: name of the set of requested fields and categories, the client's default if not given
+        :param sink: also gets downloaded activities with `write_activities`, e.g., `ParquetSink`
+        """
+        fields_profile = self._fields_profile(profile)
+        if categories is None:
+            categories = fields_profile['categories']
+        if issue_ids is not None:
+            issue_ids = set(issue_ids)
+        total_activities = 0
+        downloaded_activies = []
+        skip = 0
+        with _ActivityWriter(None if no_write_to_file else file_path) as writer:
+            while True:
+                activity_list, top = self._get_page(
+                    'activities', lambda top: self.activity_list_url.format(
+                        query=query, categories=categories, fields=fields_profile['activity_fields'], skip=skip,
+                        top=top))
+                self.check_response(activity_list)
+                skip += len(activity_list)
+
+                now = round(datetime.datetime.now().timestamp() * 1000)
+                issue_activities = []
                 for activity in activity_list:
+                    issue_id = self.activity_issue_id(activity)
+                    if issue_ids is not None and issue_id not in issue_ids:
+                        continue
                     activity['element_type'] = 'activity'
                     activity['issue_id'] = issue_id
                     activity['download_timestamp'] = now
+                    issue_activities.append(activity)
 
                 if no_write_to_file:
-                    downloaded_activies.extend(activity_list)
+                    downloaded_activies.extend(issue_activities)
                 else:
-                    with open(file_path, 'a+', encoding='utf-8') as writer:
-                        for activity in activity_list:
-                            line = json.dumps(activity, ensure_ascii=False)
-                            line = line.replace('\u0000', '')
-                            line = (line + '\n').encode('utf-8', 'replace').decode('utf-8', 'replace')
-                            writer.write(line)
+                    writer.write(issue_activities)
+                if sink is not None:
+                    sink.write_activities(issue_activities)
+                total_activities += len(issue_activities)
 
-                skip += len(activity_list)
-                total_activities += len(activity_list)
-
-                if len(activity_list) < self.page_size:
+                if len(activity_list) < top:
                     break
 
         return downloaded_activies if no_write_to_file else total_activities
 
-    def download_issues(self, query, file_path, return_ids=False) -> Union[int, List[str]]:
+    @staticmethod
+    def activity_issue_id(activity):
+        """
+        Returns id of the issue the activity belongs to: the target is either the issue itself or, e.g.,
+        a comment of it
+        """
+        target = activity['target']
+        if target.get('issue') is not None:
+            return target['issue']['id']
+        return target['id']
+
+    def iter_issues(self, query, profile=None):
+        """
+        Yields issues matching the query page by page, so only one page is kept in memory
+        :param profile: name of the set of requested fields, the client's default if not given
+        """
+        fields = self._fields_profile(profile)['issue_fields']
         skip = 0
-        all_issues = []
         while True:
-            response = requests.get(self.issue_list_url.format(query=query, skip=skip, top=self.page_size),
-                                    headers=self.headers,
-                                    verify=False)
-            loaded_issues = response.json()
+            loaded_issues, _ = self._get_page(
+                'issues', lambda top: self.issue_list_url.format(query=query, fields=fields, skip=skip, top=top))
             self.check_response(loaded_issues)
 
             if len(loaded_issues) == 0:
                 break
 
             now = round(datetime.datetime.now().timestamp() * 1000)
-            for issue in all_issues:
+            for issue in loaded_issues:
                 issue['downloadTimestamp'] = now
+                issue['element_type'] = 'issue'
             skip += len(loaded_issues)
-            all_issues += loaded_issues
+            yield loaded_issues
 
-        with open(file_path, 'a+', encoding='utf-8') as writer:
-            for issue in all_issues:
-                issue['element_type'] = 'issue'
-                line = json.dumps(issue, ensure_ascii=False).encode('utf-8', 'replace').decode('utf-8')
-                try:
-                    writer.write(line + '\n')
-                except Exception as e:
-                    logging.exception(issue['id'])
-                    raise e
+    def count_issues(self, query):
+        """
+        :param query: search query as is, not url-encoded
+        """
+        attempt = 0
+        while True:
+            response = self._request('POST', self.issue_count_url, json={'query': query})
+            result = response.json()
+            self.check_response(result)
+            # the server answers -1 until it finishes counting
+            if result['count'] >= 0 or attempt >= self.max_retries:
+                return result['count']
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def download_issues(self, query, file_path, return_ids=False, profile=None, sink=None) -> Union[int, List[str]]:
+        """
+        :param sink: also gets downloaded issues with `write_issues`, e.g., `ParquetSink`
+        """
+        n_issues = 0
+        issue_ids = []
+        for loaded_issues in self.iter_issues(query, profile):
+            with open_jsonl(file_path, 'a') as writer:
+                for issue in loaded_issues:
+                    line = json.dumps(issue, ensure_ascii=False).encode('utf-8', 'replace').decode('utf-8')
+                    try:
+                        writer.write(line + '\n')
+                    except Exception as e:
+                        logging.exception(issue['id'])
+                        raise e
+            if sink is not None:
+                sink.write_issues(loaded_issues)
+            n_issues += len(loaded_issues)
+            if return_ids:
+                issue_ids.extend(issue['id'] for issue in loaded_issues)
 
         if return_ids:
-            return [issue['id'] for issue in all_issues]
+            return issue_ids
         else:
-            return len(all_issues)
+            return n_issues
+
+    def _fields_profile(self, profile):
+        if profile is None:
+            profile = self.fields_profile
+        if profile not in FIELD_PROFILES:
+            raise ValueError(f'Unknown fields profile `{profile}`, expected one of {", ".join(FIELD_PROFILES)}')
+        return FIELD_PROFILES[profile]
+
+    def get(self, url, **kwargs):
+        return self._request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        # a POST is not idempotent, so only requests rejected by the rate limiter are repeated
+        return self._request('POST', url, idempotent=False, **kwargs)
+
+    def get_json(self, url):
+        return self._get_json(url)[0]
+
+    def _get_page(self, endpoint, page_url):
+        """
+        :param endpoint: name of the endpoint for `paging`, as `CrawlMetrics.endpoint` names it
+        :param page_url: returns the url of a page of the given size
+        :return: the page and the size it was requested with
+        """
+        if self.paging is None:
+            return self.get_json(page_url(self.page_size)), self.page_size
+
+        top = self.paging.page_size(endpoint)
+
+        def smaller_page():
+            nonlocal top
+            self.paging.timed_out(endpoint, top)
+            top = self.paging.page_size(endpoint)
+            return page_url(top)
+
+        page, response, seconds = self._get_json(page_url(top), on_read_timeout=smaller_page)
+        if isinstance(page, list):
+            self.paging.observe(endpoint, top, len(page), seconds, len(response.content))
+        return page, top
+
+    def _get_json(self, url, on_read_timeout=None):
+        """
+        :return: the parsed body, the response and how long it took to receive it, see `_send`
+        """
+        response, document, seconds = self._send('GET', url, parse_json=True, on_read_timeout=on_read_timeout)
+        if document is _NOT_PARSED:
+            # an error response, or a malformed one after all retries; fails right away if the body is not JSON
+            document = response.json()
+        return document, response, seconds
+
+    def _request(self, method, url, idempotent=True, **kwargs):
+        return self._send(method, url, idempotent, **kwargs)[0]
+
+    def _send(self, method, url, idempotent=True, parse_json=False, on_read_timeout=None, **kwargs):
+        """
+        Sends the request again after errors until `max_retries` repeats are spent
+        :param parse_json: whether to parse the body of a successful response; a malformed body is repeated like
+        a 5xx response, within the same repeats
+        :param on_read_timeout: if given, returns the url to request instead after a read timeout, e.g., of a smaller
+        page
+        :return: the response, its parsed body or `_NOT_PARSED` if it was not parsed, and seconds from sending the
+        request until its body was received, or its headers with `stream=True`
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            request_start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if self.metrics is not None:
+                    self.metrics.observe_request(url, type(e).__name__, time.perf_counter() - request_start, 0)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                logging.warning(f'{method} {url} failed: {e}, retrying')
+                if self.metrics is not None:
+                    self.metrics.observe_retry(url, type(e).__name__)
+                if on_read_timeout is not None and isinstance(e, requests.ReadTimeout):
+                    url = on_read_timeout()
+                delay = self._backoff_delay(attempt)
+            else:
+                # the body is read before `request` returns, unless it is streamed; a streamed body is left to the
+                # caller and counted by its Content-Length
+                seconds = time.perf_counter() - request_start
+                if self.metrics is not None:
+                    n_bytes = int(response.headers.get('Content-Length') or 0) if kwargs.get('stream') \
+                        else len(response.content)
+                    self.metrics.observe_request(url, response.status_code, seconds, n_bytes)
+                retriable = response.status_code in RETRY_STATUSES if idempotent else response.status_code == 429
+                reason = response.status_code
+                document = _NOT_PARSED
+                if parse_json and 200 <= response.status_code < 300:
+                    try:
+                        document = response.json()
+                    except ValueError:
+                        retriable = True
+                        reason = 'malformed'
+                if not retriable or attempt >= self.max_retries:
+                    return response, document, seconds
+                logging.warning(f'{method} {url} returned {response.status_code}'
+                                f'{" with a malformed body" if reason == "malformed" else ""}, retrying')
+                if self.metrics is not None:
+                    self.metrics.observe_retry(url, reason)
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _backoff_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+            delay = (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        return min(self.max_backoff, max(0.0, delay))
 
     @staticmethod
     def check_response(json_response):
@@ -199,3 +502,67 @@ class YouTrack:
             print(json_response)
             raise Exception(json_response['error'])
         # print('read {} items'.format(len(json_response)))
+
+
+class _ActivityWriter:
+    """
+    Appends activities to a JSON lines file through one writer, instead of opening the file for every issue or page.
+    Appending to a compressed file adds a gzip member or zstandard frame per writer, see `open_jsonl`, so the writer
+    is only closed after about `member_bytes` characters of lines. An issue is reported to `on_issue_done` once its
+    activities are flushed, into a closed member for a compressed file, so the file can be truncated right after any
+    reported issue when a crawl is resumed. Issues of a download which failed are not reported.
+    :param file_path: where to write, or None to only report issues
+    """
+
+    def __init__(self, file_path, on_issue_done=None, member_bytes=COMPRESSED_MEMBER_BYTES):
+        self.file_path = file_path
+        self.on_issue_done = on_issue_done
+        self.member_bytes = member_bytes
+        self.compressed = file_path is not None and \
+            os.path.splitext(file_path)[1].lower() in GZIP_EXTENSIONS + ZSTD_EXTENSIONS
+        self._writer = None
+        self._written_bytes = 0
+        self._pending_issues = []
+
+    def write(self, activity_list):
+        if not activity_list:
+            return
+        if self._writer is None:
+            self._writer = open_jsonl(self.file_path, 'a')
+            self._written_bytes = 0
+        for activity in activity_list:
+            line = json.dumps(activity, ensure_ascii=False)
+            line = line.replace('\u0000', '')
+            line = (line + '\n').encode('utf-8', 'replace').decode('utf-8', 'replace')
+            self._written_bytes += self._writer.write(line)
+
+    def issue_done(self, issue_id):
+        if self.on_issue_done is None:
+            return
+        self._pending_issues.append(issue_id)
+        if self._writer is None:
+            self._report()
+        elif not self.compressed:
+            self._writer.flush()
+            self._report()
+        elif self._written_bytes >= self.member_bytes:
+            self._close()
+            self._report()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._close()
+        if exc_type is None:
+            self._report()
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _report(self):
+        for issue_id in self._pending_issues:
+            self.on_issue_done(issue_id)
+        self._pending_issues = []
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 package_version = '1.0.0'
 
@@ -21,6 +21,11 @@ setup(
         'requests',
         'tqdm'
     ],
+    extras_require={
+        'fast': ['orjson'],
+        'zstd': ['zstandard'],
+        'parquet': ['pyarrow'],
+    },
     python_requires='>=3.6',
     entry_points={
         'console_scripts': [
@@ -0,0 +1,86 @@
+import calendar
+import importlib.util
+from unittest import TestCase, skipUnless
+
+from jetbrains_issues_dataset.idea import columnar
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.multi_snapshot_strategy import MultiSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+
+def _installed(*module_names):
+    return all(importlib.util.find_spec(module_name) is not None for module_name in module_names)
+
+
+class TestColumnar(TestCase):
+    def setUp(self):
+        self.strategy = SnapshotStrategy()
+        IdeaActivityManager(self.strategy).load_issues_from_activities_file('data/snapshot.json')
+        self.issues = self.strategy.issues
+
+    def test_columns(self):
+        issue_table, comment_table = self.strategy.export('columns')
+
+        self.assertEqual(len(self.issues), len(issue_table))
+        for row, issue in enumerate(self.issues.values()):
+            for column in columnar.DEFAULT_COLUMNS:
+                values = issue_table.columns[column]
+                if column in columnar.CATEGORICAL_COLUMNS:
+                    code = values[row]
+                    value = None if code == columnar.MISSING_CODE else issue_table.categories[column][code]
+                    self.assertEqual(issue.get(column), value)
+                elif column in columnar.DATETIME_COLUMNS:
+                    moment = issue.get(column)
+                    expected = columnar.MISSING_DATETIME if moment is None else calendar.timegm(moment.timetuple())
+                    self.assertEqual(expected, values[row])
+                else:
+                    self.assertEqual(issue.get(column), values[row])
+
+        comments = [(issue_id, comment_id, text) for issue_id, issue in self.issues.items()
+                    for comment_id, text in issue['comments'].items()]
+        self.assertTrue(comments)
+        issue_ids = comment_table.categories['issue_id']
+        self.assertEqual(comments, [(issue_ids[code], comment_id, text) for code, comment_id, text in
+                                    zip(*comment_table.columns.values())])
+
+    def test_categories_are_unique(self):
+        issue_table, _ = self.strategy.export('columns')
+        for column in columnar.CATEGORICAL_COLUMNS:
+            categories = issue_table.categories[column]
+            self.assertEqual(len(set(categories)), len(categories))
+
+    def test_multi_snapshot_strategy(self):
+        strategies = [SnapshotStrategy(), IssueCreatedSnapshotStrategy()]
+        manager = IdeaActivityManager(MultiSnapshotStrategy(strategies))
+        manager.load_issues_from_activities_file('data/snapshot.json')
+
+        tables = manager.snapshot_strategy.export('columns', columns=('id', 'state'))
+        self.assertEqual(2, len(tables))
+        for strategy, (issue_table, _) in zip(strategies, tables):
+            self.assertEqual(list(strategy.issues), issue_table.columns['id'])
+            self.assertEqual(['id', 'state'], list(issue_table.columns))
+
+    def test_unknown_format(self):
+        with self.assertRaises(AssertionError):
+            self.strategy.export('csv')
+
+    @skipUnless(_installed('numpy'), 'numpy is not installed')
+    def test_numpy(self):
+        issue_table, comment_table = self.strategy.export('numpy')
+        self.assertEqual('datetime64[s]', str(issue_table.columns['created at'].dtype))
+        self.assertEqual('int32', str(issue_table.columns['state'].dtype))
+        self.assertEqual(list(self.issues), list(issue_table.columns['id']))
+
+    @skipUnless(_installed('numpy', 'pandas'), 'pandas is not installed')
+    def test_pandas(self):
+        issue_frame, comment_frame = self.strategy.export('pandas')
+        self.assertEqual('category', str(issue_frame['state'].dtype))
+        self.assertEqual([issue.get('state') for issue in self.issues.values()],
+                         [None if state != state else state for state in issue_frame['state']])
+
+    @skipUnless(_installed('numpy', 'pyarrow'), 'pyarrow is not installed')
+    def test_arrow(self):
+        issue_table, comment_table = self.strategy.export('arrow')
+        self.assertEqual([issue.get('assignee') for issue in self.issues.values()],
+                         issue_table.column('assignee').to_pylist())
@@ -0,0 +1,60 @@
+import pickle
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.activity_manager import COMPACT_DROPPED_FIELDS
+from jetbrains_issues_dataset.idea.compact_issue import CompactIssue, KeyTable
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+
+class TestCompactIssue(TestCase):
+    def test_mapping(self):
+        table = KeyTable()
+        issue = CompactIssue(table, {'id': '1', 'state': 'Open'})
+        other_issue = CompactIssue(table, {'subsystem': 'Editor'})
+
+        self.assertEqual({'id': '1', 'state': 'Open'}, issue)
+        self.assertEqual({'subsystem': 'Editor'}, other_issue)
+        self.assertNotIn('subsystem', issue)
+        self.assertEqual(None, issue.get('subsystem'))
+
+        issue['tags'] = ['a']
+        issue['tags'].extend(['b'])
+        del issue['state']
+        self.assertEqual({'id': '1', 'tags': ['a', 'b']}, issue)
+        self.assertEqual(2, len(issue))
+        with self.assertRaises(KeyError):
+            del issue['state']
+
+        copy = issue.copy()
+        copy['id'] = '2'
+        self.assertEqual('1', issue['id'])
+
+    def test_values_interned(self):
+        table = KeyTable()
+        state = ''.join(['Fi', 'xed'])
+        issue = CompactIssue(table, {'state': state})
+        self.assertIs(issue['state'], CompactIssue(table, {'state': 'Fixed'})['state'])
+
+    def test_pickled_as_dict(self):
+        issue = CompactIssue(KeyTable(), {'id': '1', 'comments': {'c': 'text'}})
+        restored = pickle.loads(pickle.dumps(issue))
+        self.assertIs(dict, type(restored))
+        self.assertEqual({'id': '1', 'comments': {'c': 'text'}}, restored)
+
+    def test_same_snapshots(self):
+        for file_path in ('data/snapshot.json', 'data/missed_activities.json'):
+            for strategy_class in (SnapshotStrategy, IssueCreatedSnapshotStrategy, FirstAssigneeSnapshotStrategy):
+                expected_strategy = strategy_class()
+                IdeaActivityManager(expected_strategy).load_issues_from_activities_file(file_path)
+                compact_strategy = strategy_class()
+                IdeaActivityManager(compact_strategy, compact=True).load_issues_from_activities_file(file_path)
+
+                self.assertEqual(list(expected_strategy.issues), list(compact_strategy.issues))
+                for issue_id, expected_issue in expected_strategy.issues.items():
+                    issue = compact_strategy.issues[issue_id]
+                    self.assertIsInstance(issue, CompactIssue)
+                    self.assertEqual({key: value for key, value in expected_issue.items()
+                                      if key not in COMPACT_DROPPED_FIELDS}, issue)
@@ -0,0 +1,231 @@
+import datetime
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from unittest import TestCase
+from unittest.mock import patch
+from urllib import parse
+
+from jetbrains_issues_dataset.jsonl import open_jsonl
+from jetbrains_issues_dataset.youtrack_loader.download_activities import download_data
+from jetbrains_issues_dataset.youtrack_loader.sync import SyncState, sync_data
+from jetbrains_issues_dataset.youtrack_loader.windows import AdaptiveWindows
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+START = datetime.datetime(2020, 1, 1)
+END = datetime.datetime(2020, 3, 1)
+
+
+class FakeYouTrack(YouTrack):
+    """
+    Serves one issue per day with three activities each; fails once after `fail_after` activity requests
+    """
+
+    def __init__(self, fail_after=None):
+        super().__init__('http://localhost/', None, page_size=2)
+        self.fail_after = fail_after
+        self.activity_requests = 0
+        self.count_requests = 0
+        self.issues = []
+        self.activities = {}
+        for day in range((END - START).days):
+            self.add_issue(START + datetime.timedelta(days=day))
+
+    def add_issue(self, created):
+        issue_id = f'1-{len(self.issues)}'
+        timestamp = int(created.timestamp() * 1000)
+        self.issues.append({'id': issue_id, 'created': timestamp, 'updated': timestamp})
+        self.activities[issue_id] = []
+        for i in range(3):
+            self.add_activity(issue_id, timestamp + i)
+
+    def add_activity(self, issue_id, timestamp):
+        activities = self.activities[issue_id]
+        activities.append({'id': f'{issue_id}.{len(activities)}', 'timestamp': timestamp,
+                           'target': {'id': issue_id, '$type': 'Issue'}})
+        issue = next(issue for issue in self.issues if issue['id'] == issue_id)
+        issue['updated'] = max(issue['updated'], timestamp)
+
+    def count_issues(self, query):
+        self.count_requests += 1
+        return len(self._find_issues(query))
+
+    def get_json(self, url):
+        url = parse.urlparse(url)
+        params = parse.parse_qs(url.query)
+        skip, top = int(params['$skip'][0]), int(params['$top'][0])
+        if url.path.endswith('/activities/'):
+            issue_ids = [issue['id'] for issue in self._find_issues(params['issueQuery'][0])]
+            activities = sorted((dict(activity) for issue_id in issue_ids for activity in self.activities[issue_id]),
+                                key=lambda activity: activity['timestamp'])
+            return activities[skip:skip + top]
+        if url.path.endswith('/activities'):
+            self.activity_requests += 1
+            if self.fail_after is not None and self.activity_requests > self.fail_after:
+                self.fail_after = None
+                raise ConnectionError('server is gone')
+            since = int(params.get('start', [0])[0])
+            activities = [dict(activity) for activity in self.activities[url.path.split('/')[-2]]
+                          if activity['timestamp'] >= since]
+            return activities[skip:skip + top]
+        return self._find_issues(params['query'][0])[skip:skip + top]
+
+    def _find_issues(self, query):
+        order_by = 'created' if 'created: ' in query else 'updated'
+        start, end = query.split(f'{order_by}: ')[1].split(' .. ')
+        start, end = [datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S').timestamp() * 1000
+                      for value in (start, end)]
+        return [dict(issue) for issue in self.issues if start <= issue[order_by] < end]
+
+
+class TestDownloadData(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _download(self, youtrack, name, resume=False, extension='json', **kwargs):
+        issues_file = os.path.join(self.directory, f'{name}.issues.{extension}')
+        activities_file = os.path.join(self.directory, f'{name}.activities.{extension}')
+        download_data(youtrack, START, END, '#IDEA', issues_file, activities_file,
+                      checkpoint_file=os.path.join(self.directory, f'{name}.checkpoint.json'), resume=resume,
+                      **kwargs)
+        return [[json.loads(line)['id'] for line in open_jsonl(file)] for file in (issues_file, activities_file)]
+
+    def test_download(self):
+        issues, activities = self._download(FakeYouTrack(), 'full')
+        self.assertEqual(60, len(issues))
+        self.assertEqual(180, len(activities))
+
+    def test_bulk_activities(self):
+        expected = self._download(FakeYouTrack(), 'full')
+
+        youtrack = FakeYouTrack()
+        self.assertEqual(expected, self._download(youtrack, 'bulk', activities_mode='bulk'))
+        self.assertEqual(0, youtrack.activity_requests)
+
+    def test_adaptive_windows(self):
+        expected = self._download(FakeYouTrack(), 'full')
+
+        youtrack = FakeYouTrack()
+        self.assertEqual(expected, self._download(youtrack, 'adaptive', adaptive_windows=True,
+                                                  target_issues_per_window=10,
+                                                  min_window=datetime.timedelta(days=1)))
+        windows = [json.loads(line) for line in open(os.path.join(self.directory, 'adaptive.checkpoint.json'))]
+        windows = [window for window in windows if window['event'] == 'window']
+        self.assertTrue(all(len(window['issue_ids']) <= 10 for window in windows))
+        self.assertLessEqual(len(windows), 7)
+
+    def test_window_bounds_shorter_than_initial_window(self):
+        for min_window, max_window in ((datetime.timedelta(hours=1), datetime.timedelta(days=3)),
+                                       (datetime.timedelta(hours=200), datetime.timedelta(days=90))):
+            windows = AdaptiveWindows(lambda start, end: 0, min_window=min_window, max_window=max_window)
+            start, end = next(windows(START, END, 1))
+            self.assertTrue(min_window <= end - start <= max_window)
+
+    def test_uncounted_window_is_split(self):
+        def count_issues(start, end):
+            # the server counts only short windows in time
+            return 5 if end - start <= datetime.timedelta(days=1) else -1
+
+        windows = AdaptiveWindows(count_issues, target_issues=10, min_window=datetime.timedelta(hours=12))
+        start, end = next(windows(START, END, 1))
+        self.assertEqual(datetime.timedelta(hours=21), end - start)
+
+        windows = AdaptiveWindows(lambda start, end: -1, target_issues=10, min_window=datetime.timedelta(hours=12))
+        sizes = [end - start for start, end in itertools.islice(windows(START, END, 1), 3)]
+        self.assertEqual([datetime.timedelta(hours=12)] * 3, sizes)
+
+    def test_resume_after_failure(self):
+        expected = self._download(FakeYouTrack(), 'full')
+
+        youtrack = FakeYouTrack(fail_after=50)
+        with self.assertRaises(ConnectionError):
+            self._download(youtrack, 'resumed')
+        self.assertEqual(expected, self._download(youtrack, 'resumed', resume=True))
+
+    def test_resume_compressed(self):
+        expected = self._download(FakeYouTrack(), 'full')
+
+        youtrack = FakeYouTrack(fail_after=50)
+        with self.assertRaises(ConnectionError):
+            self._download(youtrack, 'resumed', extension='json.gz')
+        self.assertEqual(expected, self._download(youtrack, 'resumed', resume=True, extension='json.gz'))
+
+    def test_compressed_window_is_one_member(self):
+        expected = self._download(FakeYouTrack(), 'full')
+        self.assertEqual(expected, self._download(FakeYouTrack(), 'compressed', extension='json.gz'))
+
+        windows = [json.loads(line) for line in open(os.path.join(self.directory, 'compressed.checkpoint.json'))]
+        windows = [window for window in windows if window['event'] == 'window']
+        with open(os.path.join(self.directory, 'compressed.activities.json.gz'), 'rb') as reader:
+            data = reader.read()
+        members = 0
+        while data:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            decompressor.decompress(data)
+            data = decompressor.unused_data
+            members += 1
+        # and the empty member of the file created at the start
+        self.assertEqual(len(windows) + 1, members)
+
+    def test_sync(self):
+        youtrack = FakeYouTrack()
+        self._download(youtrack, 'synced')
+        now = datetime.datetime.now() - datetime.timedelta(seconds=5)
+        youtrack.add_activity('1-10', int(now.timestamp() * 1000))
+        youtrack.add_issue(now)
+
+        issues_file = os.path.join(self.directory, 'synced.issues.json')
+        activities_file = os.path.join(self.directory, 'synced.activities.json')
+        state_file = os.path.join(self.directory, 'synced.sync.json')
+        self.assertEqual((2, 4), sync_data(youtrack, '#IDEA', issues_file, activities_file, state_file,
+                                           since=now - datetime.timedelta(minutes=1)))
+        # the same issues are seen again within the overlap, but they have no new activities
+        self.assertEqual((2, 0), sync_data(youtrack, '#IDEA', issues_file, activities_file, state_file))
+
+        issues = [json.loads(line) for line in open(issues_file, encoding='utf-8')]
+        activities = [json.loads(line)['id'] for line in open(activities_file, encoding='utf-8')]
+        self.assertEqual([issue['id'] for issue in youtrack.issues], [issue['id'] for issue in issues])
+        self.assertEqual(youtrack.issues[10]['updated'], issues[10]['updated'])
+        self.assertEqual(sorted(activity['id'] for activities in youtrack.activities.values()
+                                for activity in activities), sorted(activities))
+
+    def test_sync_after_crash_during_merge(self):
+        youtrack = FakeYouTrack()
+        self._download(youtrack, 'synced')
+        now = datetime.datetime.now() - datetime.timedelta(seconds=5)
+        youtrack.add_activity('1-10', int(now.timestamp() * 1000))
+        youtrack.add_issue(now)
+
+        issues_file = os.path.join(self.directory, 'synced.issues.json')
+        activities_file = os.path.join(self.directory, 'synced.activities.json')
+        state_file = os.path.join(self.directory, 'synced.sync.json')
+        since = now - datetime.timedelta(minutes=1)
+        # the process dies after the files are merged, before the state is saved
+        save = SyncState.save
+        saved_states = []
+
+        def save_once(state, file_path):
+            if saved_states:
+                raise KeyboardInterrupt()
+            saved_states.append(state)
+            save(state, file_path)
+
+        with patch.object(SyncState, 'save', autospec=True, side_effect=save_once):
+            with self.assertRaises(KeyboardInterrupt):
+                sync_data(youtrack, '#IDEA', issues_file, activities_file, state_file, since=since)
+        self.assertTrue(SyncState.load(state_file).merging)
+        self.assertEqual((2, 4), sync_data(youtrack, '#IDEA', issues_file, activities_file, state_file,
+                                           since=since))
+
+        issues = [json.loads(line)['id'] for line in open(issues_file, encoding='utf-8')]
+        activities = [json.loads(line)['id'] for line in open(activities_file, encoding='utf-8')]
+        self.assertEqual([issue['id'] for issue in youtrack.issues], issues)
+        self.assertEqual(sorted(activity['id'] for activities in youtrack.activities.values()
+                                for activity in activities), sorted(activities))
+        self.assertFalse(SyncState.load(state_file).merging)
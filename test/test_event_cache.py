@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.activity_manager import ActivityManager
+from jetbrains_issues_dataset.idea.event_cache import load_with_cache
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+STRATEGIES = (SnapshotStrategy, IssueCreatedSnapshotStrategy, FirstAssigneeSnapshotStrategy)
+STATE_MAPPING = {'__CUSTOM_FIELD__State_25': {'name': 'state', 'field': 'name', 'multivalue': False}}
+
+
+class TestEventCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _cache_files(self):
+        return sorted(file for file in os.listdir(self.cache_dir) if file.endswith('.events'))
+
+    def test_same_as_without_cache(self):
+        for file_path in ('data/snapshot.json', 'data/missed_activities.json'):
+            for compact in (False, True):
+                expected_manager = IdeaActivityManager([strategy_class() for strategy_class in STRATEGIES],
+                                                       compact=compact)
+                expected_manager.load_issues_from_activities_file(file_path)
+
+                for expected_hit in (False, True):
+                    manager = IdeaActivityManager([strategy_class() for strategy_class in STRATEGIES],
+                                                  compact=compact)
+                    self.assertEqual(expected_hit, load_with_cache(file_path, manager, self.cache_dir))
+                    self.assertEqual(list(expected_manager.final_issues.items()), list(manager.final_issues.items()))
+                    self.assertEqual(list(expected_manager.issues.items()), list(manager.issues.items()))
+                    for expected_issues, issues in zip(expected_manager.snapshot_strategy.issues,
+                                                       manager.snapshot_strategy.issues):
+                        self.assertEqual(list(expected_issues.items()), list(issues.items()))
+
+    def test_invalidation(self):
+        file_path = os.path.join(self.directory, 'activities.json')
+        shutil.copy('data/missed_activities.json', file_path)
+        self.assertFalse(load_with_cache(file_path, IdeaActivityManager(SnapshotStrategy()), self.cache_dir))
+        self.assertTrue(load_with_cache(file_path, IdeaActivityManager(SnapshotStrategy()), self.cache_dir))
+        cache_files = self._cache_files()
+
+        # another mapping and the compact mode; caches of all of them are kept
+        expected_manager = ActivityManager(SnapshotStrategy(), custom_field_mapping=STATE_MAPPING)
+        expected_manager.load_issues_from_activities_file(file_path)
+        for expected_hit in (False, True):
+            activity_manager = ActivityManager(SnapshotStrategy(), custom_field_mapping=STATE_MAPPING)
+            self.assertEqual(expected_hit, load_with_cache(file_path, activity_manager, self.cache_dir))
+            self.assertEqual(expected_manager.snapshot_strategy.issues, activity_manager.snapshot_strategy.issues)
+            self.assertEqual(expected_hit, load_with_cache(file_path, IdeaActivityManager(SnapshotStrategy(),
+                                                                                          compact=True),
+                                                           self.cache_dir))
+            self.assertTrue(load_with_cache(file_path, IdeaActivityManager(SnapshotStrategy()), self.cache_dir))
+        self.assertEqual(3, len(self._cache_files()))
+
+        # another file, caches of its previous versions are removed
+        with open(file_path, 'a', encoding='utf-8') as writer:
+            writer.write('\n')
+        self.assertFalse(load_with_cache(file_path, IdeaActivityManager(SnapshotStrategy()), self.cache_dir))
+        self.assertTrue(load_with_cache(file_path, IdeaActivityManager(SnapshotStrategy()), self.cache_dir))
+        self.assertEqual(1, len(self._cache_files()))
+        self.assertNotEqual(cache_files, self._cache_files())
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+from jetbrains_issues_dataset.jsonl import open_jsonl, json_parser
+
+try:
+    import zstandard
+    EXTENSIONS = ('gz', 'zst')
+except ImportError:
+    EXTENSIONS = ('gz',)
+
+
+class TestJsonl(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _load(self, file_path, json_backend='auto'):
+        snapshot_strategy = SnapshotStrategy()
+        IdeaActivityManager(snapshot_strategy).load_issues_from_activities_file(file_path, json_backend)
+        return snapshot_strategy.issues
+
+    def test_json_backends(self):
+        self.assertEqual(self._load('data/snapshot.json', 'json'), self._load('data/snapshot.json', 'auto'))
+        # too large for fast parsers
+        self.assertEqual({'id': 2 ** 70}, json_parser()(b'{"id": 1180591620717411303424}'))
+
+    def _copy(self, file_path):
+        with open('data/snapshot.json', 'r', encoding='utf-8') as reader:
+            lines = reader.readlines()
+        # appended in two parts, like pages of the downloader
+        for part in (lines[:500], lines[500:]):
+            with open_jsonl(file_path, 'a') as writer:
+                writer.writelines(part)
+
+    def test_compressed_files(self):
+        expected = self._load('data/snapshot.json')
+        for extension in EXTENSIONS:
+            file_path = os.path.join(self.directory, f'snapshot.json.{extension}')
+            self._copy(file_path)
+            self.assertLess(os.path.getsize(file_path), os.path.getsize('data/snapshot.json') / 5)
+            self.assertEqual(expected, self._load(file_path))
+
+    def test_zip_archive(self):
+        file_path = os.path.join(self.directory, 'snapshot.json.zip')
+        with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.write('data/snapshot.json', 'snapshot.json')
+        self.assertEqual(self._load('data/snapshot.json'), self._load(file_path))
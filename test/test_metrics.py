@@ -0,0 +1,67 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from benchmarks.mock_youtrack import MockYouTrack
+from jetbrains_issues_dataset.youtrack_loader.download_activities import download_data
+from jetbrains_issues_dataset.youtrack_loader.metrics import CrawlMetrics, Histogram
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_endpoint(self):
+        self.assertEqual('issues', CrawlMetrics.endpoint('http://localhost/api/issues?query=%23IDEA&$top=10'))
+        self.assertEqual('issues/{id}/activities',
+                         CrawlMetrics.endpoint('http://localhost/api/issues/25-2993292/activities?$skip=0'))
+        self.assertEqual('activities', CrawlMetrics.endpoint('http://localhost/api/activities/?issueQuery=x'))
+
+    def test_histogram(self):
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual([2, 2, 3], list(histogram.cumulative_counts()))
+        self.assertEqual((4, 14.5), (histogram.count, histogram.sum))
+
+    def test_crawl(self):
+        jsonl_file = os.path.join(self.directory, 'metrics.jsonl')
+        prometheus_file = os.path.join(self.directory, 'metrics.prom')
+        metrics = CrawlMetrics(jsonl_file)
+        with MockYouTrack.from_file('data/snapshot.json', error_rate=0.1, rate_limit_rate=0.1) as server:
+            youtrack = YouTrack(server.url, None, page_size=5, backoff_factor=0.001, metrics=metrics)
+            created = [issue['created'] for issue in server.issues]
+            download_data(youtrack, datetime.datetime.fromtimestamp(min(created) // 1000),
+                          datetime.datetime.fromtimestamp(max(created) // 1000 + 1), '#IDEA',
+                          os.path.join(self.directory, 'issues.json'), os.path.join(self.directory, 'activities.json'),
+                          concurrency=2, prometheus_file=prometheus_file)
+        metrics.close()
+
+        self.assertEqual(server.requests, sum(metrics.requests.values()))
+        self.assertEqual(server.bytes_sent, sum(metrics.bytes_received.values()))
+        self.assertEqual(server.statuses[429] + server.statuses[500], sum(metrics.retries.values()))
+        self.assertEqual(server.statuses[500], metrics.server_errors())
+        self.assertEqual(len(server.issues), metrics.issues)
+        self.assertEqual(len(server.issues), metrics.pages_per_issue.count)
+        self.assertEqual(1.0, metrics.progress)
+        self.assertEqual(0, metrics.eta)
+
+        with open(jsonl_file, 'r', encoding='utf-8') as reader:
+            records = [json.loads(line) for line in reader]
+        self.assertEqual(server.requests, sum(record['event'] == 'request' for record in records))
+        self.assertEqual(len(metrics.windows), sum(record['event'] == 'window' for record in records))
+
+        with open(prometheus_file, 'r', encoding='utf-8') as reader:
+            lines = reader.read().splitlines()
+        self.assertIn(f'youtrack_request_duration_seconds_count{{endpoint="issues/{{id}}/activities"}} '
+                      f'{metrics.latency["issues/{id}/activities"].count}', lines)
+        self.assertIn(f'youtrack_requests_total{{endpoint="issues",status="200"}} '
+                      f'{metrics.requests["issues", "200"]}', lines)
+        self.assertIn('youtrack_crawl_progress_ratio 1.0', lines)
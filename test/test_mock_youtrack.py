@@ -0,0 +1,45 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from benchmarks.crawler import crawl
+from benchmarks.mock_youtrack import MockYouTrack
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+
+class TestMockYouTrack(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open('data/snapshot.json', 'r', encoding='utf-8') as reader:
+            self.elements = [json.loads(line) for line in reader]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_paging(self):
+        with MockYouTrack.from_file('data/snapshot.json') as server:
+            youtrack = YouTrack(server.url, None, page_size=7)
+            issue_id = server.issues[0]['id']
+            activities = youtrack.download_activities_per_issue([issue_id], None, no_write_to_file=True)
+            self.assertEqual([activity['id'] for activity in server.activities[issue_id]],
+                             [activity['id'] for activity in activities])
+
+            issues = [issue for page in youtrack.iter_issues('') for issue in page]
+            self.assertEqual([issue['id'] for issue in server.issues], [issue['id'] for issue in issues])
+
+    def test_crawl_with_failures(self):
+        with MockYouTrack.from_file('data/snapshot.json', error_rate=0.1, rate_limit_rate=0.1) as server:
+            result = crawl(server, self.directory, concurrency=4, page_size=20)
+
+        self.assertEqual(sum(element['element_type'] == 'issue' for element in self.elements), result['issues'])
+        self.assertEqual(sum(len(activities) for activities in server.activities.values()), result['activities'])
+        self.assertGreater(result['statuses'].get(429, 0), 0)
+        self.assertGreater(result['statuses'].get(500, 0), 0)
+        self.assertEqual(result['requests'], sum(result['statuses'].values()))
+
+        with open(os.path.join(self.directory, 'crawl.activities.json'), 'r', encoding='utf-8') as reader:
+            activity_ids = {json.loads(line)['id'] for line in reader}
+        self.assertEqual({element['id'] for element in self.elements if element['element_type'] == 'activity'},
+                         activity_ids)
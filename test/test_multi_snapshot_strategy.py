@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.multi_snapshot_strategy import MultiSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+STRATEGIES = (SnapshotStrategy, IssueCreatedSnapshotStrategy, FirstAssigneeSnapshotStrategy)
+
+
+class TestMultiSnapshotStrategy(TestCase):
+    def _expected(self, file_path, compact=False):
+        expected = []
+        for strategy_class in STRATEGIES:
+            strategy = strategy_class()
+            IdeaActivityManager(strategy, compact=compact).load_issues_from_activities_file(file_path)
+            expected.append(strategy.issues)
+        return expected
+
+    def test_same_as_separate_passes(self):
+        for file_path in ('data/snapshot.json', 'data/missed_activities.json'):
+            activity_manager = IdeaActivityManager([strategy_class() for strategy_class in STRATEGIES])
+            activity_manager.load_issues_from_activities_file(file_path)
+
+            self.assertIsInstance(activity_manager.snapshot_strategy, MultiSnapshotStrategy)
+            self.assertEqual(self._expected(file_path), activity_manager.snapshot_strategy.issues)
+
+    def test_compact(self):
+        activity_manager = IdeaActivityManager([strategy_class() for strategy_class in STRATEGIES], compact=True)
+        activity_manager.load_issues_from_activities_file('data/missed_activities.json')
+        self.assertEqual(self._expected('data/missed_activities.json', compact=True),
+                         activity_manager.snapshot_strategy.issues)
+
+    def test_streaming(self):
+        activity_manager = IdeaActivityManager([strategy_class() for strategy_class in STRATEGIES])
+        snapshots = list(activity_manager.iter_issues_from_activities_file('data/missed_activities.json'))
+        expected = self._expected('data/missed_activities.json')
+        self.assertEqual([[issues[issue_id] if issue_id in issues else None for issues in expected]
+                          for issue_id in expected[0]], snapshots)
+
+    def test_in_processes(self):
+        activity_manager = IdeaActivityManager([strategy_class() for strategy_class in STRATEGIES], compact=True)
+        activity_manager.load_issues_from_activities_file('data/snapshot.json', processes=2)
+        self.assertEqual(self._expected('data/snapshot.json', compact=True), activity_manager.snapshot_strategy.issues)
@@ -0,0 +1,117 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+import requests
+
+from benchmarks.mock_youtrack import MockYouTrack
+from jetbrains_issues_dataset.youtrack_loader.download_activities import download_data
+from jetbrains_issues_dataset.youtrack_loader.paging import AdaptivePaging
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self.body = body
+        self.content = b'x' * 10
+        self.elapsed = datetime.timedelta(seconds=0.01)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class SlowSession(FakeSession):
+    def __init__(self, responses, seconds):
+        super().__init__(responses)
+        self.seconds = seconds
+
+    def request(self, method, url, **kwargs):
+        time.sleep(self.seconds)
+        return super().request(method, url, **kwargs)
+
+
+class TestAdaptivePaging(TestCase):
+    def test_grows_after_fast_full_pages(self):
+        paging = AdaptivePaging(initial=100, min_size=10, max_size=300, target_seconds=1, max_bytes=1000)
+        paging.observe('issues', 100, 50, 0.1, 100)
+        self.assertEqual(100, paging.page_size('issues'))
+        paging.observe('issues', 100, 100, 0.1, 100)
+        self.assertEqual(200, paging.page_size('issues'))
+        # another response to a page of the old size does not grow it again
+        paging.observe('issues', 100, 100, 0.1, 100)
+        self.assertEqual(200, paging.page_size('issues'))
+        paging.observe('issues', 200, 200, 0.1, 100)
+        self.assertEqual(300, paging.page_size('issues'))
+        self.assertEqual(100, paging.page_size('activities'))
+
+    def test_shrinks_after_slow_or_large_pages(self):
+        paging = AdaptivePaging(initial=100, min_size=10, max_size=300, target_seconds=1, max_bytes=1000)
+        paging.observe('issues', 100, 100, 4, 100)
+        self.assertEqual(25, paging.page_size('issues'))
+        paging.observe('activities', 100, 80, 0.1, 2000)
+        self.assertEqual(40, paging.page_size('activities'))
+        paging.observe('activities', 40, 40, 100, 0)
+        self.assertEqual(10, paging.page_size('activities'))
+        paging.timed_out('issues', 25)
+        self.assertEqual(12, paging.page_size('issues'))
+
+    def test_timeout_is_retried_with_smaller_page(self):
+        youtrack = YouTrack('http://localhost/', None, backoff_factor=0,
+                            paging=AdaptivePaging(initial=4, min_size=1, max_size=4))
+        youtrack.session = FakeSession([requests.ReadTimeout('slow'), FakeResponse([{'id': '1'}]), FakeResponse([])])
+        issues = [issue for page in youtrack.iter_issues('%23IDEA') for issue in page]
+
+        self.assertEqual(['1'], [issue['id'] for issue in issues])
+        self.assertEqual(['$top=4', '$top=2', '$top=2'], [url[url.index('$top'):] for url in youtrack.session.urls])
+
+    def test_observes_time_until_body_is_read(self):
+        paging = AdaptivePaging(initial=4, min_size=1, max_size=4, target_seconds=0.05)
+        youtrack = YouTrack('http://localhost/', None, paging=paging)
+        # the headers came quickly, but the body took longer than the target
+        youtrack.session = SlowSession([FakeResponse([{'id': str(i)} for i in range(4)])], seconds=0.1)
+        youtrack._get_page('issues', lambda top: f'http://localhost/issues?$top={top}')
+
+        self.assertLess(paging.page_size('issues'), 4)
+
+    def test_crawl_is_the_same(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with MockYouTrack.from_file('data/snapshot.json') as server:
+                created = [issue['created'] for issue in server.issues]
+                downloaded = []
+                for paging in (None, AdaptivePaging(initial=2, min_size=1, max_size=64)):
+                    youtrack = YouTrack(server.url, None, page_size=5, paging=paging)
+                    issues_file = os.path.join(directory, f'{len(downloaded)}.issues.json')
+                    activities_file = os.path.join(directory, f'{len(downloaded)}.activities.json')
+                    download_data(youtrack, datetime.datetime.fromtimestamp(min(created) // 1000),
+                                  datetime.datetime.fromtimestamp(max(created) // 1000 + 1), '#IDEA', issues_file,
+                                  activities_file, activities_mode='bulk')
+                    downloaded.append([_ids(issues_file), _ids(activities_file)])
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(downloaded[0], downloaded[1])
+        self.assertGreater(paging.page_size('activities'), 2)
+
+
+def _ids(file_path):
+    with open(file_path, 'r', encoding='utf-8') as reader:
+        return [json.loads(line)['id'] for line in reader]
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.activity_index import ActivityIndex
+from jetbrains_issues_dataset.idea.compact_issue import CompactIssue
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+SAMPLE_LINES = 5000
+
+
+class TestParallelReplay(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.sample_file = os.path.join(self.directory, 'sample.json')
+        with open('data/snapshot.json', 'r', encoding='utf-8') as reader, \
+                open(self.sample_file, 'w', encoding='utf-8') as writer:
+            for _ in range(SAMPLE_LINES):
+                writer.write(reader.readline())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_same_as_serial(self):
+        for file_path in (self.sample_file, 'data/missed_activities.json'):
+            for strategy_class in (SnapshotStrategy, IssueCreatedSnapshotStrategy, FirstAssigneeSnapshotStrategy):
+                expected_manager = IdeaActivityManager(strategy_class())
+                expected_issues = expected_manager.load_issues_from_activities_file(file_path)
+
+                manager = IdeaActivityManager(strategy_class())
+                issues = manager.load_issues_from_activities_file(file_path, processes=2)
+
+                self.assertEqual(list(expected_issues.items()), list(issues.items()))
+                self.assertEqual(list(expected_manager.final_issues.items()), list(manager.final_issues.items()))
+                self.assertEqual(list(expected_manager.snapshot_strategy.issues.items()),
+                                 list(manager.snapshot_strategy.issues.items()))
+
+    def test_index_in_processes(self):
+        with ActivityIndex.build(self.sample_file) as expected_index, \
+                ActivityIndex.build(self.sample_file, processes=3) as index:
+            self.assertEqual(list(expected_index.issues), list(index.issues))
+            for issue_id, expected_offsets in expected_index.issues.items():
+                offsets = index.issues[issue_id]
+                self.assertEqual((expected_offsets.issue, expected_offsets.created, expected_offsets.activities),
+                                 (offsets.issue, offsets.created, offsets.activities))
+
+    def test_compact(self):
+        expected_strategy = SnapshotStrategy()
+        IdeaActivityManager(expected_strategy, compact=True).load_issues_from_activities_file(self.sample_file)
+
+        strategy = SnapshotStrategy()
+        IdeaActivityManager(strategy, compact=True).load_issues_from_activities_file(self.sample_file, processes=2)
+
+        self.assertEqual(list(expected_strategy.issues.items()), list(strategy.issues.items()))
+        self.assertTrue(all(isinstance(issue, CompactIssue) for issue in strategy.issues.values()))
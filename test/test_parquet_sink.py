@@ -0,0 +1,110 @@
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipUnless
+
+from jetbrains_issues_dataset.youtrack_loader.parquet_sink import flatten_activity, flatten_issue, \
+    flatten_issue_fields, ParquetSink, DEFAULT_PARTITION, _month
+from jetbrains_issues_dataset.youtrack_loader.download_activities import download_data
+from test_download_data import END, FakeYouTrack, START
+
+
+class TestParquetSink(TestCase):
+    def setUp(self):
+        with open('data/snapshot.json', 'r', encoding='utf-8') as reader:
+            elements = [json.loads(line) for line in reader]
+        self.issues = [element for element in elements if element['element_type'] == 'issue']
+        self.activities = [element for element in elements if element['element_type'] == 'activity']
+
+    def test_flatten_issue(self):
+        issue = self.issues[0]
+        row = flatten_issue(issue)
+        self.assertEqual((issue['id'], issue['idReadable'], issue['summary']),
+                         (row['id'], row['id_readable'], row['summary']))
+
+        fields = {(row['field'], row['value']) for row in flatten_issue_fields(issue)}
+        self.assertIn(('State', 'Submitted'), fields)
+        self.assertIn(('Assignee', 'Mikhail.Sokolov'), fields)
+        self.assertIn(('Affected versions', '2020.3'), fields)
+        self.assertNotIn('Included in builds', {field for field, _ in fields})
+
+    def test_flatten_activity(self):
+        rows = [flatten_activity(activity) for activity in self.activities]
+        self.assertTrue(all(row['issue_id'] is not None for row in rows))
+
+        activity, row = next((activity, row) for activity, row in zip(self.activities, rows)
+                             if (row['target_member'] or '').startswith('__CUSTOM_FIELD__Assignee') and row['added'])
+        self.assertEqual([user['login'] for user in activity['added']], row['added'])
+
+        activity, row = next((activity, row) for activity, row in zip(self.activities, rows)
+                             if row['target_member'] == 'description')
+        self.assertEqual([activity['added']], row['added'])
+
+    @skipUnless(importlib.util.find_spec('pyarrow') is not None, 'pyarrow is not installed')
+    def test_download(self):
+        import pyarrow.dataset
+
+        directory = tempfile.mkdtemp()
+        try:
+            youtrack = FakeYouTrack()
+            for issue in youtrack.issues:
+                issue['project'] = {'shortName': 'IDEA'}
+            download_data(youtrack, START, END, '#IDEA', os.path.join(directory, 'issues.json'),
+                          os.path.join(directory, 'activities.json'), parquet_dir=os.path.join(directory, 'parquet'))
+
+            issues = pyarrow.dataset.dataset(os.path.join(directory, 'parquet', 'issues'), partitioning='hive')
+            self.assertEqual(len(youtrack.issues), issues.count_rows())
+            activities = pyarrow.dataset.dataset(os.path.join(directory, 'parquet', 'activities'),
+                                                 partitioning='hive')
+            self.assertEqual(3 * len(youtrack.issues), activities.count_rows())
+            self.assertEqual({'2020-01', '2020-02'}, set(activities.to_table().column('month').to_pylist()))
+            self.assertEqual({'IDEA'}, set(activities.to_table().column('project').to_pylist()))
+        finally:
+            shutil.rmtree(directory)
+
+    @skipUnless(importlib.util.find_spec('pyarrow') is not None, 'pyarrow is not installed')
+    def test_row_groups(self):
+        import pyarrow.parquet
+
+        directory = tempfile.mkdtemp()
+        try:
+            with ParquetSink(directory, row_group_size=100) as sink:
+                sink.write_issues(self.issues)
+                sink.write_activities(self.activities)
+            files = [os.path.join(root, name) for root, _, names in os.walk(os.path.join(directory, 'activities'))
+                     for name in names]
+            self.assertEqual(len(self.activities), sum(pyarrow.parquet.ParquetFile(file).metadata.num_rows
+                                                      for file in files))
+            self.assertTrue(all(pyarrow.parquet.ParquetFile(file).metadata.row_group(0).num_rows <= 100
+                                for file in files))
+        finally:
+            shutil.rmtree(directory)
+
+    @skipUnless(importlib.util.find_spec('pyarrow') is not None, 'pyarrow is not installed')
+    def test_finished_months_are_closed(self):
+        import pyarrow.parquet
+
+        directory = tempfile.mkdtemp()
+        try:
+            with ParquetSink(directory, max_open_files=2) as sink:
+                sink.write_issues(self.issues)
+                sink.write_activities(self.activities)
+                sink.window_done()
+                self.assertEqual({}, sink._issue_projects)
+                self.assertLessEqual(len(sink._writers), 2)
+
+                last_timestamp = max(activity['timestamp'] for activity in self.activities)
+                sink.window_done(last_timestamp)
+                # issues of the snapshot have no `created`, they stay in the default partition
+                self.assertEqual({_month(last_timestamp), DEFAULT_PARTITION},
+                                 {partition[2] for partition in list(sink._writers) + list(sink._buffers)})
+
+            for table, rows in (('activities', self.activities), ('issues', self.issues)):
+                files = [os.path.join(root, name) for root, _, names in os.walk(os.path.join(directory, table))
+                         for name in names]
+                self.assertEqual(len(rows), sum(pyarrow.parquet.ParquetFile(file).metadata.num_rows
+                                                for file in files))
+        finally:
+            shutil.rmtree(directory)
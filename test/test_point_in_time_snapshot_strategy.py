@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.event_cache import load_with_cache
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.point_in_time_snapshot_strategy import FieldTimeline, \
+    PointInTimeSnapshotStrategy
+from jetbrains_issues_dataset.idea.result_cache import ResultCache
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+
+class TestPointInTimeSnapshotStrategy(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _load(self, file_path='data/snapshot.json'):
+        strategy = PointInTimeSnapshotStrategy()
+        IdeaActivityManager(strategy).load_issues_from_activities_file(file_path)
+        return strategy
+
+    def test_latest_state_as_snapshot_strategy(self):
+        for file_path in ('data/snapshot.json', 'data/missed_activities.json'):
+            expected_strategy = SnapshotStrategy()
+            IdeaActivityManager(expected_strategy).load_issues_from_activities_file(file_path)
+            strategy = self._load(file_path)
+            self.assertEqual(expected_strategy.issues, strategy.as_of(datetime(2100, 1, 1)))
+
+    def test_field_changes(self):
+        strategy = self._load()
+        self.assertEqual('Submitted', strategy.issue_as_of('25-2995839', datetime(2020, 10, 8, 8, 45))['state'])
+        self.assertEqual('Wait for Reply', strategy.issue_as_of('25-2995839', datetime(2020, 10, 8, 8, 46))['state'])
+        self.assertEqual('Wait for Reply',
+                         strategy.issue_as_of('25-2995839', datetime(2020, 10, 8, 15, 52, 18))['state'])
+        self.assertEqual('Submitted', strategy.issue_as_of('25-2995839', datetime(2020, 10, 8, 15, 52, 19))['state'])
+
+        strategy = self._load('data/missed_activities.json')
+        self.assertEqual('Reopened', strategy.issue_as_of('25-2947380', datetime(2020, 10, 6, 19, 45, 25))['state'])
+        self.assertEqual('Fixed', strategy.issue_as_of('25-2947380', datetime(2020, 10, 6, 19, 45, 26))['state'])
+
+    def test_multivalue_timeline(self):
+        timeline = FieldTimeline(multivalue=True)
+        timeline.insert(3, True, ['b'])
+        timeline.insert(1, True, ['a'])
+        self.assertEqual([[], ['a'], ['a', 'b']], [timeline.value_as_of(moment) for moment in (0, 1, 5)])
+        # a change after lookups is seen by the next ones
+        timeline.insert(2, False, ['a'])
+        self.assertEqual([['a'], [], ['b']], [timeline.value_as_of(moment) for moment in (1, 2, 5)])
+
+    def test_created_issues_and_comments(self):
+        strategy = self._load()
+        first_created = min(strategy.created_at.values())
+        self.assertEqual({}, strategy.as_of(first_created - timedelta(seconds=1)))
+
+        moments = sorted(strategy.created_at.values())
+        middle = moments[len(moments) // 2]
+        issues = strategy.as_of(middle)
+        self.assertEqual(sum(1 for created_at in moments if created_at <= middle), len(issues))
+        latest_issues = strategy.as_of(datetime(2100, 1, 1))
+        self.assertLess(sum(len(issue['comments']) for issue in issues.values()),
+                        sum(len(latest_issues[issue_id]['comments']) for issue_id in issues))
+
+    def test_caches(self):
+        expected_strategy = self._load()
+        moments = [datetime(2020, 10, 7), datetime(2020, 10, 8, 12), datetime(2100, 1, 1)]
+
+        for _ in range(2):
+            strategy = PointInTimeSnapshotStrategy()
+            load_with_cache('data/snapshot.json', IdeaActivityManager(strategy), self.directory)
+            for moment in moments:
+                self.assertEqual(expected_strategy.as_of(moment), strategy.as_of(moment))
+
+        cache = ResultCache(os.path.join(self.directory, 'snapshots'))
+        cache.save('data/snapshot.json', IdeaActivityManager(expected_strategy))
+        strategy = PointInTimeSnapshotStrategy()
+        self.assertTrue(cache.load('data/snapshot.json', IdeaActivityManager(strategy)))
+        for moment in moments:
+            self.assertEqual(expected_strategy.as_of(moment), strategy.as_of(moment))
+
+    def test_processes(self):
+        expected_strategy = self._load()
+        strategy = PointInTimeSnapshotStrategy()
+        IdeaActivityManager(strategy).load_issues_from_activities_file('data/snapshot.json', processes=2)
+
+        self.assertEqual(145, len(strategy.as_of(datetime(2100, 1, 1))))
+        for moment in (datetime(2020, 10, 7), datetime(2020, 10, 8, 12), datetime(2100, 1, 1)):
+            self.assertEqual(expected_strategy.as_of(moment), strategy.as_of(moment))
+
+    def test_iterated_issues_are_not_kept(self):
+        strategy = PointInTimeSnapshotStrategy()
+        snapshots = list(IdeaActivityManager(strategy).iter_issues_from_activities_file('data/snapshot.json'))
+        self.assertEqual(145, len(snapshots))
+        with self.assertRaises(Exception):
+            strategy.as_of(datetime(2100, 1, 1))
+
+    def test_final_state_only_fields(self):
+        strategy = self._load()
+        issue_id = '25-2995839'
+        strategy.final_states[issue_id]['resolved'] = int(datetime(2020, 10, 8, 12).timestamp() * 1000)
+        strategy.final_states[issue_id]['updated'] = int(datetime(2020, 10, 9).timestamp() * 1000)
+
+        issue = strategy.issue_as_of(issue_id, datetime(2020, 10, 8, 9))
+        for field in ('resolved', 'updated', 'customFields'):
+            self.assertNotIn(field, issue)
+        self.assertEqual(len(issue['comments']), issue['commentsCount'])
+        self.assertIn('resolved', strategy.issue_as_of(issue_id, datetime(2020, 10, 8, 13)))
+        latest = strategy.issue_as_of(issue_id, datetime(2100, 1, 1))
+        self.assertEqual(strategy.final_states[issue_id]['commentsCount'], latest['commentsCount'])
+        self.assertIn('customFields', latest)
+
+    def test_strategy_without_removed_field_timestamp(self):
+        class OldStrategy(SnapshotStrategy):
+            # the signature from before `timestamp` was passed to strategies
+            def process_removed_field(self, id, field, removed_value, final_issue_state):
+                super().process_removed_field(id, field, removed_value, final_issue_state)
+
+        expected_strategy = SnapshotStrategy()
+        IdeaActivityManager(expected_strategy).load_issues_from_activities_file('data/snapshot.json')
+        for strategy in (OldStrategy(), [OldStrategy(), PointInTimeSnapshotStrategy()]):
+            activity_manager = IdeaActivityManager(strategy)
+            activity_manager.load_issues_from_activities_file('data/snapshot.json')
+            old_strategy = activity_manager.snapshot_strategy
+            if isinstance(strategy, list):
+                old_strategy = old_strategy.strategies[0]
+            self.assertEqual(expected_strategy.issues, old_strategy.issues)
+
+        strategy = OldStrategy()
+        load_with_cache('data/snapshot.json', IdeaActivityManager(strategy), self.directory)
+        strategy = OldStrategy()
+        load_with_cache('data/snapshot.json', IdeaActivityManager(strategy), self.directory)
+        self.assertEqual(expected_strategy.issues, strategy.issues)
@@ -0,0 +1,44 @@
+from collections import Counter
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.replay_profiler import PHASES, ReplayProfiler
+from jetbrains_issues_dataset.jsonl import read_jsonl
+
+
+class TestReplayProfiler(TestCase):
+    file_path = 'data/missed_activities.json'
+
+    def test_same_as_without_profiler(self):
+        expected_manager = IdeaActivityManager(FirstAssigneeSnapshotStrategy())
+        expected_issues = expected_manager.load_issues_from_activities_file(self.file_path)
+
+        manager = IdeaActivityManager(FirstAssigneeSnapshotStrategy())
+        strategy = manager.snapshot_strategy
+        issues = manager.load_issues_from_activities_file(self.file_path, profiler=ReplayProfiler())
+
+        self.assertIs(strategy, manager.snapshot_strategy)
+        self.assertEqual(list(expected_issues.items()), list(issues.items()))
+        self.assertEqual(list(expected_manager.snapshot_strategy.issues.items()),
+                         list(manager.snapshot_strategy.issues.items()))
+
+    def test_counts(self):
+        expected_types = Counter(element.get('$type') for element in read_jsonl(self.file_path)
+                                 if element['element_type'] == 'activity')
+
+        profiler = ReplayProfiler()
+        manager = IdeaActivityManager(FirstAssigneeSnapshotStrategy())
+        manager.load_issues_from_activities_file(self.file_path, profiler=profiler)
+
+        self.assertEqual(expected_types, profiler.type_counts)
+        self.assertEqual(sum(expected_types.values()), sum(profiler.issue_activities.values()))
+        self.assertEqual(set(PHASES), set(profiler.phase_seconds))
+        self.assertTrue(all(seconds >= 0 for seconds in profiler.phase_seconds.values()))
+        self.assertGreater(profiler.callback_counts['process_previous_attribute_values'], 0)
+
+        slowest = profiler.slowest_issues(3)
+        self.assertLessEqual(len(slowest), 3)
+        self.assertEqual(sorted(slowest, key=lambda issue: -issue[1]), slowest)
+        self.assertEqual(len(slowest), len(profiler.to_dict(3)['slowest_issues']))
+        self.assertIn('final merge', profiler.report())
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.activity_manager import ActivityManager
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.result_cache import ResultCache
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+STATE_MAPPING = {'__CUSTOM_FIELD__State_25': {'name': 'state', 'field': 'name', 'multivalue': False}}
+
+
+class ChangedSnapshotStrategy(SnapshotStrategy):
+    cache_version = 2
+
+
+class OtherSnapshotStrategy(SnapshotStrategy):
+    pass
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'activities.json')
+        shutil.copy('data/missed_activities.json', self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _load(self, cache, activity_manager):
+        if cache.load(self.file_path, activity_manager):
+            return True
+        activity_manager.load_issues_from_activities_file(self.file_path)
+        cache.save(self.file_path, activity_manager)
+        return False
+
+    def test_hit(self):
+        cache = ResultCache(os.path.join(self.directory, 'cache'))
+        for compact in (False, True):
+            expected_strategy = FirstAssigneeSnapshotStrategy()
+            self.assertFalse(self._load(cache, IdeaActivityManager(expected_strategy, compact=compact)))
+
+            strategy = FirstAssigneeSnapshotStrategy()
+            self.assertTrue(self._load(cache, IdeaActivityManager(strategy, compact=compact)))
+            self.assertEqual(list(expected_strategy.issues.items()), list(strategy.issues.items()))
+            self.assertEqual([type(issue) for issue in expected_strategy.issues.values()],
+                             [type(issue) for issue in strategy.issues.values()])
+
+        strategies = [SnapshotStrategy(), IssueCreatedSnapshotStrategy()]
+        self.assertFalse(self._load(cache, IdeaActivityManager(strategies)))
+        activity_manager = IdeaActivityManager([SnapshotStrategy(), IssueCreatedSnapshotStrategy()])
+        self.assertTrue(self._load(cache, activity_manager))
+        self.assertEqual([strategy.issues for strategy in strategies], activity_manager.snapshot_strategy.issues)
+
+    def test_miss(self):
+        cache = ResultCache(os.path.join(self.directory, 'cache'))
+        self.assertFalse(self._load(cache, IdeaActivityManager(SnapshotStrategy())))
+        self.assertFalse(self._load(cache, IdeaActivityManager(ChangedSnapshotStrategy())))
+        strategy = SnapshotStrategy()
+        self.assertFalse(self._load(cache, ActivityManager(strategy, custom_field_mapping=STATE_MAPPING)))
+        cached_strategy = SnapshotStrategy()
+        self.assertTrue(self._load(cache, ActivityManager(cached_strategy, custom_field_mapping=STATE_MAPPING)))
+        self.assertEqual(strategy.issues, cached_strategy.issues)
+        self.assertTrue(self._load(cache, IdeaActivityManager(SnapshotStrategy())))
+
+        with open(self.file_path, 'a', encoding='utf-8') as writer:
+            writer.write('\n')
+        self.assertFalse(self._load(cache, IdeaActivityManager(SnapshotStrategy())))
+
+    def test_eviction(self):
+        cache_dir = os.path.join(self.directory, 'cache')
+        cache = ResultCache(cache_dir)
+        result_files = []
+        for strategy in (SnapshotStrategy(), ChangedSnapshotStrategy()):
+            self._load(cache, IdeaActivityManager(strategy))
+            result_files.append(cache._result_file(self.file_path, IdeaActivityManager(strategy)))
+        for i, result_file in enumerate(result_files):
+            os.utime(result_file, (1000 + i, 1000 + i))
+
+        # the oldest result is used again, so the other one is removed when a new one doesn't fit
+        self.assertTrue(self._load(cache, IdeaActivityManager(SnapshotStrategy())))
+        cache = ResultCache(cache_dir, max_size=2 * os.path.getsize(result_files[0]))
+        self.assertFalse(self._load(cache, IdeaActivityManager(OtherSnapshotStrategy())))
+
+        self.assertTrue(self._load(cache, IdeaActivityManager(SnapshotStrategy())))
+        self.assertTrue(self._load(cache, IdeaActivityManager(OtherSnapshotStrategy())))
+        self.assertFalse(os.path.exists(result_files[1]))
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from jetbrains_issues_dataset.idea.first_assignee_snapshot_strategy import FirstAssigneeSnapshotStrategy
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+from jetbrains_issues_dataset.jsonl import open_jsonl, read_jsonl
+
+STRATEGIES = (SnapshotStrategy, IssueCreatedSnapshotStrategy, FirstAssigneeSnapshotStrategy)
+SAMPLE_LINES = 5000
+
+
+class TestStreamingReplay(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.sample_file = os.path.join(self.directory, 'sample.json')
+        with open('data/snapshot.json', 'r', encoding='utf-8') as reader, \
+                open(self.sample_file, 'w', encoding='utf-8') as writer:
+            for _ in range(SAMPLE_LINES):
+                writer.write(reader.readline())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _assert_same_as_serial(self, file_path, expected_file_path=None):
+        for strategy_class in STRATEGIES:
+            expected_strategy = strategy_class()
+            IdeaActivityManager(expected_strategy).load_issues_from_activities_file(expected_file_path or file_path)
+
+            strategy = strategy_class()
+            snapshots = list(IdeaActivityManager(strategy).iter_issues_from_activities_file(file_path))
+            self.assertEqual(list(expected_strategy.issues.values()), snapshots)
+            self.assertEqual({}, strategy.issues)
+
+    def test_same_as_serial(self):
+        self._assert_same_as_serial(self.sample_file)
+        self._assert_same_as_serial('data/missed_activities.json')
+
+    def test_downloaded_activities(self):
+        # activities written by the downloader have `issue_id`, the index doesn't parse them
+        file_path = os.path.join(self.directory, 'activities.json.gz')
+        with open_jsonl(file_path, 'w') as writer:
+            for element in read_jsonl(self.sample_file):
+                if element['element_type'] == 'activity':
+                    target = element['target']
+                    element['issue_id'] = target['issue']['id'] if 'issue' in target else target['id']
+                writer.write(json.dumps(element) + '\n')
+
+        self._assert_same_as_serial(file_path)
+        self.assertEqual(['activities.json.gz', 'sample.json'], sorted(os.listdir(self.directory)))
+
+    def test_activities_before_issues(self):
+        elements = list(read_jsonl(self.sample_file))
+        issues = [element for element in elements if element['element_type'] == 'issue']
+        activities = [element for element in elements if element['element_type'] == 'activity']
+        file_path = os.path.join(self.directory, 'activities.json')
+        with open(file_path, 'w', encoding='utf-8') as writer:
+            for element in activities + issues:
+                writer.write(json.dumps(element) + '\n')
+
+        self._assert_same_as_serial(file_path, expected_file_path=self.sample_file)
@@ -0,0 +1,54 @@
+import filecmp
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from benchmarks.synthetic import generate
+from jetbrains_issues_dataset.idea.idea_activity_manager import IdeaActivityManager
+from jetbrains_issues_dataset.idea.issue_created_snapshot_strategy import IssueCreatedSnapshotStrategy
+from jetbrains_issues_dataset.idea.snapshot_strategy import SnapshotStrategy
+
+
+class TestSynthetic(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'synthetic.json')
+        self.n_lines = generate(self.file_path, n_issues=200, activities_per_issue=10, seed=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_deterministic(self):
+        other_file_path = os.path.join(self.directory, 'other.json')
+        self.assertEqual(self.n_lines, generate(other_file_path, n_issues=200, activities_per_issue=10, seed=1))
+        self.assertTrue(filecmp.cmp(self.file_path, other_file_path, shallow=False))
+
+        generate(other_file_path, n_issues=200, activities_per_issue=10, seed=2)
+        self.assertFalse(filecmp.cmp(self.file_path, other_file_path, shallow=False))
+
+    def test_final_snapshot_is_final_state(self):
+        activity_manager = IdeaActivityManager(SnapshotStrategy())
+        issues = activity_manager.load_issues_from_activities_file(self.file_path)
+
+        self.assertEqual(200, len(issues))
+        for issue_id, snapshot in activity_manager.snapshot_strategy.issues.items():
+            final_state = activity_manager.final_issues[issue_id]
+            for field in ('state', 'assignee', 'subsystem', 'summary', 'description'):
+                self.assertEqual(final_state.get(field), snapshot.get(field))
+            self.assertEqual(final_state['commentsCount'], len(snapshot['comments']))
+
+    def test_creation_snapshot(self):
+        activity_manager = IdeaActivityManager(IssueCreatedSnapshotStrategy())
+        activity_manager.load_issues_from_activities_file(self.file_path)
+
+        snapshots = activity_manager.snapshot_strategy.issues.values()
+        self.assertTrue(all(snapshot['state'] == 'Submitted' for snapshot in snapshots))
+        self.assertTrue(any('fixed_by' in snapshot for snapshot in snapshots))
+
+    def test_activity_mix(self):
+        generate(self.file_path, n_issues=50, activities_per_issue=10, activity_mix={'comment': 1})
+        activity_manager = IdeaActivityManager(SnapshotStrategy())
+        activity_manager.load_issues_from_activities_file(self.file_path)
+        self.assertTrue(all(snapshot['state'] == 'Submitted'
+                            for snapshot in activity_manager.snapshot_strategy.issues.values()))
@@ -0,0 +1,135 @@
+from unittest import TestCase
+
+import requests
+
+from jetbrains_issues_dataset.youtrack_loader.metrics import CrawlMetrics
+from jetbrains_issues_dataset.youtrack_loader.youtrack import YouTrack
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+    def close(self):
+        pass
+
+
+class StreamedResponse(FakeResponse):
+    def __init__(self, status_code, headers):
+        super().__init__(status_code, None, headers)
+        self.consumed = False
+
+    @property
+    def content(self):
+        self.consumed = True
+        return b'bytes'
+
+    def iter_content(self, chunk_size):
+        if not self.consumed:
+            yield b'bytes'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestYouTrackClient(TestCase):
+    def _youtrack(self, responses, max_retries=3):
+        youtrack = YouTrack('http://localhost/', None, page_size=2, max_retries=max_retries, backoff_factor=0)
+        youtrack.session = FakeSession(responses)
+        return youtrack
+
+    def test_retry_on_rate_limit_and_server_errors(self):
+        youtrack = self._youtrack([FakeResponse(429, None, {'Retry-After': '0'}),
+                                   requests.ConnectionError('reset'),
+                                   FakeResponse(503, None),
+                                   FakeResponse(200, [{'id': '1'}])])
+        self.assertEqual([{'id': '1'}], youtrack.get_json('http://localhost/api/issues'))
+        self.assertEqual(4, len(youtrack.session.requests))
+
+    def test_retries_exhausted(self):
+        youtrack = self._youtrack([FakeResponse(500, ValueError('not json'))] * 4, max_retries=1)
+        with self.assertRaises(ValueError):
+            youtrack.get_json('http://localhost/api/issues')
+
+    def test_malformed_responses_share_retries(self):
+        youtrack = self._youtrack([FakeResponse(503, None), FakeResponse(200, ValueError('cut off')),
+                                   FakeResponse(200, [{'id': '1'}])], max_retries=2)
+        self.assertEqual([{'id': '1'}], youtrack.get_json('http://localhost/api/issues'))
+
+        youtrack = self._youtrack([FakeResponse(503, None), FakeResponse(200, ValueError('cut off'))] * 4,
+                                  max_retries=1)
+        with self.assertRaises(ValueError):
+            youtrack.get_json('http://localhost/api/issues')
+        self.assertEqual(2, len(youtrack.session.requests))
+
+    def test_client_error_is_not_repeated(self):
+        youtrack = self._youtrack([FakeResponse(404, ValueError('<html>Not Found</html>'))] * 4)
+        with self.assertRaises(ValueError):
+            youtrack.get_json('http://localhost/api/issues')
+        self.assertEqual(1, len(youtrack.session.requests))
+
+    def test_streamed_body_is_not_read_for_metrics(self):
+        youtrack = self._youtrack([StreamedResponse(200, {'Content-Length': '5'})])
+        youtrack.metrics = CrawlMetrics()
+        with youtrack.get('http://localhost/api/files/1', stream=True) as response:
+            self.assertEqual([b'bytes'], list(response.iter_content(8192)))
+        self.assertEqual(5, sum(youtrack.metrics.bytes_received.values()))
+
+    def test_post_is_not_repeated_on_server_error(self):
+        youtrack = self._youtrack([FakeResponse(500, None)])
+        self.assertEqual(500, youtrack.post('http://localhost/api/issues/1/comments', json={}).status_code)
+        self.assertEqual(1, len(youtrack.session.requests))
+
+    def test_activities_are_written_in_issue_order(self):
+        pages = {'1': [[{'id': 'a'}, {'id': 'b'}], [{'id': 'c'}]], '2': [[{'id': 'd'}]], '3': [[]]}
+        youtrack = YouTrack('http://localhost/', None, page_size=2)
+
+        def get_json(url):
+            issue_id = url.split('issues/')[1].split('/')[0]
+            return pages[issue_id].pop(0)
+        youtrack.get_json = get_json
+
+        activities = youtrack.download_activities_per_issue(['1', '2', '3'], None, no_write_to_file=True,
+                                                            concurrency=3)
+        self.assertEqual(['a', 'b', 'c', 'd'], [activity['id'] for activity in activities])
+        self.assertEqual(['1', '1', '1', '2'], [activity['issue_id'] for activity in activities])
+
+    def test_fields_profile(self):
+        youtrack = YouTrack('http://localhost/', None, fields_profile='minimal')
+        requested_urls = []
+
+        def get_json(url):
+            requested_urls.append(url)
+            return []
+        youtrack.get_json = get_json
+
+        youtrack.download_activities_per_issue(['1'], None, no_write_to_file=True)
+        youtrack.download_activities_per_issue(['1'], None, no_write_to_file=True, profile='comments')
+        self.assertIn('categories=CommentsCategory,CustomFieldCategory', requested_urls[0])
+        self.assertNotIn('visibility', requested_urls[0])
+        self.assertIn('categories=CommentsCategory,CommentTextCategory&', requested_urls[1])
+        with self.assertRaises(ValueError):
+            youtrack.download_issues('', None, profile='everything')